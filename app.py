@@ -3,13 +3,19 @@ import dash_bootstrap_components as dbc
 from dash import dcc, html
 from dash.dependencies import Input, Output, State
 from page_1 import page_1
-from order_page import order_page
-from error_page import error_page
+from order_page import make_order_page
+from error_page import make_error_page
 from navbar import navbar
 from sidebar import sidebar, SIDEBAR_HIDDEN, SIDEBAR_STYLE
 from dash.dependencies import Input, Output
 from dash.exceptions import PreventUpdate
+from flask import Response, jsonify
 from interactive_trader import *
+from event_stream import event_hub
+from background_jobs import job_runner
+from table_updates import order_rows_update, error_rows_update
+from table_updates import order_rows_snapshot, error_rows_snapshot
+from table_updates import shared_update_metrics
 from datetime import datetime
 from ibapi.contract import Contract
 from ibapi.order import Order
@@ -38,6 +44,19 @@ errors = ""
 connected = ""
 
 ibkr_async_conn = ibkr_app()
+# Everything sent on the connection goes out in priority order (orders
+#   first) and within IB's message rate; see outbound_scheduler.
+ibkr_outbound = outbound_scheduler(ibkr_async_conn).start()
+# Order status and error events are pushed to every open tab over /events;
+#   see assets/event_stream.js.
+ibkr_events = event_hub()
+ibkr_async_conn.add_event_listener(ibkr_events.publish)
+# Connecting and placing orders run here, off the web server's threads.
+ibkr_jobs = job_runner(max_workers=4)
+connect_job_id = None
+connect_job_lock = threading.Lock()
+# Job ids each tab keeps in its ibkr-jobs store.
+max_jobs_per_tab = 50
 
 app = dash.Dash(external_stylesheets=[dbc.themes.BOOTSTRAP])
 server = app.server
@@ -46,9 +65,21 @@ app.layout = html.Div(
     [
         dcc.Store(id='side_click'),
         dcc.Location(id="url"),
+        # Which version of the blotter and error tables each browser has,
+        #   so the interval callbacks only send what changed since.
+        dcc.Store(id='trade-blotter-seen'),
+        dcc.Store(id='errors-dt-seen'),
+        # Background jobs (connecting, orders) started from this tab and
+        #   their latest statuses; ibkr-job-interval runs while any of them
+        #   is unfinished.
+        dcc.Store(id='ibkr-jobs', data=[]),
+        dcc.Store(id='ibkr-job-status'),
+        dcc.Interval(id='ibkr-job-interval', interval=500, disabled=True),
         navbar,
         sidebar,
         html.Div(id="page-content", style=CONTENT_STYLE),
+        # Polling fallback: assets/event_stream.js disables it while the
+        #   /events stream is connected.
         dcc.Interval(
             id = 'ibkr-update-interval',
             interval=5000,
@@ -58,34 +89,45 @@ app.layout = html.Div(
 )
 
 @app.callback(
-    [Output('trade-blotter', 'data'), Output('trade-blotter', 'columns')],
-    Input('ibkr-update-interval', 'n_intervals')
+    [Output('trade-blotter', 'data'), Output('trade-blotter-seen', 'data')],
+    Input('ibkr-update-interval', 'n_intervals'),
+    State('trade-blotter-seen', 'data')
 )
-def update_order_status(n_intervals):
-    global ibkr_async_conn
-    global order_status
-
-    order_status = ibkr_async_conn.order_status
-
-    df = order_status
-    dt_data = df.to_dict('records')
-    dt_columns = [{"name": i, "id": i} for i in df.columns]
-    return dt_data, dt_columns
+def update_order_status(n_intervals, seen):
+    return order_rows_update(ibkr_async_conn.order_states, seen)
 
 @app.callback(
-    [Output('errors-dt', 'data'), Output('errors-dt', 'columns')],
-    Input('ibkr-update-interval', 'n_intervals')
+    [Output('errors-dt', 'data'), Output('errors-dt-seen', 'data')],
+    Input('ibkr-update-interval', 'n_intervals'),
+    State('errors-dt-seen', 'data')
 )
-def update_order_status(n_intervals):
-    global ibkr_async_conn
-    global errors
-
-    errors = ibkr_async_conn.error_messages
-
-    df = errors
-    dt_data = df.to_dict('records')
-    dt_columns = [{"name": i, "id": i} for i in df.columns]
-    return dt_data, dt_columns
+def update_error_messages(n_intervals, seen):
+    return error_rows_update(ibkr_async_conn.errors, seen)
+
+@server.route('/table-update-metrics')
+def table_update_metrics():
+    # Ticks, rows and bytes sent so far by the two callbacks above.
+    return jsonify(shared_update_metrics.stats)
+
+@server.route('/events')
+def events():
+    # Server-Sent Events: both tables in full, then every order status
+    #   change and error as it happens.
+    def initial_events():
+        orders, orders_seen = order_rows_snapshot(
+            ibkr_async_conn.order_states)
+        errors, errors_seen = error_rows_snapshot(ibkr_async_conn.errors)
+        return [
+            ('orders_snapshot', {'version': orders_seen['version'],
+                                 'rows': orders}),
+            ('errors_snapshot', {'seq': errors_seen['seq'],
+                                 'capacity': ibkr_async_conn.errors.capacity,
+                                 'rows': errors})
+        ]
+    return Response(ibkr_events.stream(initial_events),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache',
+                             'X-Accel-Buffering': 'no'})
 
 @app.callback(
     [
@@ -129,14 +171,26 @@ def toggle_active_links(pathname):
     return [pathname == f"/page-{i}" for i in range(1, 4)]
 
 
-@app.callback(Output("page-content", "children"), [Input("url", "pathname")])
+@app.callback(
+    [
+        Output("page-content", "children"),
+        Output('trade-blotter-seen', 'data', allow_duplicate=True),
+        Output('errors-dt-seen', 'data', allow_duplicate=True)
+    ],
+    [Input("url", "pathname")],
+    prevent_initial_call='initial_duplicate'
+)
 def render_page_content(pathname):
+    # Tables are rendered holding every current row, and the browser's store
+    #   records that, so later ticks (or events) only bring changes.
     if pathname in ["/", "/home-screen"]:
-        return page_1
+        return page_1, None, None
     elif pathname == "/blotter":
-        return order_page
+        records, seen = order_rows_snapshot(ibkr_async_conn.order_states)
+        return make_order_page(records), seen, None
     elif pathname == "/errors":
-        return error_page
+        records, seen = error_rows_snapshot(ibkr_async_conn.errors)
+        return make_error_page(records), None, seen
     # If the user tries to reach a different page, return a 404 message
     return html.Div(
         [
@@ -144,38 +198,24 @@ def render_page_content(pathname):
             html.Hr(),
             html.P(f"The pathname {pathname} was not recognised..."),
         ]
-    )
-
-@app.callback(
-    Output('ibkr-async-conn-status', 'children'),
-    [
-        Input('ibkr-async-conn-status', 'children'),
-        Input('master-client-id', 'value'),
-        Input('port', 'value'),
-        Input('hostname', 'value')
-    ]
-)
-def async_handler(async_status, master_client_id, port, hostname):
-
-    if async_status == "CONNECTED":
-        raise PreventUpdate
-        pass
-
-    global ibkr_async_conn
-    ibkr_async_conn.connect(hostname, port, master_client_id)
+    ), None, None
 
+def connect_ibkr(report, hostname, port, master_client_id):
+    # Runs on ibkr_jobs. EClient.connect() waits for the gateway's handshake
+    #   with no limit of its own; the job's on_timeout disconnects, which
+    #   makes it give up.
     timeout_sec = 5
 
-    start_time = datetime.now()
-    while not ibkr_async_conn.isConnected():
-        time.sleep(0.01)
-        if (datetime.now() - start_time).seconds > timeout_sec:
-            ibkr_async_conn.disconnect()
-            raise Exception(
-                "set_up_async_connection",
-                "timeout",
-                "couldn't connect to IBKR"
-            )
+    report("connecting to %s:%s" % (hostname, port))
+    ready = ibkr_async_conn.requests.register('next_valid_id', timeout_sec)
+    ibkr_async_conn.connect(hostname, port, master_client_id)
+    if not ibkr_async_conn.isConnected():
+        ibkr_async_conn.disconnect()
+        raise Exception(
+            "set_up_async_connection",
+            "connection",
+            "couldn't connect to IBKR"
+        )
 
     def run_loop():
         ibkr_async_conn.run()
@@ -183,8 +223,9 @@ def async_handler(async_status, master_client_id, port, hostname):
     api_thread = threading.Thread(target=run_loop, daemon=True)
     api_thread.start()
 
-    while ibkr_async_conn.next_valid_id is None:
-        time.sleep(0.01)
+    report("waiting for next valid id")
+    ibkr_async_conn.requests.wait(ready, "set_up_async_connection",
+                                  "next_valid_id")
 
     global order_status
     order_status = ibkr_async_conn.order_status
@@ -197,8 +238,70 @@ def async_handler(async_status, master_client_id, port, hostname):
 
     return str(connected)
 
+def submit_order(report, contract, order):
+    # Runs on ibkr_jobs: places the order and waits for the gateway to
+    #   acknowledge it.
+    timeout_sec = 5
+
+    if not ibkr_async_conn.isConnected():
+        raise Exception("place_order", "connection", "not connected to IBKR")
+
+    order_id = ibkr_async_conn.order_ids.allocate()
+
+    report("placing order %s" % order_id)
+    ack = ibkr_async_conn.requests.register(('order', order_id), timeout_sec)
+    # Place orders!
+    ibkr_async_conn.placeOrder(
+        order_id,
+        contract,
+        order
+    )
+    report("waiting for order %s to be acknowledged" % order_id)
+    state = ibkr_async_conn.requests.wait(ack, "place_order", "order_status")
+    return {'order_id': order_id, 'status': state['status']}
+
 @app.callback(
-    Output('placeholder-div', 'children'),
+    [
+        Output('ibkr-async-conn-status', 'children'),
+        Output('ibkr-jobs', 'data', allow_duplicate=True)
+    ],
+    [
+        Input('ibkr-async-conn-status', 'children'),
+        Input('master-client-id', 'value'),
+        Input('port', 'value'),
+        Input('hostname', 'value')
+    ],
+    State('ibkr-jobs', 'data'),
+    prevent_initial_call='initial_duplicate'
+)
+def async_handler(async_status, master_client_id, port, hostname, jobs):
+    # Hands the connection to a background job and returns at once; the
+    #   job's progress reaches the page through check_jobs.
+    if async_status in ("CONNECTED", "CONNECTING"):
+        raise PreventUpdate
+    if async_status and \
+            dash.callback_context.triggered_id == 'ibkr-async-conn-status':
+        # check_jobs reporting a failed attempt; wait for new settings.
+        raise PreventUpdate
+
+    global connect_job_id
+    with connect_job_lock:
+        # One attempt at a time: other tabs follow the one in progress.
+        status = connect_job_id and ibkr_jobs.status(connect_job_id)
+        if not status or status['state'] in ('done', 'failed'):
+            connect_job_id = ibkr_jobs.submit(
+                'connect', connect_ibkr, hostname, port, master_client_id,
+                timeout=15, on_timeout=ibkr_async_conn.disconnect
+            )
+        job_id = connect_job_id
+
+    return "CONNECTING", (jobs or [])[-(max_jobs_per_tab - 1):] + [job_id]
+
+@app.callback(
+    [
+        Output('placeholder-div', 'children'),
+        Output('ibkr-jobs', 'data', allow_duplicate=True)
+    ],
     [
         Input('trade-button', 'n_clicks'),
         Input('contract-symbol', 'value'),
@@ -212,12 +315,13 @@ def async_handler(async_status, master_client_id, port, hostname):
         Input('order-lmt-price', 'value'),
         Input('order-account', 'value')
     ],
+    State('ibkr-jobs', 'data'),
     prevent_initial_call = True
 )
 def place_order(n_clicks, contract_symbol, contract_sec_type,
                 contract_currency, contract_exchange,
                 contract_primary_exchange, order_action, order_type,
-                order_size, order_lmt_price, order_account):
+                order_size, order_lmt_price, order_account, jobs):
 
     # Contract object: STOCK
     contract = Contract()
@@ -239,16 +343,46 @@ def place_order(n_clicks, contract_symbol, contract_sec_type,
     if order_account:
         order.account = order_account
 
-    ibkr_async_conn.reqIds(1)
+    job_id = ibkr_jobs.submit('order', submit_order, contract, order,
+                              timeout=15)
+    return job_id, (jobs or [])[-(max_jobs_per_tab - 1):] + [job_id]
 
-    # Place orders!
-    ibkr_async_conn.placeOrder(
-        ibkr_async_conn.next_valid_id,
-        contract,
-        order
-    )
-
-    return ''
+@app.callback(
+    [
+        Output('ibkr-job-status', 'data'),
+        Output('ibkr-job-interval', 'disabled'),
+        Output('ibkr-async-conn-status', 'children', allow_duplicate=True)
+    ],
+    [
+        Input('ibkr-jobs', 'data'),
+        Input('ibkr-job-interval', 'n_intervals')
+    ],
+    State('ibkr-async-conn-status', 'children'),
+    prevent_initial_call=True
+)
+def check_jobs(jobs, n_intervals, async_status):
+    # Statuses of this tab's jobs, checked every half second while any of
+    #   them is unfinished.
+    statuses = [ibkr_jobs.status(job_id) or
+                {'job_id': job_id, 'state': 'unknown'} for job_id in jobs or []]
+    running = any(status['state'] in ('queued', 'running')
+                  for status in statuses)
+    connect_jobs = [status for status in statuses
+                    if status.get('kind') == 'connect']
+    if async_status == "CONNECTING" and connect_jobs:
+        latest = connect_jobs[-1]
+        if latest['state'] == 'done':
+            async_status = "CONNECTED"
+        elif latest['state'] == 'failed':
+            async_status = "FAILED: " + latest['error']
+    return statuses, not running, async_status
+
+@server.route('/jobs/<job_id>')
+def job_status(job_id):
+    status = ibkr_jobs.status(job_id)
+    if status is None:
+        return jsonify({'job_id': job_id, 'state': 'unknown'}), 404
+    return jsonify(status)
 
 if __name__ == "__main__":
     app.run_server()
\ No newline at end of file
@@ -0,0 +1,111 @@
+// Keeps the blotter and error tables up to date from the server's /events
+//   stream (Server-Sent Events; see event_stream.py). While the stream is
+//   connected the ibkr-update-interval poll is switched off; if it drops,
+//   polling takes over until the browser reconnects.
+(function () {
+    var orders = [];
+    var orderRows = {};
+    var ordersVersion = -1;
+    var errors = [];
+    var errorsSeq = 0;
+    var errorsCapacity = 1000;
+
+    function setProps(id, props) {
+        var clientside = window.dash_clientside;
+        if (clientside && clientside.set_props) {
+            clientside.set_props(id, props);
+        }
+    }
+
+    function setTable(id, props) {
+        // Tables only exist while their page is showing; the server
+        //   renders them with every current row when it is opened. The
+        //   interval and stores are always in the layout but render no
+        //   DOM node, so only tables are checked for.
+        if (document.getElementById(id)) {
+            setProps(id, props);
+        }
+    }
+
+    function showOrders() {
+        setTable('trade-blotter', {data: orders.slice()});
+    }
+
+    function showErrors() {
+        setTable('errors-dt', {data: errors.slice()});
+    }
+
+    function usePolling(on) {
+        setProps('ibkr-update-interval', {disabled: !on});
+        if (on) {
+            // The tables have moved on since the last poll: start afresh.
+            setProps('trade-blotter-seen', {data: null});
+            setProps('errors-dt-seen', {data: null});
+        }
+    }
+
+    function setOrder(row) {
+        if (row.order_id in orderRows) {
+            orders[orderRows[row.order_id]] = row;
+        } else {
+            orderRows[row.order_id] = orders.length;
+            orders.push(row);
+        }
+    }
+
+    function on(source, event, handler) {
+        source.addEventListener(event, function (message) {
+            handler(JSON.parse(message.data));
+        });
+    }
+
+    function connect() {
+        var source = new EventSource('/events');
+        source.onopen = function () {
+            usePolling(false);
+        };
+        source.onerror = function () {
+            usePolling(true);
+        };
+        on(source, 'orders_snapshot', function (data) {
+            orders = [];
+            orderRows = {};
+            data.rows.forEach(setOrder);
+            ordersVersion = data.version;
+            showOrders();
+        });
+        on(source, 'errors_snapshot', function (data) {
+            errors = data.rows;
+            errorsSeq = data.seq;
+            errorsCapacity = data.capacity;
+            showErrors();
+        });
+        on(source, 'order_status', function (data) {
+            // Changes already in the snapshot are skipped.
+            if (data.version > ordersVersion) {
+                setOrder(data.row);
+                ordersVersion = data.version;
+                showOrders();
+            }
+        });
+        on(source, 'error_message', function (data) {
+            if (data.seq >= errorsSeq) {
+                errors.push(data.row);
+                if (errors.length > errorsCapacity) {
+                    errors.splice(0, errors.length - errorsCapacity);
+                }
+                errorsSeq = data.seq + 1;
+                showErrors();
+            }
+        });
+        on(source, 'resync', function () {
+            // Fell too far behind: reconnect for fresh snapshots.
+            source.close();
+            connect();
+        });
+    }
+
+    if (window.EventSource) {
+        window.addEventListener('load', connect);
+    }
+})();
@@ -0,0 +1,123 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Runs slow work for the Dash callbacks (connecting to the gateway, placing
+#   orders) on a dedicated pool of threads, so a callback hands it off and
+#   returns straight away instead of holding a web server thread for as long
+#   as the gateway takes to answer, or forever if it never does.
+#
+#   job_id = jobs.submit('connect', connect, hostname, port, client_id,
+#                        timeout=10, on_timeout=app.disconnect)
+#   jobs.status(job_id)  # {'state': 'running', 'progress': '...', ...}
+#
+# The job function gets a report(progress) callable as its first argument
+#   for progress messages. A job that outlives its timeout is marked failed
+#   and on_timeout is called, which should make the stuck call give up
+#   (e.g. closing the socket it's reading), so the thread comes back.
+
+job_states = ('queued', 'running', 'done', 'failed')
+
+
+class job_runner:
+
+    def __init__(self, max_workers=4, keep=1000):
+        # keep: how many finished jobs' statuses are remembered.
+        self.keep = keep
+        self._executor = ThreadPoolExecutor(max_workers,
+                                            thread_name_prefix='ibkr-job')
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._jobs = OrderedDict()
+        self._finished = 0
+
+    def submit(self, kind, function, *args, timeout=None, on_timeout=None):
+        job_id = '%s-%d' % (kind, next(self._ids))
+        job = {
+            'job_id': job_id, 'kind': kind, 'state': 'queued',
+            'progress': '', 'result': None, 'error': None,
+            'submitted': time.time(), 'started': None, 'finished': None
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+        self._executor.submit(self._run, job, function, args, timeout,
+                              on_timeout)
+        return job_id
+
+    def status(self, job_id):
+        # A copy of the job's status, or None for an unknown (or long
+        #   forgotten) job_id.
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return None if job is None else dict(job)
+
+    def counts(self):
+        with self._lock:
+            counts = dict.fromkeys(job_states, 0)
+            for job in self._jobs.values():
+                counts[job['state']] += 1
+            return counts
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait)
+
+    def _run(self, job, function, args, timeout, on_timeout):
+        def report(progress):
+            with self._lock:
+                if job['state'] == 'running':
+                    job['progress'] = progress
+
+        with self._lock:
+            job['state'] = 'running'
+            job['started'] = time.time()
+        watchdog = None
+        if timeout is not None:
+            watchdog = threading.Timer(timeout, self._time_out,
+                                       args=(job, timeout, on_timeout))
+            watchdog.daemon = True
+            watchdog.start()
+        try:
+            result = function(report, *args)
+        except Exception as error:
+            self._finish(job, 'failed', error=error)
+        else:
+            self._finish(job, 'done', result=result)
+        finally:
+            if watchdog is not None:
+                watchdog.cancel()
+
+    def _time_out(self, job, timeout, on_timeout):
+        error = Exception(job['kind'], "timeout",
+                          "not finished after %s s" % timeout)
+        if self._finish(job, 'failed', error=error) and on_timeout:
+            on_timeout()
+
+    def _finish(self, job, state, result=None, error=None):
+        # First finish wins: a job that timed out stays failed whatever its
+        #   function does afterwards. True if this call finished it.
+        with self._lock:
+            if job['state'] in ('done', 'failed'):
+                return False
+            job['state'] = state
+            job['result'] = result
+            job['error'] = None if error is None else \
+                ': '.join(str(arg) for arg in error.args) or repr(error)
+            job['finished'] = time.time()
+            self._finished += 1
+            self._forget()
+            return True
+
+    def _forget(self):
+        # Drops the oldest finished jobs beyond keep; unfinished jobs stay.
+        excess = self._finished - self.keep
+        if excess <= 0:
+            return
+        for job_id in list(self._jobs):
+            if excess == 0:
+                break
+            if self._jobs[job_id]['state'] in ('done', 'failed'):
+                del self._jobs[job_id]
+                self._finished -= 1
+                excess -= 1
@@ -0,0 +1,55 @@
+# Fetches contract details for a universe of symbols from a local stand-in
+#   gateway with simulated round-trip latency: one after another with the
+#   synchronous function, then all at once with asyncio.gather over the same
+#   single connection.
+#
+# Run from the repository root:
+#   python benchmarks/aio_fanout_benchmark.py --symbols 500 --latency 0.02
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+
+from interactive_trader import aio, fetch_contract_details, ibkr_session
+# The stand-in gateway lives with the tests rather than in the package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tests.stand_in_gateway import stand_in_gateway
+from tests.helpers import stock
+
+
+def serial(session, contracts):
+    return [fetch_contract_details(c, session=session, cache=None)
+            for c in contracts]
+
+
+def fan_out(session, contracts):
+    async def fetch_all():
+        return await asyncio.gather(*[
+            aio.fetch_contract_details(c, session=session, cache=None)
+            for c in contracts
+        ])
+    return asyncio.run(fetch_all())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--symbols', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.02,
+                        help='simulated gateway round trip in seconds')
+    args = parser.parse_args()
+
+    contracts = [stock('SYM%d' % i) for i in range(args.symbols)]
+    with stand_in_gateway(response_delay=args.latency) as gateway:
+        with ibkr_session(port=gateway.port, client_id=1,
+                          timeout=60) as session:
+            for name, run in (('serial', serial), ('asyncio.gather', fan_out)):
+                start = time.perf_counter()
+                results = run(session, contracts)
+                elapsed = time.perf_counter() - start
+                assert len(results) == len(contracts)
+                print(f"{name:<15} {len(contracts):>5d} lookups  "
+                      f"{elapsed:8.3f} s  "
+                      f"{len(contracts) / elapsed:10.1f} lookups/sec")
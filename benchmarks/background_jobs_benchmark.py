@@ -0,0 +1,158 @@
+# Load test of app.py's web server while the gateway is stalled: a local
+#   stand-in gateway that accepts connections but never answers. Simulated
+#   tabs keep loading the page layout while others click connect and place
+#   orders, first with the connection made inside the request (as the old
+#   async_handler did, here given up on after --stall seconds) and then with
+#   the background jobs app.py now hands it to. Reports request latency for
+#   each.
+#
+# Run from the repository root:
+#   python benchmarks/background_jobs_benchmark.py --threads 4 --clicks 8
+
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+import urllib.request
+import json
+
+import numpy as np
+from waitress import create_server
+
+# app.py lives at the repository root rather than in the package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app
+from interactive_trader import ibkr_app
+from tests.stand_in_gateway import stand_in_gateway
+from tests.helpers import dash_callback
+
+
+def inline_connect(port, stall):
+    # The old async_handler: connect and wait for nextValidId inside the
+    #   request, on a server thread.
+    conn = ibkr_app()
+    give_up = threading.Timer(stall, conn.disconnect)
+    give_up.start()
+    try:
+        conn.connect('127.0.0.1', port, 1)
+    except AttributeError:
+        # ibapi's handshake loop trips over the closed connection.
+        pass
+    give_up.cancel()
+    conn.disconnect()
+    return 'done'
+
+
+def get(url, latencies):
+    start = time.perf_counter()
+    urllib.request.urlopen(url).read()
+    latencies.append(time.perf_counter() - start)
+
+
+def post(url, payload, latencies):
+    request = urllib.request.Request(
+        url, data=json.dumps(payload).encode(),
+        headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    urllib.request.urlopen(request).read()
+    latencies.append(time.perf_counter() - start)
+
+
+def readers(base, seconds, tabs, latencies):
+    # Tabs loading the layout over and over.
+    def tab():
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            get(base + '/_dash-layout', latencies)
+            time.sleep(0.01)
+    threads = [threading.Thread(target=tab) for _ in range(tabs)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def report(name, latencies):
+    ms = np.array(latencies) * 1e3
+    print(f"{name:<38} {len(ms):6d} requests  p50 {np.percentile(ms, 50):8.1f}"
+          f" ms  p99 {np.percentile(ms, 99):8.1f} ms  max {ms.max():8.1f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=4,
+                        help='waitress worker threads')
+    parser.add_argument('--tabs', type=int, default=4,
+                        help='tabs loading the layout throughout')
+    parser.add_argument('--clicks', type=int, default=8,
+                        help='connect clicks and order clicks, each')
+    parser.add_argument('--seconds', type=float, default=6.0)
+    parser.add_argument('--stall', type=float, default=5.0,
+                        help='seconds a request-bound connect waits')
+    args = parser.parse_args()
+    # waitress warns whenever requests wait for a thread; the latencies say
+    #   the same.
+    logging.getLogger('waitress.queue').setLevel(logging.ERROR)
+
+    server = create_server(app.server, host='localhost', port=0,
+                           threads=args.threads)
+    base = 'http://localhost:%s' % server.effective_port
+    threading.Thread(target=server.run, daemon=True).start()
+
+    @app.server.route('/benchmark-inline-connect/<int:port>')
+    def benchmark_inline_connect(port):
+        return inline_connect(port, args.stall)
+
+    with stand_in_gateway(stall=True) as gateway:
+        idle = []
+        for thread in readers(base, 1.0, args.tabs, idle):
+            thread.join()
+        report('idle gateway, page loads', idle)
+
+        for mode in ('in request', 'background job'):
+            page_loads, clicks = [], []
+            threads = readers(base, args.seconds, args.tabs, page_loads)
+            for i in range(args.clicks):
+                if mode == 'in request':
+                    target, click_args = get, (
+                        base + '/benchmark-inline-connect/%d' % gateway.port,
+                        clicks)
+                else:
+                    target, click_args = post, (
+                        base + '/_dash-update-component',
+                        dash_callback(app, 'ibkr-async-conn-status', {
+                            'ibkr-async-conn-status.children': None,
+                            'master-client-id.value': 1,
+                            'port.value': gateway.port,
+                            'hostname.value': '127.0.0.1'
+                        }, {'ibkr-jobs.data': []}), clicks)
+                threads.append(threading.Thread(target=target,
+                                                args=click_args))
+                threads[-1].start()
+                threads.append(threading.Thread(target=post, args=(
+                    base + '/_dash-update-component',
+                    dash_callback(app, 'placeholder-div', {
+                        'trade-button.n_clicks': i,
+                        'contract-symbol.value': 'IVV',
+                        'contract-sec-type.value': 'STK',
+                        'contract-currency.value': 'USD',
+                        'contract-exchange.value': 'SMART',
+                        'contract-primary-exchange.value': 'ARCA',
+                        'order-action.value': 'BUY',
+                        'order-type.value': 'MKT',
+                        'order-size.value': 100,
+                        'order-lmt-price.value': None,
+                        'order-account.value': None
+                    }, {'ibkr-jobs.data': []}), clicks)))
+                threads[-1].start()
+                time.sleep(args.seconds / (2 * args.clicks))
+            for thread in threads:
+                thread.join()
+            report('stalled, %s: page loads' % mode, page_loads)
+            report('stalled, %s: clicks' % mode, clicks)
+        app.ibkr_async_conn.disconnect()
+        # The handshake notices within its 1 s socket timeout.
+        time.sleep(1.5)
+    print(f"background jobs: {app.ibkr_jobs.counts()}")
+    server.close()
@@ -0,0 +1,81 @@
+# Loads years of daily bars for many symbols from a local stand-in gateway,
+#   first through an empty bar_store (every series is fetched and written),
+#   then again from the warm store (no requests, memory-mapped reads), and
+#   compares that with fetching everything again.
+#
+# Run from the repository root:
+#   python benchmarks/bar_store_benchmark.py --symbols 300 --years 5
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+
+from interactive_trader import fetch_historical_data, ibkr_session
+from interactive_trader.bar_store import bar_store
+from interactive_trader.durations import duration_str, end_date_time
+# The stand-in gateway lives with the tests rather than in the package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tests.stand_in_gateway import stand_in_gateway
+from tests.helpers import stock
+import pandas as pd
+
+# The stand-in gateway doesn't enforce IB's pacing, and the session's
+#   historical pacer would otherwise hold the cold load to 60 requests per
+#   10 minutes.
+no_pacing = {'requests_per_interval': 10 ** 6, 'interval_sec': 1}
+
+
+def load_all(store, symbols, start, end, session):
+    bars = 0
+    for symbol in symbols:
+        bars += len(store.get_bars(stock(symbol), start, end,
+                                   session=session, pacing=no_pacing))
+    return bars
+
+
+def fetch_all(symbols, start, end, session):
+    bars = 0
+    for symbol in symbols:
+        bars += len(fetch_historical_data(
+            stock(symbol), endDateTime=end_date_time(end),
+            durationStr=duration_str(start, end), barSizeSetting='1 day',
+            session=session
+        ))
+    return bars
+
+
+def report(name, symbols, bars, elapsed, requests):
+    print(
+        f"{name:<14} {symbols:>5d} series  {bars:>9d} bars  "
+        f"{elapsed:8.3f} s  {requests:>5d} requests"
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--symbols', type=int, default=300)
+    parser.add_argument('--years', type=int, default=5)
+    args = parser.parse_args()
+
+    symbols = ['SYM%03d' % i for i in range(args.symbols)]
+    end = pd.Timestamp('2022-04-13')
+    start = end - pd.DateOffset(years=args.years)
+
+    with stand_in_gateway() as gw, tempfile.TemporaryDirectory() as root:
+        with ibkr_session(port=gw.port, client_id=1) as session:
+            store = bar_store(root)
+            for name, run in (
+                    ('cold store', lambda: load_all(store, symbols, start,
+                                                    end, session)),
+                    ('warm store', lambda: load_all(store, symbols, start,
+                                                    end, session)),
+                    ('refetch all', lambda: fetch_all(symbols, start, end,
+                                                      session))):
+                sent = len(gw.requests)
+                t = time.perf_counter()
+                bars = run()
+                report(name, args.symbols, bars, time.perf_counter() - t,
+                       len(gw.requests) - sent)
@@ -0,0 +1,88 @@
+# Sends the entry orders of the pep/ko backtest (blotter.py), one pair per
+#   signal date, to a local stand-in gateway with simulated round-trip
+#   latency: leg by leg with place_order, which waits for each leg's
+#   acknowledgement before the next is sent, and as basket_orders. Reports
+#   the leg-to-leg submit skew and acknowledgement skew per pair.
+#
+# Run from the repository root:
+#   python benchmarks/basket_orders_benchmark.py --latency 0.02
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# blotter.py lives at the repository root rather than in the package.
+repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_root)
+import blotter
+from interactive_trader import basket_order, ibkr_session, place_order
+from tests.stand_in_gateway import stand_in_gateway
+from tests.helpers import stock, market_order
+
+
+def legs_by_date(entry_orders):
+    pairs = []
+    for _, orders in entry_orders.groupby('DATE', sort=True):
+        legs = []
+        for _, row in orders.iterrows():
+            order = market_order(row['SIZE'])
+            order.action = row['ACTION']
+            legs.append((stock(row['SYMBOL'].upper()), order))
+        pairs.append(legs)
+    return pairs
+
+
+def leg_by_leg(session, pairs):
+    submit_skews, ack_skews = [], []
+    for legs in pairs:
+        sent, acked = [], []
+        for contract, order in legs:
+            sent.append(time.perf_counter())
+            place_order(contract, order, session=session)
+            acked.append(time.perf_counter())
+        submit_skews.append(sent[-1] - sent[0])
+        ack_skews.append(acked[-1] - acked[0])
+    return submit_skews, ack_skews
+
+
+def as_baskets(session, pairs):
+    submit_skews, ack_skews = [], []
+    for legs in pairs:
+        basket = basket_order(session, legs).submit()
+        assert basket.wait(10) == 'complete', basket.reason
+        basket.close()
+        report = basket.report()
+        submit_skews.append(report['submit_skew_ms'] / 1e3)
+        ack_skews.append(report['ack_skew_ms'] / 1e3)
+    return submit_skews, ack_skews
+
+
+def describe(skews):
+    ms = np.array(skews) * 1e3
+    return (f"p50 {np.percentile(ms, 50):8.3f} ms  "
+            f"p99 {np.percentile(ms, 99):8.3f} ms  max {ms.max():8.3f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, default=0.02,
+                        help='simulated gateway round trip in seconds')
+    args = parser.parse_args()
+
+    entry_orders = blotter.backtest_pipeline().run(
+        os.path.join(repo_root, 'pep_ko_ivv.csv'))['entry_orders']
+    pairs = legs_by_date(entry_orders)
+    with stand_in_gateway(response_delay=args.latency) as gateway:
+        with ibkr_session(port=gateway.port, client_id=1,
+                          timeout=30) as session:
+            for name, run in (('leg by leg', leg_by_leg),
+                              ('basket_order', as_baskets)):
+                start = time.perf_counter()
+                submit_skews, ack_skews = run(session, pairs)
+                elapsed = time.perf_counter() - start
+                print(f"{name:<13} {len(pairs)} pairs in {elapsed:7.3f} s")
+                print(f"  submit skew  {describe(submit_skews)}")
+                print(f"  ack skew     {describe(ack_skews)}")
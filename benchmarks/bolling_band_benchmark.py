@@ -0,0 +1,66 @@
+# Times get_bolling_band on a synthetic random-walk spread, in its exact
+#   (bit-for-bit with the old loop) and cumulative-sum modes, and compares
+#   with the row-by-row loop it replaced.
+#
+# The old loop is far slower, so by default it only gets a fraction of the
+#   rows; pass --legacy-rows to change that.
+#
+# Run from the repository root:
+#   python benchmarks/bolling_band_benchmark.py --rows 10000000
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# blotter.py lives at the repository root rather than in the package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from blotter import get_bolling_band
+
+
+def synthetic_spreads(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    spread = 60 + np.cumsum(rng.normal(0, 0.5, rows))
+    return pd.DataFrame({'a_Open': spread + 100,
+                         'b_Open': np.full(rows, 100.0), 'spread': spread})
+
+
+def legacy_bolling_band(df, n, k):
+    # get_bolling_band's loop before it was vectorized.
+    history, upper_band, lower_band = [], [], []
+    for spread in df['spread']:
+        history.append(spread)
+        if len(history) > n:
+            del history[0]
+        upper_band.append(statistics.mean(history) + k * np.std(history))
+        lower_band.append(statistics.mean(history) - k * np.std(history))
+    return upper_band, lower_band
+
+
+def report(name, rows, elapsed):
+    print(f"{name:<16} {rows:>10d} rows  {elapsed:8.3f} s  "
+          f"{rows / elapsed:14,.0f} rows/sec")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=10000000)
+    parser.add_argument('--legacy-rows', type=int, default=20000)
+    parser.add_argument('-n', type=int, default=20)
+    parser.add_argument('-k', type=float, default=2)
+    args = parser.parse_args()
+
+    df = synthetic_spreads(args.rows)
+    for name, exact in (('exact', True), ('cumulative sums', False)):
+        start = time.perf_counter()
+        get_bolling_band(df, args.n, args.k, 'a', 'b', exact=exact)
+        report(name, args.rows, time.perf_counter() - start)
+
+    legacy = df.iloc[:args.legacy_rows]
+    start = time.perf_counter()
+    legacy_bolling_band(legacy, args.n, args.k)
+    report('legacy loop', len(legacy), time.perf_counter() - start)
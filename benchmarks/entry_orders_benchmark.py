@@ -0,0 +1,100 @@
+# Times calculate_entry_orders on synthetic signal frames of several sizes
+#   and reports rows/sec, compared with the row-by-row loop it replaced.
+#
+# The old loop grows its blotter with pd.concat and is far slower, so it only
+#   runs on sizes up to --legacy-max-rows.
+#
+# Run from the repository root:
+#   python benchmarks/entry_orders_benchmark.py --rows 1000 100000 10000000
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# blotter.py lives at the repository root rather than in the package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from blotter import calculate_entry_orders
+
+
+def synthetic_signals(rows, seed=0):
+    # Signal frequencies roughly like pep/ko's: mostly 'false'.
+    rng = np.random.default_rng(seed)
+    signal = rng.choice(np.array(['false', 'x_up', 'x_down'], dtype=object),
+                        rows, p=[0.88, 0.06, 0.06])
+    dates = pd.date_range('2000-01-03', periods=rows, freq='min')
+    return pd.DataFrame({
+        'a_Open': 100 + rng.random(rows), 'b_Open': 40 + rng.random(rows),
+        'signal': signal
+    }, index=pd.Index(dates.strftime('%Y-%m-%d %H:%M'), name='Date'))
+
+
+def legacy_entry_orders(fsignal, stock_a, stock_b, size_a, size_b,
+                        lmt_price_a, lmt_status_a, lmt_price_b, lmt_status_b):
+    # calculate_entry_orders as it was before it was vectorized.
+    df = fsignal.reset_index()
+    series = df[["Date", stock_a + "_Open", stock_b + "_Open"]]
+    signals = df["signal"]
+    series = series.drop(series.index[0]).reset_index(drop=True)
+    signals = signals.drop(signals.index[-1]).reset_index(drop=True)
+    temp = pd.DataFrame(series)
+    temp = temp.assign(signal=pd.Series(signals, index=temp.index))
+    temp.set_index("Date", inplace=True, drop=True)
+    entry_blotter = pd.DataFrame(columns=["DATE", "SYMBOL", "ACTION", "SIZE",
+                                          "PRICE", "TRIP", "LMT_PRICE",
+                                          "STATUS"])
+    position = 0
+    for i in range(len(temp)):
+        signal = temp.iloc[i]['signal']
+        if signal == "x_up":
+            action_a, action_b = "SELL", "BUY"
+        elif signal == "x_down":
+            action_a, action_b = "BUY", "SELL"
+        if (position != 1 and signal == "x_up") or \
+                (position != -1 and signal == "x_down"):
+            for symbol, action, size, lmt_price, status in (
+                    (stock_a, action_a, size_a, lmt_price_a, lmt_status_a),
+                    (stock_b, action_b, size_b, lmt_price_b, lmt_status_b)):
+                entry_blotter = pd.concat([entry_blotter, pd.DataFrame({
+                    "DATE": [temp.index[i]], "SYMBOL": [symbol],
+                    "ACTION": [action], "SIZE": [size],
+                    "PRICE": [temp.iloc[i][symbol + "_Open"]],
+                    "TRIP": ["Entry"], "LMT_PRICE": [lmt_price],
+                    "STATUS": [status]
+                })])
+        if signal == "x_up":
+            position = 1
+        elif signal == "x_down":
+            position = -1
+        elif signal == "false":
+            position = 0
+    return entry_blotter.set_index("DATE")
+
+
+def report(name, rows, entries, elapsed):
+    print(f"{name:<12} {rows:>10d} rows  {entries:>9d} orders  "
+          f"{elapsed:8.3f} s  {rows / elapsed:14,.0f} rows/sec")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+',
+                        default=[1000, 100000, 10000000])
+    parser.add_argument('--legacy-max-rows', type=int, default=10000)
+    args = parser.parse_args()
+
+    params = ('a', 'b', 1000, 1000, 'N/A', 'FILLED', 'N/A', 'FILLED')
+    for rows in args.rows:
+        fsignal = synthetic_signals(rows)
+        start = time.perf_counter()
+        entries = calculate_entry_orders(fsignal, *params)
+        report('vectorized', rows, len(entries), time.perf_counter() - start)
+        if rows <= args.legacy_max_rows:
+            start = time.perf_counter()
+            legacy = legacy_entry_orders(fsignal, *params)
+            report('legacy loop', rows, len(legacy),
+                   time.perf_counter() - start)
+            assert legacy.to_csv() == entries.to_csv()
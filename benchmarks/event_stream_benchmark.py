@@ -0,0 +1,96 @@
+# Serves app.py with waitress, opens one /events stream per simulated
+#   browser tab and measures how long each orderStatus callback takes to
+#   reach every tab, against the up to --poll-interval a tab waited for the
+#   old dcc.Interval poll. Time spent rendering in a real browser is not
+#   included.
+#
+# Run from the repository root:
+#   python benchmarks/event_stream_benchmark.py --tabs 50 --events 200
+
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+import numpy as np
+from waitress import create_server
+
+# app.py lives at the repository root rather than in the package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app
+
+
+def tab(port, ready, received):
+    # One browser tab: reads the stream and stamps each order_status event
+    #   with its version and arrival time.
+    conn = socket.create_connection(('localhost', port))
+    conn.sendall(b'GET /events HTTP/1.1\r\nHost: localhost\r\n'
+                 b'Accept: text/event-stream\r\n\r\n')
+    stream = conn.makefile('rb')
+    event = None
+    for line in stream:
+        line = line.strip()
+        if line.startswith(b'event: '):
+            event = line[7:].decode()
+            if event == 'orders_snapshot':
+                ready.release()
+        elif line.startswith(b'data: ') and event == 'order_status':
+            received.append((json.loads(line[6:])['version'],
+                             time.perf_counter()))
+        elif not line:
+            event = None
+    conn.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tabs', type=int, default=50)
+    parser.add_argument('--events', type=int, default=200)
+    parser.add_argument('--gap', type=float, default=0.01,
+                        help='seconds between orderStatus callbacks')
+    parser.add_argument('--poll-interval', type=float, default=5.0,
+                        help="the dcc.Interval's period, for comparison")
+    args = parser.parse_args()
+
+    server = create_server(app.server, host='localhost', port=0,
+                           threads=args.tabs + 8)
+    port = server.effective_port
+    threading.Thread(target=server.run, daemon=True).start()
+
+    ready = threading.Semaphore(0)
+    received = [[] for _ in range(args.tabs)]
+    for i in range(args.tabs):
+        threading.Thread(target=tab, args=(port, ready, received[i]),
+                         daemon=True).start()
+    for _ in range(args.tabs):
+        ready.acquire()
+
+    conn = app.ibkr_async_conn
+    sent = {}
+    for i in range(args.events):
+        sent[conn.order_states.version + 1] = time.perf_counter()
+        conn.orderStatus(i, 'Submitted', 0, 100, 0.0, 1000 + i, 0, 0.0, 1,
+                         '', 0.0)
+        time.sleep(args.gap)
+    deadline = time.perf_counter() + 10
+    while time.perf_counter() < deadline and \
+            sum(map(len, received)) < args.tabs * args.events:
+        time.sleep(0.05)
+    server.close()
+
+    latencies = np.array([
+        (arrived - sent[version]) * 1e3
+        for tab_received in received for version, arrived in tab_received
+    ])
+    delivered = len(latencies)
+    print(f"{args.tabs} tabs, {args.events} orderStatus events, "
+          f"{delivered}/{args.tabs * args.events} delivered, "
+          f"{app.ibkr_events.resyncs} resyncs")
+    print(f"push   p50 {np.percentile(latencies, 50):8.2f} ms  "
+          f"p99 {np.percentile(latencies, 99):8.2f} ms  "
+          f"max {latencies.max():8.2f} ms")
+    print(f"poll   mean {args.poll_interval * 500:7.0f} ms  "
+          f"max {args.poll_interval * 1e3:8.0f} ms")
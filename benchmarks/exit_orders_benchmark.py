@@ -0,0 +1,142 @@
+# Runs the pair-trading pipeline on synthetic daily prices for two stocks and
+#   times calculate_exit_orders, compared with the nested scan it replaced.
+#
+# The old scan is O(entries x bars), so it only runs on sizes up to
+#   --legacy-max-rows.
+#
+# Run from the repository root:
+#   python benchmarks/exit_orders_benchmark.py --rows 1000 100000 1000000
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# blotter.py lives at the repository root rather than in the package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from blotter import calculate_entry_orders, calculate_exit_orders
+from blotter import get_bolling_band, get_full_signal, get_spread
+
+
+def synthetic_prices(rows, seed=0):
+    # pep/ko-like prices; the old scan only knows those two symbols.
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('1990-01-01', periods=rows, freq='D')
+    columns = {}
+    for stock, level in (('pep', 110.0), ('ko', 45.0)):
+        close = level * np.exp(np.cumsum(rng.normal(0, 0.01, rows)))
+        columns[stock + '_Open'] = close * (1 + rng.normal(0, 0.003, rows))
+        columns[stock + '_High'] = close * (1 + rng.random(rows) * 0.01)
+        columns[stock + '_Low'] = close * (1 - rng.random(rows) * 0.01)
+        columns[stock + '_Close'] = close
+    return pd.DataFrame(columns,
+                        index=pd.Index(dates.strftime('%Y-%m-%d'), name='Date'))
+
+
+def legacy_exit_orders(entry_blotter, fsignal, hpd, timeout, stop_loss):
+    # calculate_exit_orders' nested scan, as it was before it was indexed.
+    exit_list = []
+    for i in range(0, len(entry_blotter), 2):
+        entry_date = entry_blotter.index[i]
+        entry_price_pep = entry_blotter.iloc[i]["PRICE"]
+        entry_price_ko = entry_blotter.iloc[i + 1]["PRICE"]
+        entry_stock_a = entry_blotter.iloc[i]['SYMBOL']
+        entry_stock_b = entry_blotter.iloc[i + 1]['SYMBOL']
+
+        def exit_info(signal, date, price_a, price_b):
+            action_a, action_b = (("BUY", "SELL") if signal == "x_up"
+                                  else ("SELL", "BUY"))
+            for row, action, price in ((i, action_a, price_a),
+                                       (i + 1, action_b, price_b)):
+                exit_list.append([
+                    date, entry_blotter.iloc[row]['SYMBOL'], action,
+                    entry_blotter.iloc[row]['SIZE'], price, "Exit",
+                    entry_blotter.iloc[row]["LMT_PRICE"],
+                    entry_blotter.iloc[row]["STATUS"]
+                ])
+
+        for j in range(len(fsignal)):
+            if fsignal.index[j] != entry_date:
+                continue
+            signal = fsignal.iloc[j - 1]['signal']
+            interval = 0
+            for k in range(0, timeout):
+                row = j + k + 1
+                if row + 1 >= len(fsignal):
+                    # The old code raised IndexError here.
+                    interval = -1
+                    break
+                temp_date = fsignal.index[row]
+                spread = fsignal.iloc[row]['spread']
+                upper = fsignal.iloc[row]['upper_band']
+                lower = fsignal.iloc[row]['lower_band']
+                low_price_p = hpd.at[temp_date, 'pep_Low']
+                low_price_k = hpd.at[temp_date, 'ko_Low']
+                exit_date = fsignal.index[row + 1]
+                exit_price_a = fsignal.iloc[row + 1][entry_stock_a + "_Open"]
+                exit_price_b = fsignal.iloc[row + 1][entry_stock_b + "_Open"]
+                if signal == "x_up":
+                    loss_price_p = entry_price_pep * (1 + stop_loss)
+                    loss_price_k = entry_price_ko * (1 - stop_loss)
+                    if (low_price_p >= loss_price_p) & \
+                            (low_price_k <= loss_price_k):
+                        exit_info(signal, exit_date, exit_price_a,
+                                  exit_price_b)
+                        break
+                elif signal == "x_down":
+                    loss_price_p = entry_price_pep * (1 - stop_loss)
+                    loss_price_k = entry_price_pep * (1 + stop_loss)
+                    if (low_price_p <= loss_price_p) & \
+                            (low_price_k >= loss_price_k):
+                        exit_info(signal, exit_date, exit_price_a,
+                                  exit_price_b)
+                        break
+                if (spread < upper) & (spread > lower):
+                    exit_info(signal, exit_date, exit_price_a, exit_price_b)
+                    break
+                interval = interval + 1
+            if interval == timeout:
+                date_timeout = fsignal.index[j + timeout]
+                exit_info(signal, date_timeout,
+                          hpd.at[date_timeout, entry_stock_a + '_Close'],
+                          hpd.at[date_timeout, entry_stock_b + '_Close'])
+                break
+    exit_blotter = pd.DataFrame(exit_list, columns=[
+        "DATE", "SYMBOL", "ACTION", "SIZE", "PRICE", "TRIP", "LMT_PRICE",
+        "STATUS"])
+    return exit_blotter.set_index("DATE")
+
+
+def report(name, rows, trades, elapsed):
+    print(f"{name:<12} {rows:>9d} bars  {trades:>8d} trades  "
+          f"{elapsed:8.3f} s  {trades / elapsed:12,.0f} trades/sec")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+',
+                        default=[1000, 100000, 1000000])
+    parser.add_argument('--legacy-max-rows', type=int, default=2000)
+    parser.add_argument('--timeout', type=int, default=2)
+    parser.add_argument('--stop-loss', type=float, default=0.1)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        hpd = get_spread(synthetic_prices(rows), 'pep', 'ko')
+        fsignal = get_full_signal(get_bolling_band(hpd, 20, 2, 'pep', 'ko'))
+        entries = calculate_entry_orders(fsignal, 'pep', 'ko', 1000, 1000,
+                                         'N/A', 'FILLED', 'N/A', 'FILLED')
+        trades = len(entries) // 2
+        start = time.perf_counter()
+        exits = calculate_exit_orders(entries, fsignal, hpd, args.timeout,
+                                      args.stop_loss)
+        report('indexed', rows, trades, time.perf_counter() - start)
+        if rows <= args.legacy_max_rows:
+            start = time.perf_counter()
+            legacy = legacy_exit_orders(entries, fsignal, hpd, args.timeout,
+                                        args.stop_loss)
+            report('nested scan', rows, trades, time.perf_counter() - start)
+            assert legacy.to_csv() == exits.drop(columns='TRADE').to_csv()
@@ -0,0 +1,105 @@
+# Feeds synthetic BarData objects through ibkr_app.historicalData and reports
+#   bars/sec and peak memory, compared with the previous implementation that
+#   concatenated a one-row DataFrame onto historical_data for every bar.
+#
+# The previous implementation is quadratic in the number of bars, so by default
+#   it only gets a fraction of the bars; pass --legacy-bars to change that.
+#
+# Run from the repository root:
+#   python benchmarks/historical_data_buffer_benchmark.py --bars 500000
+
+import argparse
+import time
+import tracemalloc
+
+import pandas as pd
+from ibapi.common import BarData
+
+from interactive_trader import ibkr_app
+
+
+class legacy_ibkr_app(ibkr_app):
+    # historicalData / historicalDataEnd as they were before the bar buffer.
+    def historicalData(self, reqId, bar):
+        self.historical_data = pd.concat(
+            [
+                self.historical_data,
+                pd.DataFrame(
+                    {
+                        'date': [bar.date],
+                        'open': [bar.open],
+                        'high': [bar.high],
+                        'low': [bar.low],
+                        'close': [bar.close],
+                    }
+                )
+            ],
+            ignore_index=True
+        )
+
+    def historicalDataEnd(self, reqId, start, end):
+        self.historical_data_end = reqId
+
+
+def make_bars(n_bars):
+    bars = []
+    start = pd.Timestamp('2021-01-04 09:30:00')
+    timestamps = pd.date_range(start, periods=n_bars, freq='min')
+    for i, ts in enumerate(timestamps.strftime('%Y%m%d  %H:%M:%S')):
+        bar = BarData()
+        bar.date = ts
+        bar.open = 100.0 + (i % 97) * 0.01
+        bar.high = bar.open + 0.05
+        bar.low = bar.open - 0.05
+        bar.close = bar.open + 0.01
+        bar.volume = 100 + i % 13
+        bar.barCount = 10 + i % 7
+        bar.average = bar.open + 0.005
+        bars.append(bar)
+    return bars
+
+
+def feed(app_class, bars, req_id=1):
+    app = app_class()
+    for bar in bars:
+        app.historicalData(req_id, bar)
+    app.historicalDataEnd(req_id, '', '')
+    return app.historical_data
+
+
+def run(app_class, bars):
+    # Timed and traced separately: tracemalloc slows allocation-heavy code
+    #   down enough to distort bars/sec.
+    start = time.perf_counter()
+    df = feed(app_class, bars)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    feed(app_class, bars)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, df
+
+
+def report(name, n_bars, elapsed, peak):
+    print(
+        f"{name:<8} {n_bars:>9,d} bars  {elapsed:9.3f} s  "
+        f"{n_bars / elapsed:>12,.0f} bars/sec  "
+        f"peak {peak / 2 ** 20:8.1f} MiB"
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--bars', type=int, default=500000)
+    parser.add_argument('--legacy-bars', type=int, default=5000)
+    args = parser.parse_args()
+
+    bars = make_bars(max(args.bars, args.legacy_bars))
+
+    elapsed, peak, df = run(ibkr_app, bars[:args.bars])
+    report('buffer', args.bars, elapsed, peak)
+    assert len(df) == args.bars
+
+    if args.legacy_bars:
+        elapsed, peak, df = run(legacy_ibkr_app, bars[:args.legacy_bars])
+        report('legacy', args.legacy_bars, elapsed, peak)
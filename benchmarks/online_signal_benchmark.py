@@ -0,0 +1,73 @@
+# Streams synthetic daily bars for a pair through pair_signal_engine and
+#   reports the time per bar, in exact and running-sum modes, next to
+#   re-running the batch pipeline on the whole history for each new bar.
+#
+# Run from the repository root:
+#   python benchmarks/online_signal_benchmark.py --bars 100000
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from ibapi.common import BarData
+
+# blotter.py and online_signal.py live at the repository root rather than in
+#   the package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from blotter import get_bolling_band, get_full_signal, get_spread
+from online_signal import pair_signal_engine
+
+
+def synthetic_bars(count, level, seed):
+    rng = np.random.default_rng(seed)
+    close = level * np.exp(np.cumsum(rng.normal(0, 0.01, count)))
+    bars = []
+    for i in range(count):
+        bar = BarData()
+        bar.date = i
+        bar.open = close[i] * (1 + rng.normal(0, 0.003))
+        bar.high = close[i] * 1.005
+        bar.low = close[i] * 0.995
+        bar.close = close[i]
+        bars.append(bar)
+    return bars
+
+
+def batch_signal(bars_a, bars_b, n, k):
+    columns = {}
+    for stock, bars in (('a', bars_a), ('b', bars_b)):
+        for field in ('Open', 'High', 'Low', 'Close'):
+            columns[stock + '_' + field] = [getattr(bar, field.lower())
+                                            for bar in bars]
+    hpd = get_spread(pd.DataFrame(columns), 'a', 'b')
+    return get_full_signal(get_bolling_band(hpd, n, k, 'a', 'b'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--bars', type=int, default=100000)
+    parser.add_argument('--batch-bars', type=int, default=2000,
+                        help='history length for the batch comparison')
+    parser.add_argument('-n', type=int, default=20)
+    parser.add_argument('-k', type=float, default=2)
+    args = parser.parse_args()
+
+    bars_a = synthetic_bars(args.bars, 110.0, 0)
+    bars_b = synthetic_bars(args.bars, 45.0, 1)
+    for name, exact in (('exact', True), ('running sums', False)):
+        engine = pair_signal_engine('a', 'b', args.n, args.k, exact=exact)
+        start = time.perf_counter()
+        for bar_a, bar_b in zip(bars_a, bars_b):
+            engine.update(bar_a.date, bar_a, bar_b)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<14} {elapsed / args.bars * 1e6:10.1f} us/bar")
+
+    history = args.batch_bars
+    start = time.perf_counter()
+    batch_signal(bars_a[:history], bars_b[:history], args.n, args.k)
+    elapsed = time.perf_counter() - start
+    print(f"{'batch rerun':<14} {elapsed * 1e6:10.1f} us/bar "
+          f"(on {history} bars of history)")
@@ -0,0 +1,77 @@
+# Places a batch of orders on a local stand-in gateway with simulated
+#   round-trip latency: first as app.py used to, a reqIds round trip before
+#   each order (waited for here, so ids are never reused) and the order's
+#   acknowledgement awaited before the next; then pipelined through
+#   order_submitter with locally allocated ids. Reports orders/sec and
+#   submit-to-acknowledge latency.
+#
+# Run from the repository root:
+#   python benchmarks/order_submitter_benchmark.py --orders 1000 --latency 0.005
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from interactive_trader import ibkr_session, order_submitter
+# The stand-in gateway lives with the tests rather than in the package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tests.stand_in_gateway import stand_in_gateway
+from tests.helpers import stock, market_order
+
+
+def round_trip_per_order(session, orders):
+    app = session.app
+    latencies = []
+    for contract, order in orders:
+        ready = session.request('next_valid_id')
+        app.reqIds(1)
+        order_id = session.wait(ready, 'benchmark', 'next_valid_id')
+        ack = session.request(('order', order_id))
+        sent = time.perf_counter()
+        app.placeOrder(order_id, contract, order)
+        session.wait(ack, 'benchmark', 'order_status')
+        latencies.append(time.perf_counter() - sent)
+    return {'acked': len(latencies),
+            'p50_ms': np.percentile(latencies, 50) * 1e3,
+            'p99_ms': np.percentile(latencies, 99) * 1e3}
+
+
+def pipelined(session, orders, rate_limit):
+    with order_submitter(session.app, rate_limit=rate_limit) as submitter:
+        for contract, order in orders:
+            submitter.submit(contract, order)
+        submitter.wait(timeout=60)
+        return submitter.latency_stats()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--orders', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.005,
+                        help='simulated gateway round trip in seconds')
+    parser.add_argument('--rate-limit', type=float, default=None,
+                        help='orders per second for order_submitter '
+                             '(default: unpaced)')
+    args = parser.parse_args()
+
+    orders = [(stock('SYM%d' % (i % 50)), market_order())
+              for i in range(args.orders)]
+    with stand_in_gateway(response_delay=args.latency) as gateway:
+        with ibkr_session(port=gateway.port, client_id=1,
+                          timeout=60) as session:
+            for name, run in (
+                    ('reqIds per order', lambda: round_trip_per_order(
+                        session, orders)),
+                    ('order_submitter', lambda: pipelined(
+                        session, orders, args.rate_limit))):
+                start = time.perf_counter()
+                stats = run()
+                elapsed = time.perf_counter() - start
+                print(f"{name:<17} {stats['acked']:>6d} acked  "
+                      f"{elapsed:8.3f} s  "
+                      f"{stats['acked'] / elapsed:9.1f} orders/sec  "
+                      f"ack p50 {stats['p50_ms']:7.2f} ms  "
+                      f"p99 {stats['p99_ms']:7.2f} ms")
@@ -0,0 +1,73 @@
+# Places orders on a local stand-in gateway while a burst of historical
+#   data requests is going out on the same connection, with every message
+#   held to IB's rate cap: once through a single FIFO queue, once through
+#   outbound_scheduler's priority lanes. Reports each order's
+#   placeOrder-to-acknowledgement latency and the queue wait per lane.
+#
+# Run from the repository root:
+#   python benchmarks/outbound_scheduler_benchmark.py --history 200 --orders 20
+
+import argparse
+import os
+import sys
+import time
+
+
+from interactive_trader import ibkr_session, order_submitter
+from interactive_trader import outbound_scheduler
+# The stand-in gateway lives with the tests rather than in the package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tests.stand_in_gateway import stand_in_gateway
+from tests.helpers import stock, market_order
+
+
+def run(session, scheduler, history, orders, gap):
+    app = session.app
+    with scheduler, order_submitter(app, rate_limit=None) as submitter:
+        for _ in range(history):
+            app.reqHistoricalData(
+                session.next_req_id(), stock('IVV'), '', '1 D', '1 hour',
+                'MIDPOINT', True, formatDate=1, keepUpToDate=False,
+                chartOptions=[])
+        for i in range(orders):
+            submitter.submit(stock('SYM%d' % i), market_order())
+            time.sleep(gap)
+        submitter.wait(timeout=history)
+    # Leaving the scheduler's block sends the rest of the history first.
+    return submitter.latency_stats(), scheduler.stats()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--history', type=int, default=200,
+                        help='historical requests sent in one burst')
+    parser.add_argument('--orders', type=int, default=20)
+    parser.add_argument('--gap', type=float, default=0.1,
+                        help='seconds between orders')
+    parser.add_argument('--max-rate', type=float, default=45,
+                        help='messages per second on the connection')
+    args = parser.parse_args()
+
+    with stand_in_gateway() as gateway:
+        with ibkr_session(port=gateway.port, client_id=1,
+                          timeout=60) as session:
+            for name, scheduler in (
+                    ('one queue', outbound_scheduler(
+                        session.app, max_rate=args.max_rate, lane_rates={},
+                        lane_for=lambda message_id: 'historical')),
+                    ('priority lanes', outbound_scheduler(
+                        session.app, max_rate=args.max_rate))):
+                start = time.perf_counter()
+                acks, lanes = run(session, scheduler, args.history,
+                                  args.orders, args.gap)
+                elapsed = time.perf_counter() - start
+                print(f"{name}: {elapsed:.2f} s, {acks['acked']} orders "
+                      f"acked, ack p50 {acks['p50_ms']:8.1f} ms  "
+                      f"p99 {acks['p99_ms']:8.1f} ms  "
+                      f"max {acks['max_ms']:8.1f} ms")
+                for lane in ('orders', 'historical'):
+                    stats = lanes[lane]
+                    if stats['sent']:
+                        print(f"  {lane:<11} {stats['sent']:5d} sent  "
+                              f"queue wait p50 {stats['wait_p50_ms']:8.1f} "
+                              f"ms  p99 {stats['wait_p99_ms']:8.1f} ms")
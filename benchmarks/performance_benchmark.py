@@ -0,0 +1,66 @@
+# Backtests the pair-trading pipeline on synthetic daily prices of several
+#   lengths and times performance(), equity_curve() and trip_pnl() on the
+#   resulting blotters.
+#
+# Run from the repository root:
+#   python benchmarks/performance_benchmark.py --rows 1000 100000 1000000
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# blotter.py and performance.py live at the repository root rather than in
+#   the package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from blotter import calculate_entry_orders, calculate_exit_orders
+from blotter import get_bolling_band, get_full_signal, get_spread
+from blotter import get_whole_orders
+from performance import equity_curve, performance, trip_pnl
+
+
+def synthetic_prices(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('1990-01-01', periods=rows, freq='D')
+    columns = {}
+    for stock, level in (('pep', 110.0), ('ko', 45.0)):
+        close = level * np.exp(np.cumsum(rng.normal(0, 0.01, rows)))
+        columns[stock + '_Open'] = close * (1 + rng.normal(0, 0.003, rows))
+        columns[stock + '_High'] = close * (1 + rng.random(rows) * 0.01)
+        columns[stock + '_Low'] = close * (1 - rng.random(rows) * 0.01)
+        columns[stock + '_Close'] = close
+    return pd.DataFrame(columns,
+                        index=pd.Index(dates.strftime('%Y-%m-%d'), name='Date'))
+
+
+def report(name, rows, trades, elapsed):
+    print(f"{name:<13} {rows:>9d} bars  {trades:>8d} trades  "
+          f"{elapsed * 1000:10.1f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+',
+                        default=[1000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        hpd = get_spread(synthetic_prices(rows), 'pep', 'ko')
+        fsignal = get_full_signal(get_bolling_band(hpd, 20, 2, 'pep', 'ko'))
+        entries = calculate_entry_orders(fsignal, 'pep', 'ko', 1000, 1000,
+                                         'N/A', 'FILLED', 'N/A', 'FILLED')
+        exits = calculate_exit_orders(entries, fsignal, hpd, 2, 0.1)
+        orders = get_whole_orders(entries, exits)
+        trades = len(entries) // 2
+        for name, run in (('performance', lambda: performance(orders, hpd)),
+                          ('equity_curve', lambda: equity_curve(orders, hpd)),
+                          ('trip_pnl', lambda: trip_pnl(orders))):
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                run()
+            report(name, rows, trades,
+                   (time.perf_counter() - start) / args.repeat)
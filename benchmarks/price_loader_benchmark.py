@@ -0,0 +1,64 @@
+# Writes a synthetic wide price CSV and times onboard_historical_price_data
+#   parsing it, writing its .npcache sidecar, and loading from the sidecar,
+#   for all columns and for the four columns one pair needs.
+#
+# Run from the repository root:
+#   python benchmarks/price_loader_benchmark.py --rows 100000 --symbols 50
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# blotter.py lives at the repository root rather than in the package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from blotter import onboard_historical_price_data
+
+
+def write_prices(path, rows, symbols, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('1990-01-01', periods=rows, freq='D')
+    columns = {}
+    for s in range(symbols):
+        close = 50 * np.exp(np.cumsum(rng.normal(0, 0.01, rows)))
+        for field, scale in (('Open', 0.003), ('High', 0.005),
+                             ('Low', -0.005), ('Close', 0.0)):
+            columns[f's{s}_{field}'] = close * (1 + scale * rng.random(rows))
+        columns[f's{s}_Volume'] = rng.integers(1000, 100000, rows)
+    # Newest first, like pep_ko_ivv.csv.
+    df = pd.DataFrame(columns, index=pd.Index(dates, name='Date'))[::-1]
+    df.to_csv(path, float_format='%.4f')
+
+
+def timed(name, run):
+    start = time.perf_counter()
+    df = run()
+    print(f"{name:<28} {time.perf_counter() - start:8.3f} s  "
+          f"{df.shape[0]:>9d} x {df.shape[1]:<4d}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--symbols', type=int, default=50)
+    args = parser.parse_args()
+
+    pair = ['s0_Open', 's0_Close', 's1_Open', 's1_Close']
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'prices.csv')
+        write_prices(path, args.rows, args.symbols)
+        print(f"{os.path.getsize(path) / 1e6:.1f} MB CSV")
+        timed('parse, all columns', lambda: onboard_historical_price_data(
+            path, cache=False))
+        timed('parse, one pair', lambda: onboard_historical_price_data(
+            path, pair, cache=False))
+        timed('parse + write cache', lambda: onboard_historical_price_data(
+            path))
+        timed('cached, all columns', lambda: onboard_historical_price_data(
+            path))
+        timed('cached, one pair', lambda: onboard_historical_price_data(
+            path, pair))
@@ -0,0 +1,55 @@
+# Screens every pair in a synthetic wide price matrix and reports pairs/sec
+#   and peak memory.
+#
+# Run from the repository root:
+#   python benchmarks/screener_benchmark.py --symbols 500 --days 2500
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+# screener.py lives at the repository root rather than in the package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from screener import screen_pairs
+
+
+def synthetic_wide_prices(symbols, days, seed=0):
+    rng = np.random.default_rng(seed)
+    # A common market factor plus idiosyncratic noise, so correlations vary.
+    market = np.cumsum(rng.normal(0, 0.01, days))[:, None]
+    close = 50 * np.exp(market * rng.uniform(0.2, 1.5, symbols) +
+                        np.cumsum(rng.normal(0, 0.01, (days, symbols)),
+                                  axis=0))
+    columns = {}
+    for i in range(symbols):
+        columns['s%03d_High' % i] = close[:, i] * (1 + rng.random(days) / 100)
+        columns['s%03d_Low' % i] = close[:, i] * (1 - rng.random(days) / 100)
+        columns['s%03d_Close' % i] = close[:, i]
+    dates = pd.date_range('2012-01-03', periods=days, freq='B')
+    return pd.DataFrame(columns,
+                        index=pd.Index(dates.strftime('%Y-%m-%d'), name='Date'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--symbols', type=int, default=500)
+    parser.add_argument('--days', type=int, default=2500)
+    parser.add_argument('--pairs-per-chunk', type=int, default=1000)
+    args = parser.parse_args()
+
+    prices = synthetic_wide_prices(args.symbols, args.days)
+    tracemalloc.start()
+    start = time.perf_counter()
+    ranking = screen_pairs(prices, pairs_per_chunk=args.pairs_per_chunk)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{args.symbols} symbols x {args.days} days: {len(ranking)} pairs "
+          f"in {elapsed:.2f} s ({len(ranking) / elapsed:,.0f} pairs/sec), "
+          f"peak {peak / 2 ** 20:.0f} MiB")
+    print(ranking.head(10).to_string())
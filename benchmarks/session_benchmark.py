@@ -0,0 +1,54 @@
+# Runs sequential fetch_contract_details calls against a local stand-in
+#   gateway, once connecting per call (how the synchronous functions used to
+#   work) and once over a single shared ibkr_session.
+#
+# Run from the repository root:
+#   python benchmarks/session_benchmark.py --calls 100 --handshake-delay 0.05
+
+import argparse
+import os
+import sys
+import time
+
+
+from interactive_trader import fetch_contract_details, ibkr_session
+# The stand-in gateway lives with the tests rather than in the package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tests.stand_in_gateway import stand_in_gateway
+from tests.helpers import eur_usd
+
+
+def connect_per_call(port, calls):
+    for i in range(calls):
+        with ibkr_session(port=port, client_id=i + 1) as session:
+            fetch_contract_details(eur_usd(), session=session, cache=None)
+
+
+def shared_session(port, calls):
+    with ibkr_session(port=port, client_id=1) as session:
+        for _ in range(calls):
+            fetch_contract_details(eur_usd(), session=session, cache=None)
+
+
+def report(name, calls, elapsed, connections):
+    print(
+        f"{name:<18} {calls:>5d} calls  {elapsed:8.3f} s  "
+        f"{elapsed / calls * 1000:8.2f} ms/call  {connections:>4d} connections"
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=100)
+    parser.add_argument('--handshake-delay', type=float, default=0.0,
+                        help='seconds the stand-in waits before answering '
+                             'a new connection')
+    args = parser.parse_args()
+
+    for name, run in (('connect per call', connect_per_call),
+                      ('shared session', shared_session)):
+        with stand_in_gateway(handshake_delay=args.handshake_delay) as gw:
+            start = time.perf_counter()
+            run(gw.port, args.calls)
+            report(name, args.calls, time.perf_counter() - start,
+                   gw.connections)
@@ -0,0 +1,54 @@
+# Runs the same parameter sweep on synthetic pep/ko prices with growing
+#   worker counts and reports backtests/sec and speedup over one worker.
+#
+# Run from the repository root:
+#   python benchmarks/sweep_benchmark.py --rows 20000 --workers 1 2 4 8
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# sweep.py lives at the repository root rather than in the package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sweep import run_sweep
+
+
+def synthetic_prices(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('1990-01-01', periods=rows, freq='D')
+    columns = {}
+    for stock, level in (('pep', 110.0), ('ko', 45.0)):
+        close = level * np.exp(np.cumsum(rng.normal(0, 0.01, rows)))
+        columns[stock + '_Open'] = close * (1 + rng.normal(0, 0.003, rows))
+        columns[stock + '_High'] = close * (1 + rng.random(rows) * 0.01)
+        columns[stock + '_Low'] = close * (1 - rng.random(rows) * 0.01)
+        columns[stock + '_Close'] = close
+    return pd.DataFrame(columns,
+                        index=pd.Index(dates.strftime('%Y-%m-%d'), name='Date'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    prices = synthetic_prices(args.rows)
+    grid = dict(n=[10, 15, 20, 30, 40, 60], k=[1.0, 1.5, 2.0, 2.5],
+                timeout=[1, 2, 5, 10, 20], stop_loss=[0.02, 0.05, 0.1])
+    backtests = np.prod([len(values) for values in grid.values()])
+    base = None
+    for workers in args.workers:
+        start = time.perf_counter()
+        results = run_sweep(prices, 'pep', 'ko', workers=workers, **grid)
+        elapsed = time.perf_counter() - start
+        assert len(results) == backtests
+        base = base or elapsed
+        print(f"{workers:>3d} workers  {backtests:>5d} backtests  "
+              f"{elapsed:8.3f} s  {backtests / elapsed:8.1f} backtests/sec  "
+              f"{base / elapsed:5.2f}x")
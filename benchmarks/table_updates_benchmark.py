@@ -0,0 +1,90 @@
+# Simulates a trading session on an order_state_store and an error_log and
+#   compares what the blotter and error table callbacks send per tick: every
+#   row and the column list each time, as app.py used to, versus the
+#   no_update / Patch deltas from table_updates.
+#
+# Run from the repository root:
+#   python benchmarks/table_updates_benchmark.py --ticks 2000 --orders 5000
+
+import argparse
+import os
+import random
+import sys
+import time
+
+from dash import no_update
+from plotly.io.json import to_json_plotly
+
+# table_updates.py lives at the repository root rather than in the package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from interactive_trader.error_log import error_log
+from interactive_trader.order_state_store import order_state_store
+from table_updates import error_rows_update, order_rows_update
+from table_updates import update_metrics
+
+
+def full_update(frame):
+    # The old callbacks' return value.
+    data = frame.to_dict('records')
+    columns = [{"name": i, "id": i} for i in frame.columns]
+    return len(to_json_plotly([data, columns]))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--ticks', type=int, default=2000)
+    parser.add_argument('--orders', type=int, default=5000)
+    parser.add_argument('--updates-per-tick', type=float, default=2.0,
+                        help='average order and error events per tick')
+    parser.add_argument('--idle-share', type=float, default=0.7,
+                        help='share of ticks where nothing happens')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    orders = order_state_store()
+    errors = error_log(capacity=1000)
+    metrics = update_metrics()
+    seen_orders = seen_errors = None
+    old_bytes = 0
+    old_seconds = new_seconds = 0.0
+    next_order = 0
+    for tick in range(args.ticks):
+        if rng.random() > args.idle_share:
+            for _ in range(max(1, int(rng.expovariate(
+                    1 / args.updates_per_tick)))):
+                if next_order < args.orders and rng.random() < 0.5:
+                    order_id, next_order = next_order, next_order + 1
+                else:
+                    order_id = rng.randrange(max(next_order, 1))
+                orders.update(order_id, order_id + 10000,
+                              rng.choice(['Submitted', 'Filled']),
+                              rng.randrange(100), 0, 1.0, 0, 1.0, 1, '', 0.0)
+                errors.append(order_id, 2104, 'Market data farm connection '
+                              'is OK:usfarm')
+
+        start = time.perf_counter()
+        old_bytes += full_update(orders.snapshot())
+        old_bytes += full_update(errors.snapshot())
+        old_seconds += time.perf_counter() - start
+
+        start = time.perf_counter()
+        update, seen = order_rows_update(orders, seen_orders, metrics)
+        if seen is not no_update:
+            seen_orders = seen
+        update, seen = error_rows_update(errors, seen_errors, metrics)
+        if seen is not no_update:
+            seen_errors = seen
+        new_seconds += time.perf_counter() - start
+
+    stats = metrics.stats
+    new_bytes = sum(table['bytes_sent'] for table in stats.values())
+    print(f"{args.ticks} ticks, {len(orders)} orders, {len(errors)} errors "
+          f"held")
+    print(f"full tables   {old_bytes / args.ticks:12,.0f} bytes/tick  "
+          f"{old_seconds / args.ticks * 1e3:8.3f} ms/tick")
+    print(f"deltas        {new_bytes / args.ticks:12,.0f} bytes/tick  "
+          f"{new_seconds / args.ticks * 1e3:8.3f} ms/tick")
+    for name, table in stats.items():
+        print(f"  {name:<8} unchanged ticks {table['unchanged_ticks']}, "
+              f"full updates {table['full_updates']}, "
+              f"rows sent {table['rows_sent']}")
@@ -1,15 +1,110 @@
+import argparse
+import collections
 import datetime
+import hashlib
+import json
+import os
 
 import pandas as pd
-import statistics as stats
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def onboard_historical_price_data(filename, columns=None, cache=True):
+    # reads a csv that has a date column and returns it as a pandas DF,
+    #   sorted by date, with a datetime64 "Date" index and float64 columns.
+    # columns: the columns to read (default: every numeric column; text
+    #   columns like pep_PreviousCloseDate are left out).
+    # cache: keep a binary copy of the parsed file next to it, in
+    #   filename + ".npcache", and load from that while the CSV is unchanged.
+    #   Cached columns are memory-mapped copy-on-write rather than read, so
+    #   changes to the frame never reach the cache.
+    if not cache:
+        return _parse_price_csv(filename, columns)
+    df = _read_price_cache(filename, columns)
+    if df is None:
+        df = _parse_price_csv(filename)
+        try:
+            _write_price_cache(filename, df)
+        except OSError:
+            # e.g. a read-only directory: carry on without a cache.
+            pass
+        if columns is not None:
+            df = df[columns]
+    return df
 
 
-def onboard_historical_price_data(filename):
-    # reads a csv that has a date column and returns it as a pandas DF
-    df = pd.read_csv(filename, index_col="Date")
+def _parse_price_csv(filename, columns=None):
+    if columns is None:
+        sample = pd.read_csv(filename, index_col="Date", nrows=100)
+        columns = list(sample.select_dtypes("number").columns)
+    df = pd.read_csv(filename, index_col="Date", usecols=["Date"] + columns,
+                     dtype=dict.fromkeys(columns, np.float64),
+                     parse_dates=["Date"])
     df.sort_index(ascending=True, inplace=True)
-    return df
+    return df[columns]
+
+
+def _file_digest(filename):
+    digest = hashlib.sha1()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_price_cache(filename, columns=None):
+    # The cached frame, or None if there's no cache or the CSV has changed
+    #   since it was written. A CSV touched but not changed (same size and
+    #   contents, new mtime) keeps its cache.
+    path = filename + ".npcache"
+    try:
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        source = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    if source.st_size != meta["size"]:
+        return None
+    if source.st_mtime_ns != meta["mtime_ns"]:
+        if _file_digest(filename) != meta["sha1"]:
+            return None
+        meta["mtime_ns"] = source.st_mtime_ns
+        try:
+            with open(os.path.join(path, "meta.json"), "w") as f:
+                json.dump(meta, f)
+        except OSError:
+            pass
+    dates = np.load(os.path.join(path, "dates.npy"))
+    # values.npy is column-major, so every column is a contiguous view.
+    values = np.load(os.path.join(path, "values.npy"), mmap_mode="c")
+    position = {c: i for i, c in enumerate(meta["columns"])}
+    if columns is None:
+        columns = meta["columns"]
+    return pd.DataFrame({c: values[:, position[c]] for c in columns},
+                        index=pd.Index(dates, name="Date"), copy=False)
+
+
+def _write_price_cache(filename, df):
+    # Like bar_store, each file is written under a temporary name and
+    #   swapped in, and meta.json (which makes the cache valid) goes last.
+    path = filename + ".npcache"
+    os.makedirs(path, exist_ok=True)
+    meta_path = os.path.join(path, "meta.json")
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    source = os.stat(filename)
+    arrays = {"dates": df.index.to_numpy(),
+              "values": np.asfortranarray(df.to_numpy(dtype=np.float64))}
+    for name, values in arrays.items():
+        tmp = os.path.join(path, name + ".tmp.npy")
+        np.save(tmp, values)
+        os.replace(tmp, os.path.join(path, name + ".npy"))
+    meta = {"columns": list(df.columns), "size": source.st_size,
+            "mtime_ns": source.st_mtime_ns, "sha1": _file_digest(filename)}
+    with open(meta_path + ".tmp", "w") as f:
+        json.dump(meta, f)
+    os.replace(meta_path + ".tmp", meta_path)
 
 
 def get_spread(hpd, stock_a, stock_b):
@@ -26,27 +121,83 @@ def get_spread(hpd, stock_a, stock_b):
     return hpd
 
 
-def get_bolling_band(hpd_with_spread, n, k, stock_a, stock_b):
+def _two_sum(a, b):
+    # a + b as an unevaluated sum s + e of two floats, exactly.
+    s = a + b
+    b_virtual = s - a
+    return s, (a - (s - b_virtual)) + (b - b_virtual)
+
+
+def _two_product(a, b):
+    # a * b as p + e exactly, by splitting each factor into 26-bit halves.
+    p = a * b
+    a_big = 134217729.0 * a
+    a_hi = a_big - (a_big - a)
+    b_big = 134217729.0 * b
+    b_hi = b_big - (b_big - b)
+    a_lo, b_lo = a - a_hi, b - b_hi
+    return p, ((a_hi * b_hi - p) + a_hi * b_lo + a_lo * b_hi) + a_lo * b_lo
+
+
+def _exact_window_mean(windows, n):
+    # The window means statistics.mean returns: the exact sum divided by n,
+    #   rounded once. The sum is carried as a double-double and the quotient
+    #   corrected by its remainder.
+    total = windows[:, 0].copy()
+    error = np.zeros_like(total)
+    for j in range(1, n):
+        total, e = _two_sum(total, windows[:, j])
+        error += e
+    hi, lo = _two_sum(total, error)
+    quotient = hi / n
+    p, e = _two_product(quotient, float(n))
+    return quotient + (((hi - p) - e) + lo) / n
+
+
+def rolling_mean_std(values, n, exact=True, block_size=1 << 16):
+    # Mean and population standard deviation of each full n-value window of
+    #   `values`; result i covers values[i:i + n]. Windows are handled
+    #   block_size at a time so memory stays flat on long series.
+    # exact=True gives the same floats as statistics.mean and np.std on
+    #   each window, at a cost proportional to n per window.
+    #   exact=False uses block-local cumulative sums: O(1) per window. Its
+    #   error grows with how far values wander within a block; for a random
+    #   walk spread around 60 it's about 1e-9 in the mean and 1e-6 in the
+    #   std at the default block_size.
+    values = np.asarray(values, dtype=np.float64)
+    n_windows = max(len(values) - n + 1, 0)
+    mean = np.empty(n_windows)
+    std = np.empty(n_windows)
+    for start in range(0, n_windows, block_size):
+        stop = min(start + block_size, n_windows)
+        segment = values[start:stop + n - 1]
+        if exact:
+            windows = sliding_window_view(segment, n)
+            mean[start:stop] = _exact_window_mean(windows, n)
+            std[start:stop] = windows.std(axis=1)
+        else:
+            # Shifting by the segment's first value keeps the sums small.
+            shifted = segment - segment[0]
+            sums = np.concatenate(([0.0], np.cumsum(shifted)))
+            squares = np.concatenate(([0.0], np.cumsum(shifted * shifted)))
+            window_mean = (sums[n:] - sums[:-n]) / n
+            variance = (squares[n:] - squares[:-n]) / n - window_mean ** 2
+            mean[start:stop] = window_mean + segment[0]
+            std[start:stop] = np.sqrt(np.maximum(variance, 0.0))
+    return mean, std
+
+
+def get_bolling_band(hpd_with_spread, n, k, stock_a, stock_b, exact=True):
     # Accepts the filename of a date-indexed CSV of historical prices, plus
     #   n and k, plus the symbols of two stocks A and B
     # Returns a pandas DF containing:
     # open_price_a, open_price_b, spread, upper_band, lower_band
+    # Bands start at row n - 1, the first with a full n-day window of
+    #   spreads; earlier rows are dropped. exact: see rolling_mean_std.
     df = hpd_with_spread
-    history = []
-    upper_band = []
-    lower_band = []
-    spreads = df["spread"]
-    series = df[[stock_a + "_Open", stock_b + "_Open", "spread"]]
-    for spread in spreads:
-        history.append(spread)
-        if len(history) > n:
-            del (history[0])
-        upper_band.append(stats.mean(history) + k * np.std(history))
-        lower_band.append(stats.mean(history) - k * np.std(history))
-    df = pd.DataFrame(series)
-    df = df.assign(upper_band=pd.Series(upper_band, index=df.index))
-    df = df.assign(lower_band=pd.Series(lower_band, index=df.index))
-    df.drop(df.index[0:6], inplace=True)
+    mean, std = rolling_mean_std(df["spread"].to_numpy(), n, exact)
+    df = df[[stock_a + "_Open", stock_b + "_Open", "spread"]].iloc[n - 1:]
+    df = df.assign(upper_band=mean + k * std, lower_band=mean - k * std)
     return df
 
 
@@ -67,69 +218,39 @@ def calculate_entry_orders(fsignal, stock_a, stock_b, size_a, size_b,
                            lmt_price_a, lmt_status_a, lmt_price_b,
                            lmt_status_b):
     # returns a blotter containing all entry orders given a set of data.
-    df = fsignal
-    df = df.reset_index()
-    series = df[["Date", stock_a + "_Open", stock_b + "_Open"]]
-    signals = df["signal"]
-    series = series.drop(series.index[0]).reset_index(drop=True)
-    signals = signals.drop(signals.index[-1]).reset_index(drop=True)
-
-    temp = pd.DataFrame(series)
-    temp = temp.assign(signal=pd.Series(signals, index=temp.index))
-
-    temp.set_index("Date", inplace=True, drop=True)
-
-    entry_blotter = pd.DataFrame(columns=["DATE", "SYMBOL", "ACTION", "SIZE",
-                                          "PRICE", "TRIP", "LMT_PRICE",
-                                          "STATUS"])
-
-    position = 0
-    for i in range(len(temp)):
-        signal = temp.iloc[i]['signal']
-        trip = "Entry"
-        if signal == "x_up":
-            action_a = "SELL"
-            action_b = "BUY"
-        elif signal == "x_down":
-            action_a = "BUY"
-            action_b = "SELL"
-        # up: buy ko, sell pepsi (buy B (low), sell A (high))
-        if (position != 1 and signal == "x_up") or (position != -1 and signal == "x_down"):
-            # down: sell ko, buy pepsi (sell B (low), buy A (high))
-            entry_blotter = pd.concat(
-                [entry_blotter, pd.DataFrame(
-                    {
-                        "DATE": [temp.index[i]],
-                        "SYMBOL": [stock_a],
-                        "ACTION": [action_a],
-                        "SIZE": [size_a],
-                        "PRICE": [temp.iloc[i][stock_a + "_Open"]],
-                        "TRIP": [trip],
-                        "LMT_PRICE": [lmt_price_a],
-                        "STATUS": [lmt_status_a]
-                    }
-                )]
-            )
-            entry_blotter = pd.concat(
-                [entry_blotter, pd.DataFrame(
-                    {
-                        "DATE": [temp.index[i]],
-                        "SYMBOL": [stock_b],
-                        "ACTION": [action_b],
-                        "SIZE": [size_b],
-                        "PRICE": [temp.iloc[i][stock_b + "_Open"]],
-                        "TRIP": [trip],
-                        "LMT_PRICE": [lmt_price_b],
-                        "STATUS": [lmt_status_b]
-                    }
-                )]
-            )
-        if signal == "x_up":
-            position = 1
-        elif signal == "x_down":
-            position = -1
-        elif signal == "false":
-            position = 0
+    # A signal is acted on at the next day's open. The position after a day
+    #   is +1 following x_up, -1 following x_down and 0 otherwise, so a
+    #   signal opens a trade unless the day before had the same signal.
+    # up: buy ko, sell pepsi (buy B (low), sell A (high))
+    # down: sell ko, buy pepsi (sell B (low), buy A (high))
+    signals = fsignal["signal"].to_numpy()[:-1]
+    previous = np.concatenate((["false"], signals))[:-1]
+    x_up = signals == "x_up"
+    x_down = signals == "x_down"
+    entries = np.flatnonzero((x_up & (previous != "x_up")) |
+                             (x_down & (previous != "x_down")))
+    # Each entry is a pair of rows, A then B, filled at the next day's open.
+    fills = entries + 1
+    up = x_up[entries]
+    n_rows = 2 * len(entries)
+    action = np.empty(n_rows, dtype=object)
+    action[0::2] = np.where(up, "SELL", "BUY")
+    action[1::2] = np.where(up, "BUY", "SELL")
+    price = np.empty(n_rows)
+    price[0::2] = fsignal[stock_a + "_Open"].to_numpy()[fills]
+    price[1::2] = fsignal[stock_b + "_Open"].to_numpy()[fills]
+    entry_blotter = pd.DataFrame({
+        "DATE": np.repeat(fsignal.index.to_numpy()[fills], 2),
+        "SYMBOL": np.tile([stock_a, stock_b], len(entries)),
+        "ACTION": action,
+        "SIZE": np.tile([size_a, size_b], len(entries)),
+        "PRICE": price,
+        "TRIP": "Entry",
+        "LMT_PRICE": np.tile(np.array([lmt_price_a, lmt_price_b],
+                                      dtype=object), len(entries)),
+        "STATUS": np.tile(np.array([lmt_status_a, lmt_status_b],
+                                   dtype=object), len(entries))
+    })
     entry_blotter = entry_blotter.set_index("DATE")
     return entry_blotter
 
@@ -151,94 +272,230 @@ def calculate_exit_orders(entry_blotter, fsignal, hpd, timeout, stop_loss):
     # the position at a price of entry_price*(1-stoploss). And vice versa for
     # shorts.
 
-    exit_list = []
-    for i in range(0, len(entry_blotter), 2):
-        entry_date = entry_blotter.index[i]
-        entry_price_pep = entry_blotter.iloc[i]["PRICE"]
-        entry_price_ko = entry_blotter.iloc[i + 1]["PRICE"]
-        entry_stock_a = entry_blotter.iloc[i]['SYMBOL']
-        entry_stock_b = entry_blotter.iloc[i + 1]['SYMBOL']
-
-        for j in range(len(fsignal)):
-            def up_down_exit_info(signal, date, price_a, price_b):
-                action_a = ""
-                action_b = ""
-                if signal == "x_up" or signal == "x_down":
-                    if signal == "x_up":
-                        action_a = "BUY"
-                        action_b = "SELL"
-                    elif fsignal.iloc[j - 1]['signal'] == "x_down":
-                        action_a = "SELL"
-                        action_b = "BUY"
-                    exit_list.append([date, entry_blotter.iloc[i]['SYMBOL'], action_a, entry_blotter.iloc[i]['SIZE'],
-                                      price_a, "Exit", entry_blotter.iloc[i]["LMT_PRICE"], entry_blotter.iloc[i]["STATUS"]])
-                    exit_list.append([date, entry_blotter.iloc[i + 1]['SYMBOL'], action_b, entry_blotter.iloc[i + 1]['SIZE'],
-                                      price_b, "Exit", entry_blotter.iloc[i + 1]["LMT_PRICE"], entry_blotter.iloc[i + 1]["STATUS"]])
-
-            if fsignal.index[j] != entry_date:
-                continue
-            else:
-                interval = 0
-                for k in range(0, timeout):
-                    row = j + k + 1
-
-                    temp_date = fsignal.index[row]
-                    spread = fsignal.iloc[row]['spread']
-                    upper = fsignal.iloc[row]['upper_band']
-                    lower = fsignal.iloc[row]['lower_band']
-                    low_price_p = hpd.at[temp_date, 'pep_Low']
-                    low_price_k = hpd.at[temp_date, 'ko_Low']
-                    exit_date = fsignal.index[row + 1]
-                    exit_price_a = fsignal.iloc[row + 1][entry_stock_a + "_Open"]
-                    exit_price_b = fsignal.iloc[row + 1][entry_stock_b + "_Open"]
-
-                    # up: bought ko, sold pepsi (bought B (low), sold A (high)) => now sell ko, buy pepsi
-                    if fsignal.iloc[j - 1]['signal'] == "x_up":
-                        loss_price_p = entry_price_pep * (1 + stop_loss)
-                        loss_price_k = entry_price_ko * (1 - stop_loss)
-                        if (low_price_p >= loss_price_p) & (low_price_k <= loss_price_k):
-                            up_down_exit_info("x_up", exit_date, exit_price_a, exit_price_b)
-                            break
-                    # down: sold ko, bought pepsi (sold B (low), bought A (high)) => now buy ko, sell pepsi
-                    elif fsignal.iloc[j - 1]['signal'] == "x_down":
-                        loss_price_p = entry_price_pep * (1 - stop_loss)
-                        loss_price_k = entry_price_pep * (1 + stop_loss)
-
-                        if (low_price_p <= loss_price_p) & (low_price_k >= loss_price_k):
-                            up_down_exit_info("x_down", exit_date, exit_price_a, exit_price_b)
-                            break
-                    if (spread < upper) & (spread > lower):
-                        up_down_exit_info(fsignal.iloc[j - 1]['signal'], exit_date, exit_price_a, exit_price_b)
-                        break
-                    interval = interval + 1
-
-                if interval == timeout:
-                    date_timeout = fsignal.index[j + timeout]
-                    close_price_a = hpd.at[date_timeout, entry_stock_a + '_Close']
-                    close_price_b = hpd.at[date_timeout, entry_stock_b + '_Close']
-                    up_down_exit_info(fsignal.iloc[j - 1]['signal'], date_timeout, close_price_a, close_price_b)
-                    break
-    exit_blotter = pd.DataFrame(exit_list,
-                                columns=["DATE", "SYMBOL", "ACTION", "SIZE", "PRICE", "TRIP", "LMT_PRICE", "STATUS"])
+    # Each trade is the pair of entry rows (A then B) and starts on the row
+    #   of fsignal with its entry date. The next `timeout` rows after it are
+    #   checked for every trade at once; the first row where the stop loss
+    #   triggers or the spread is back inside the bands closes the trade at
+    #   the following row's open, and a trade with no such row is closed at
+    #   the close `timeout` rows after entry. Trades too close to the end of
+    #   the data to be decided stay open and get no exit orders.
+    # TRADE is the entry pair (0 for entry_blotter's first two rows) each
+    #   exit row closes. Exits are in entry order, but their dates needn't
+    #   be: a stop loss can close a trade before an earlier one times out.
+    columns = ["DATE", "SYMBOL", "ACTION", "SIZE", "PRICE", "TRIP",
+               "LMT_PRICE", "STATUS", "TRADE"]
+    dates = fsignal.index
+    n_rows = len(dates)
+    entry_a = entry_blotter.iloc[0::2]
+    entry_b = entry_blotter.iloc[1::2]
+    start = dates.get_indexer(entry_a.index)
+    found = start > 0
+    entry_a, entry_b, start = entry_a[found], entry_b[found], start[found]
+    if len(start) == 0:
+        exit_blotter = pd.DataFrame(columns=columns).set_index("DATE")
+        return exit_blotter.astype({"TRADE": np.int64})
+    stock_a = entry_a["SYMBOL"].iloc[0]
+    stock_b = entry_b["SYMBOL"].iloc[0]
+
+    # The signal that opened each trade decides its direction.
+    direction = fsignal["signal"].to_numpy()[start - 1]
+    up = direction == "x_up"
+    down = direction == "x_down"
+
+    # rows[t, k]: the row checked k + 1 bars after trade t's entry.
+    rows = start[:, None] + np.arange(1, timeout + 1)
+    checked = np.minimum(rows, n_rows - 1)
+    spread = fsignal["spread"].to_numpy()[checked]
+    inside = ((spread < fsignal["upper_band"].to_numpy()[checked]) &
+              (spread > fsignal["lower_band"].to_numpy()[checked]))
+
+    def hpd_at(column, fsignal_rows):
+        # hpd[column] on the dates of the given fsignal rows.
+        row_dates = dates[fsignal_rows.ravel()]
+        hpd_rows = hpd.index.get_indexer(row_dates)
+        if (hpd_rows < 0).any():
+            raise KeyError(row_dates[hpd_rows < 0][0])
+        return hpd[column].to_numpy()[hpd_rows].reshape(fsignal_rows.shape)
+
+    low_a = hpd_at(stock_a + "_Low", checked)
+    low_b = hpd_at(stock_b + "_Low", checked)
+    price_a = entry_a["PRICE"].to_numpy(dtype=float)[:, None]
+    price_b = entry_b["PRICE"].to_numpy(dtype=float)[:, None]
+    # up: bought ko, sold pepsi (bought B (low), sold A (high)) => now sell ko, buy pepsi
+    # down: sold ko, bought pepsi (sold B (low), bought A (high)) => now buy ko, sell pepsi
+    # As before, the short stop for B on a down trade is measured from A's
+    #   entry price.
+    stopped = np.where(
+        up[:, None],
+        (low_a >= price_a * (1 + stop_loss)) &
+        (low_b <= price_b * (1 - stop_loss)),
+        (low_a <= price_a * (1 - stop_loss)) &
+        (low_b >= price_a * (1 + stop_loss))
+    )
+    # An exit at row r fills at row r + 1, which has to exist.
+    hit = (stopped | inside) & (rows + 1 < n_rows)
+    has_hit = hit.any(axis=1)
+    first_hit = hit.argmax(axis=1) if timeout > 0 else np.zeros_like(start)
+    timed_out = ~has_hit & (start + timeout + 1 < n_rows)
+    exits = (has_hit | timed_out) & (up | down)
+
+    exit_row = np.where(has_hit, start + first_hit + 2, start + timeout)
+    exit_row, timed_out, up = exit_row[exits], timed_out[exits], up[exits]
+    trades = np.flatnonzero(found)[exits]
+
+    def pair(values_a, values_b):
+        # Interleaves A and B values into blotter row order.
+        return np.column_stack((values_a, values_b)).ravel()
+
+    def fill_price(stock):
+        opens = fsignal[stock + "_Open"].to_numpy()[exit_row]
+        closes = hpd_at(stock + "_Close", exit_row)
+        return np.where(timed_out, closes, opens)
+
+    exit_blotter = pd.DataFrame({
+        "DATE": np.repeat(dates.to_numpy()[exit_row], 2),
+        "SYMBOL": pair(entry_a["SYMBOL"].to_numpy()[exits],
+                       entry_b["SYMBOL"].to_numpy()[exits]),
+        "ACTION": pair(np.where(up, "BUY", "SELL"),
+                       np.where(up, "SELL", "BUY")),
+        "SIZE": pair(entry_a["SIZE"].to_numpy()[exits],
+                     entry_b["SIZE"].to_numpy()[exits]),
+        "PRICE": pair(fill_price(stock_a), fill_price(stock_b)),
+        "TRIP": "Exit",
+        "LMT_PRICE": pair(entry_a["LMT_PRICE"].to_numpy()[exits],
+                          entry_b["LMT_PRICE"].to_numpy()[exits]),
+        "STATUS": pair(entry_a["STATUS"].to_numpy()[exits],
+                       entry_b["STATUS"].to_numpy()[exits]),
+        "TRADE": np.repeat(trades, 2)
+    }, columns=columns)
     exit_blotter.set_index("DATE", inplace=True)
     return exit_blotter
 
 
 def get_whole_orders(entry_blotter, exit_blotter):
+    # The TRADE column numbers every row's trade (its entry pair), which is
+    #   how performance.trip_pnl pairs exits with entries: rows sharing a
+    #   date come out of the sort in no particular order. Entries are
+    #   numbered by pair, exits keep calculate_exit_orders' numbers. Drop
+    #   it before writing the blotter out, as main() does for
+    #   whole_process.
+    if "TRADE" in exit_blotter.columns:
+        entry_blotter = entry_blotter.assign(
+            TRADE=np.arange(len(entry_blotter)) // 2)
     whole_blotter = pd.concat([entry_blotter, exit_blotter])
     whole_blotter.sort_index(ascending=True, inplace=True)
     return whole_blotter
 
 
-historical_price_data = onboard_historical_price_data('pep_ko_ivv.csv')
-hpd_w_spread = get_spread(historical_price_data, 'pep', 'ko')
-bbands = get_bolling_band(hpd_w_spread, 20, 2, 'pep', 'ko')
-full_signal = get_full_signal(bbands)
-entry_orders = calculate_entry_orders(full_signal, 'pep', 'ko', 1000, 1000,
-                                      'N/A', 'FILLED', 'N/A', 'FILLED')
-exit_orders = calculate_exit_orders(entry_orders, full_signal, historical_price_data, 2, 0.1)
-whole_orders = get_whole_orders(entry_orders, exit_orders)
-whole_orders.to_csv('whole_process')
+class backtest_pipeline:
+    # The backtest as a chain of stages, each memoized on everything it
+    #   depends on: the price file's contents (its sha1) plus the parameters
+    #   of that stage and all the ones before it.
+    #   prices -> spread -> bands -> signal -> entries -> exits -> orders
+    # So a rerun that only changes timeout or stop_loss recomputes the exits
+    #   and reuses the cached bands, signals and entries. The max_entries
+    #   most recently used stage results are kept; computed counts how often
+    #   each stage actually ran.
+    #
+    #   pipeline = backtest_pipeline()
+    #   result = pipeline.run('pep_ko_ivv.csv', timeout=2)
+    #   result = pipeline.run('pep_ko_ivv.csv', timeout=5)  # exits only
+    #   result['whole_orders'].drop(columns='TRADE').to_csv('whole_process')
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.computed = collections.Counter()
+        self._results = collections.OrderedDict()
+        # (path, size, mtime_ns) -> sha1, so an unchanged file isn't rehashed
+        self._digests = {}
+
+    def _stage(self, key, compute):
+        if key in self._results:
+            self._results.move_to_end(key)
+            return self._results[key]
+        result = compute()
+        self.computed[key[0]] += 1
+        self._results[key] = result
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+        return result
+
+    def _digest(self, filename):
+        source = os.stat(filename)
+        stamp = (os.path.abspath(filename), source.st_size,
+                 source.st_mtime_ns)
+        if stamp not in self._digests:
+            self._digests[stamp] = _file_digest(filename)
+        return self._digests[stamp]
+
+    def run(self, filename='pep_ko_ivv.csv', stock_a='pep', stock_b='ko',
+            n=20, k=2, size_a=1000, size_b=1000, lmt_price_a='N/A',
+            lmt_status_a='FILLED', lmt_price_b='N/A', lmt_status_b='FILLED',
+            timeout=2, stop_loss=0.1):
+        # Returns every stage's result in a dict: historical_price_data,
+        #   hpd_w_spread, bbands, full_signal, entry_orders, exit_orders and
+        #   whole_orders. They're shared with the cache, so copy before
+        #   changing them.
+        # get_spread and get_full_signal add columns to their input, so
+        #   they're given copies to keep the cached frames as they were.
+        key = ('prices', self._digest(filename))
+        hpd = self._stage(key, lambda: onboard_historical_price_data(
+            filename))
+        key = ('spread',) + key[1:] + (stock_a, stock_b)
+        hpd_w_spread = self._stage(key, lambda: get_spread(
+            hpd.copy(), stock_a, stock_b))
+        key = ('bands',) + key[1:] + (n, k)
+        bbands = self._stage(key, lambda: get_bolling_band(
+            hpd_w_spread, n, k, stock_a, stock_b))
+        key = ('signal',) + key[1:]
+        fsignal = self._stage(key, lambda: get_full_signal(bbands.copy()))
+        key = ('entries',) + key[1:] + (size_a, size_b, lmt_price_a,
+                                        lmt_status_a, lmt_price_b,
+                                        lmt_status_b)
+        entry_orders = self._stage(key, lambda: calculate_entry_orders(
+            fsignal, stock_a, stock_b, size_a, size_b, lmt_price_a,
+            lmt_status_a, lmt_price_b, lmt_status_b))
+        key = ('exits',) + key[1:] + (timeout, stop_loss)
+        exit_orders = self._stage(key, lambda: calculate_exit_orders(
+            entry_orders, fsignal, hpd, timeout, stop_loss))
+        key = ('orders',) + key[1:]
+        whole_orders = self._stage(key, lambda: get_whole_orders(
+            entry_orders, exit_orders))
+        return {
+            'historical_price_data': hpd, 'hpd_w_spread': hpd_w_spread,
+            'bbands': bbands, 'full_signal': fsignal,
+            'entry_orders': entry_orders, 'exit_orders': exit_orders,
+            'whole_orders': whole_orders
+        }
+
+
+def main(argv=None):
+    # Runs the backtest and writes its orders, by default the pep/ko
+    #   reference run into whole_process.
+    parser = argparse.ArgumentParser(
+        description='Backtest the pairs strategy and write its blotter.')
+    parser.add_argument('filename', nargs='?', default='pep_ko_ivv.csv')
+    parser.add_argument('--stock-a', default='pep')
+    parser.add_argument('--stock-b', default='ko')
+    parser.add_argument('--n', type=int, default=20)
+    parser.add_argument('--k', type=float, default=2)
+    parser.add_argument('--size-a', type=int, default=1000)
+    parser.add_argument('--size-b', type=int, default=1000)
+    parser.add_argument('--timeout', type=int, default=2)
+    parser.add_argument('--stop-loss', type=float, default=0.1)
+    parser.add_argument('--out', default='whole_process')
+    args = parser.parse_args(argv)
+
+    result = backtest_pipeline().run(
+        args.filename, args.stock_a, args.stock_b, args.n, args.k,
+        args.size_a, args.size_b, timeout=args.timeout,
+        stop_loss=args.stop_loss)
+    result['whole_orders'].drop(columns='TRADE').to_csv(args.out)
+    return result
+
+
+if __name__ == '__main__':
+    main()
 
 # MAGIKARP's ASSIGMENT:
 # 1) write calculate_exit_orders() so that the following code works. (must have)
@@ -3,8 +3,14 @@ import pandas as pd
 
 errors = pd.DataFrame(columns=['reqId', 'errorCode', 'errorString'])
 
-error_page = dash_table.DataTable(
-    columns=[{"name": i, "id": i} for i in errors.columns],
-    data=errors.to_dict('records'),
-    id='errors-dt'
-)
+
+def make_error_page(data=None):
+    # The errors table, already holding `data` (records) if given.
+    return dash_table.DataTable(
+        columns=[{"name": i, "id": i} for i in errors.columns],
+        data=errors.to_dict('records') if data is None else data,
+        id='errors-dt'
+    )
+
+
+error_page = make_error_page()
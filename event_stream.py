@@ -0,0 +1,111 @@
+import threading
+from collections import deque
+
+from plotly.io.json import to_json_plotly
+
+# Server-Sent Events fan-out for the blotter and error pages. The ibkr_app
+#   wrapper callbacks publish order status and error events into an
+#   event_hub; every browser tab holds one /events stream and gets each event
+#   as soon as it's published, instead of waiting for the next poll.
+#
+#   hub = event_hub()
+#   ibkr_async_conn.add_event_listener(hub.publish)
+#   Response(hub.stream(initial_events), mimetype='text/event-stream')
+#
+# Each event is serialized once however many tabs are listening. Every tab
+#   has its own bounded queue; a tab that falls more than queue_size events
+#   behind is told to 'resync', i.e. reconnect and start from a fresh
+#   snapshot, rather than holding up the others or growing without bound.
+
+
+def format_event(event, data):
+    # One SSE frame. JSON never contains a raw newline, so data fits on one
+    #   'data:' line.
+    return 'event: %s\ndata: %s\n\n' % (event, to_json_plotly(data))
+
+
+class event_subscriber:
+
+    def __init__(self, queue_size):
+        self.queue_size = queue_size
+        self.overflowed = False
+        self._frames = deque()
+        self._ready = threading.Condition()
+
+    def put(self, frame):
+        with self._ready:
+            if self.overflowed:
+                return
+            if len(self._frames) >= self.queue_size:
+                self.overflowed = True
+                self._frames.clear()
+            else:
+                self._frames.append(frame)
+            self._ready.notify()
+
+    def get(self, timeout):
+        # Every frame queued so far, waiting up to timeout seconds for the
+        #   first; an empty list if none came.
+        with self._ready:
+            if not self._frames and not self.overflowed:
+                self._ready.wait(timeout)
+            frames = list(self._frames)
+            self._frames.clear()
+            return frames
+
+
+class event_hub:
+
+    def __init__(self, queue_size=1000, heartbeat_sec=15):
+        self.queue_size = queue_size
+        self.heartbeat_sec = heartbeat_sec
+        self.published = 0
+        self.resyncs = 0
+        self._lock = threading.Lock()
+        self._subscribers = set()
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def publish(self, event, data):
+        # Safe to call from the ibkr_app reader thread; it only queues.
+        frame = format_event(event, data)
+        with self._lock:
+            self.published += 1
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.put(frame)
+
+    def subscribe(self):
+        subscriber = event_subscriber(self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def stream(self, initial_events=None):
+        # Generator of SSE text for one client. initial_events, if given, is
+        #   called once subscribed and returns (event, data) pairs to send
+        #   first, e.g. snapshots of the tables; anything published while
+        #   they're built is queued behind them. A comment line goes out
+        #   every heartbeat_sec to keep proxies from closing an idle stream.
+        subscriber = self.subscribe()
+        try:
+            # Reconnect after 1 s if the connection drops.
+            frames = ['retry: 1000\n\n']
+            for event, data in (initial_events() if initial_events else ()):
+                frames.append(format_event(event, data))
+            yield ''.join(frames)
+            while True:
+                frames = subscriber.get(self.heartbeat_sec)
+                if subscriber.overflowed:
+                    with self._lock:
+                        self.resyncs += 1
+                    yield format_event('resync', {})
+                    return
+                yield ''.join(frames) if frames else ': heartbeat\n\n'
+        finally:
+            self.unsubscribe(subscriber)
@@ -5,3 +5,15 @@ from interactive_trader.synchronous_functions import fetch_current_time
 from interactive_trader.synchronous_functions import fetch_matching_symbols
 from interactive_trader.synchronous_functions import place_order
 from interactive_trader.ibkr_app import ibkr_app
+from interactive_trader.session import ibkr_session
+from interactive_trader.session import get_session
+from interactive_trader.session import close_sessions
+from interactive_trader.bulk_historical import fetch_historical_data_bulk
+from interactive_trader.bulk_historical import bulk_historical_downloader
+from interactive_trader.bulk_historical import historical_job
+from interactive_trader.contract_cache import contract_cache
+from interactive_trader.contract_cache import shared_contract_cache
+from interactive_trader.order_ids import order_id_allocator
+from interactive_trader.order_submitter import order_submitter
+from interactive_trader.basket_orders import basket_order
+from interactive_trader.outbound_scheduler import outbound_scheduler
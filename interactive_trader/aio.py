@@ -0,0 +1,125 @@
+import asyncio
+
+from interactive_trader.contract_cache import contract_key
+from interactive_trader.contract_cache import shared_contract_cache
+from interactive_trader.session import get_session
+from interactive_trader.session import default_hostname, default_port
+from interactive_trader.session import default_client_id
+from interactive_trader.synchronous_functions import _cache_key
+from interactive_trader.synchronous_functions import _check_range_arguments
+from interactive_trader.synchronous_functions import _fetch_historical_range
+from interactive_trader.synchronous_functions import _order_status
+from interactive_trader.synchronous_functions import _request_contract_details
+from interactive_trader.synchronous_functions import _request_current_time
+from interactive_trader.synchronous_functions import _request_historical_data
+from interactive_trader.synchronous_functions import _request_matching_symbols
+from interactive_trader.synchronous_functions import _request_order
+from interactive_trader.synchronous_functions import _unacknowledged_order
+
+# Awaitable counterparts of the synchronous functions. They run over the same
+#   ibkr_session objects; the session's reader thread resolves each request's
+#   Future and asyncio picks the result up on the event loop, so no thread is
+#   parked while a request is in flight and many requests can be pipelined on
+#   one connection:
+#
+#   details = await asyncio.gather(
+#       *[aio.fetch_contract_details(c, session=session) for c in contracts]
+#   )
+
+
+async def connect_session(hostname=default_hostname, port=default_port,
+                          client_id=default_client_id):
+    # Connecting blocks on the socket handshake, so it happens off the loop.
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, get_session, hostname, port,
+                                      client_id)
+
+
+async def _wait(session, request, function_name, what):
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(request),
+                                      request.remaining())
+    except asyncio.TimeoutError:
+        session.app.requests.abandon(request.key)
+        raise Exception(function_name, "timeout", what + " not received")
+
+
+async def fetch_managed_accounts(hostname=default_hostname, port=default_port,
+                                 client_id=default_client_id, session=None):
+    session = session or await connect_session(hostname, port, client_id)
+    return session.app.managed_accounts
+
+
+async def fetch_current_time(hostname=default_hostname, port=default_port,
+                             client_id=default_client_id, session=None):
+    session = session or await connect_session(hostname, port, client_id)
+    request = _request_current_time(session)
+    return await _wait(session, request, "fetch_current_time", "current_time")
+
+
+async def fetch_historical_data(contract, endDateTime='', durationStr='30 D',
+                                barSizeSetting='1 hour', whatToShow='MIDPOINT',
+                                useRTH=True, hostname=default_hostname,
+                                port=default_port, client_id=default_client_id,
+                                session=None, start=None, end=None,
+                                on_chunk=None, timeout=None, pacing=None):
+    # As synchronous_functions.fetch_historical_data. A start / end range is
+    #   fetched by a worker thread (which calls on_chunk), not on the loop.
+    _check_range_arguments(start, end, on_chunk, pacing)
+    session = session or await connect_session(hostname, port, client_id)
+    if start is not None:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, _fetch_historical_range, session, contract, start, end,
+            barSizeSetting, whatToShow, useRTH, on_chunk, timeout, pacing)
+    request = _request_historical_data(
+        session, contract, endDateTime, durationStr, barSizeSetting,
+        whatToShow, useRTH, timeout)
+    return await _wait(session, request, "fetch_historical_data",
+                       "historical_data")
+
+
+async def fetch_contract_details(contract, hostname=default_hostname,
+                                 port=default_port,
+                                 client_id=default_client_id, session=None,
+                                 cache=shared_contract_cache):
+    key = _cache_key(session, hostname, port, contract_key(contract))
+    details = None if cache is None else cache.get(key)
+    if details is not None:
+        return details
+    session = session or await connect_session(hostname, port, client_id)
+    request = _request_contract_details(session, contract)
+    details = await _wait(session, request, "fetch_contract_details",
+                          "contract_details")
+    if cache is not None:
+        cache.put(key, details)
+    return details
+
+
+async def fetch_matching_symbols(pattern, hostname=default_hostname,
+                                 port=default_port,
+                                 client_id=default_client_id, session=None,
+                                 cache=shared_contract_cache):
+    key = _cache_key(session, hostname, port, ('matching_symbols', pattern))
+    symbols = None if cache is None else cache.get(key)
+    if symbols is not None:
+        return symbols
+    session = session or await connect_session(hostname, port, client_id)
+    request = _request_matching_symbols(session, pattern)
+    symbols = await _wait(session, request, "fetch_matching_symbols",
+                          "matching_symbols")
+    if cache is not None:
+        cache.put(key, symbols)
+    return symbols
+
+
+async def place_order(contract, order, hostname=default_hostname,
+                      port=default_port, client_id=default_client_id,
+                      session=None):
+    session = session or await connect_session(hostname, port, client_id)
+    order_id, request = _request_order(session, contract, order)
+    try:
+        await _wait(session, request, "place_order", "order_status")
+    except Exception as error:
+        raise _unacknowledged_order(session, order_id, error)
+    return _order_status(session.app, order_id)
@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+
+# Column layout shared by every historical data frame this package returns.
+bar_columns = ['date', 'open', 'high', 'low', 'close', 'volume', 'bar_count',
+               'average']
+
+_float_columns = ['open', 'high', 'low', 'close', 'average']
+_int_columns = ['volume', 'bar_count']
+
+
+def empty_historical_data():
+    # A zero-row historical data frame with the final dtypes already set.
+    return pd.DataFrame({
+        'date': pd.Series([], dtype='datetime64[ns]'),
+        'open': pd.Series([], dtype='float64'),
+        'high': pd.Series([], dtype='float64'),
+        'low': pd.Series([], dtype='float64'),
+        'close': pd.Series([], dtype='float64'),
+        'volume': pd.Series([], dtype='int64'),
+        'bar_count': pd.Series([], dtype='int64'),
+        'average': pd.Series([], dtype='float64'),
+    })
+
+
+def parse_bar_dates(dates):
+    # IB sends bar dates as strings whose shape depends on the bar size and
+    #   formatDate:
+    #   '20220413'                        daily and larger bars
+    #   '20220413  09:30:00'              intraday bars (two spaces)
+    #   '20220413 09:30:00 US/Eastern'    intraday bars, newer gateways
+    #   '1649856600'                      formatDate=2 (epoch seconds)
+    # All bars of one request share a shape, so we look at the first one and
+    #   parse the whole column with a single vectorized call.
+    dates = pd.Series(dates, dtype='object').astype(str).str.strip()
+    if dates.empty:
+        return pd.Series([], dtype='datetime64[ns]')
+    first = dates.iloc[0]
+    if first.isdigit() and len(first) == 8:
+        return pd.to_datetime(dates, format='%Y%m%d')
+    if first.isdigit():
+        return pd.to_datetime(dates.astype('int64'), unit='s')
+    # Keep the 'yyyymmdd' and 'hh:mm:ss' parts, dropping the separator and any
+    #   trailing time zone name.
+    times = dates.str.slice(8).str.strip().str.slice(0, 8)
+    dates = dates.str.slice(0, 8) + times
+    return pd.to_datetime(dates, format='%Y%m%d%H:%M:%S')
+
+
+class bar_buffer:
+    # Growable columnar buffer for the bars of one historical data request.
+    # Numeric fields go straight into preallocated typed arrays that double in
+    #   size when they fill up, so appending a bar is amortized O(1) and no
+    #   DataFrame is built until the request is finished.
+
+    def __init__(self, capacity=1024):
+        capacity = max(int(capacity), 1)
+        self.size = 0
+        self.dates = []
+        self.columns = {}
+        for name in _float_columns:
+            self.columns[name] = np.empty(capacity, dtype=np.float64)
+        for name in _int_columns:
+            self.columns[name] = np.empty(capacity, dtype=np.int64)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def capacity(self):
+        return len(self.columns['open'])
+
+    def _grow(self):
+        new_capacity = self.capacity * 2
+        for name, column in self.columns.items():
+            grown = np.empty(new_capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self.columns[name] = grown
+
+    def append(self, bar):
+        if self.size == self.capacity:
+            self._grow()
+        i = self.size
+        columns = self.columns
+        columns['open'][i] = bar.open
+        columns['high'][i] = bar.high
+        columns['low'][i] = bar.low
+        columns['close'][i] = bar.close
+        columns['volume'][i] = bar.volume
+        columns['bar_count'][i] = bar.barCount
+        columns['average'][i] = bar.average
+        self.dates.append(bar.date)
+        self.size = i + 1
+
+    def to_dataframe(self):
+        # Copies the filled part of each column so the frame doesn't pin the
+        #   (up to 2x oversized) buffers in memory.
+        n = self.size
+        df = pd.DataFrame({
+            'date': parse_bar_dates(self.dates).to_numpy(),
+            'open': self.columns['open'][:n].copy(),
+            'high': self.columns['high'][:n].copy(),
+            'low': self.columns['low'][:n].copy(),
+            'close': self.columns['close'][:n].copy(),
+            'volume': self.columns['volume'][:n].copy(),
+            'bar_count': self.columns['bar_count'][:n].copy(),
+            'average': self.columns['average'][:n].copy(),
+        })
+        return df
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+from interactive_trader.bar_buffer import bar_columns, empty_historical_data
+from interactive_trader.durations import bar_period, last_completed_bar
+from interactive_trader.synchronous_functions import fetch_historical_data
+
+# On-disk cache of historical bars. Each series, keyed by
+#   (conId or symbol, secType, exchange, currency, barSizeSetting,
+#    whatToShow, useRTH), lives in its own directory as one .npy file per
+#   column plus a meta.json recording which time range has been fetched.
+# Reads memory-map the column files, and get_bars() only asks IB for the
+#   part of a requested range that falls outside what's already covered,
+#   split into as many requests as the bar size needs. Only completed bars
+#   are stored: a bar still forming would be recorded as covered and never
+#   refreshed.
+#
+#   store = bar_store('bars')
+#   bars = store.get_bars(contract, '2017-01-01', '2022-04-13',
+#                         barSizeSetting='1 day', whatToShow='TRADES')
+
+
+def series_key(contract, barSizeSetting, whatToShow, useRTH):
+    instrument = contract.conId or contract.symbol
+    return (str(instrument), contract.secType, contract.exchange,
+            contract.currency, barSizeSetting, whatToShow, bool(useRTH))
+
+
+class bar_store:
+
+    def __init__(self, root, fetch=fetch_historical_data):
+        # fetch: called like fetch_historical_data to get missing bars.
+        self.root = root
+        self.fetch = fetch
+        self.hits = 0
+        self.fetches = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, key):
+        readable = re.sub(r'[^A-Za-z0-9]+', '_', '_'.join(map(str, key)))
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()[:12]
+        return os.path.join(self.root, readable.strip('_') + '-' + digest)
+
+    def coverage(self, key):
+        # (start, end) of the range already fetched for a series, or None.
+        try:
+            with open(os.path.join(self.path(key), 'meta.json')) as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return None
+        return pd.Timestamp(meta['start']), pd.Timestamp(meta['end'])
+
+    def read(self, key):
+        # Every cached bar of a series, sorted by date; empty if none.
+        path = self.path(key)
+        if not os.path.exists(os.path.join(path, 'meta.json')):
+            return empty_historical_data()
+        columns = {}
+        for name in bar_columns:
+            columns[name] = np.load(os.path.join(path, name + '.npy'),
+                                    mmap_mode='r')
+        return pd.DataFrame(columns, columns=bar_columns)
+
+    def write(self, key, bars, start, end):
+        # Replaces a series with `bars`, recorded as covering [start, end].
+        path = self.path(key)
+        os.makedirs(path, exist_ok=True)
+        bars = bars.sort_values('date', kind='stable')
+        for name in bar_columns:
+            values = bars[name].to_numpy()
+            if name == 'date':
+                values = values.astype('datetime64[ns]')
+            tmp = os.path.join(path, name + '.tmp.npy')
+            np.save(tmp, values)
+            os.replace(tmp, os.path.join(path, name + '.npy'))
+        meta = {'key': list(key), 'start': str(pd.Timestamp(start)),
+                'end': str(pd.Timestamp(end)), 'rows': len(bars)}
+        tmp = os.path.join(path, 'meta.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(path, 'meta.json'))
+
+    def merge(self, key, new_bars, start, end):
+        # Adds freshly fetched bars to a series; where dates overlap the new
+        #   bar wins. Coverage grows to include [start, end].
+        # The cached bars are copied out of their memory maps first: write()
+        #   replaces the very files they map, which Windows refuses to do
+        #   while a mapping is open.
+        old_bars = pd.DataFrame({name: np.array(values) for name, values
+                                 in self.read(key).items()},
+                                columns=bar_columns)
+        coverage = self.coverage(key)
+        if coverage is not None:
+            start = min(pd.Timestamp(start), coverage[0])
+            end = max(pd.Timestamp(end), coverage[1])
+        frames = [df for df in (old_bars, new_bars) if len(df)]
+        if frames:
+            bars = pd.concat(frames, ignore_index=True)
+            bars['date'] = bars['date'].astype('datetime64[ns]')
+            bars = bars.drop_duplicates('date', keep='last')
+        else:
+            bars = empty_historical_data()
+        self.write(key, bars, start, end)
+        return bars
+
+    def missing_ranges(self, key, start, end, overlap=pd.Timedelta(0)):
+        # Parts of [start, end] not yet covered: at most a head and a tail.
+        #   The tail reaches `overlap` back into the covered range, so the
+        #   newest cached bar gets replaced by IB's current version of it.
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        coverage = self.coverage(key)
+        if coverage is None:
+            return [(start, end)]
+        ranges = []
+        if start < coverage[0]:
+            ranges.append((start, min(coverage[0], end)))
+        if end > coverage[1]:
+            ranges.append((max(coverage[1] - overlap, start), end))
+        return ranges
+
+    def get_bars(self, contract, start, end=None, barSizeSetting='1 day',
+                 whatToShow='TRADES', useRTH=True, **fetch_kwargs):
+        # Bars for contract with dates in [start, end] (end defaults to now).
+        #   Only ranges outside the cached coverage are fetched from IB, and
+        #   never past the last completed bar, so asking for bars up to now
+        #   twice in the same bar period only goes to IB once.
+        #   fetch_kwargs (session=, hostname=, ...) are passed to fetch.
+        end = pd.Timestamp.now() if end is None else pd.Timestamp(end)
+        start = pd.Timestamp(start)
+        fetch_end = min(end, last_completed_bar(barSizeSetting))
+        key = series_key(contract, barSizeSetting, whatToShow, useRTH)
+        with self._lock:
+            ranges = []
+            if start <= fetch_end:
+                ranges = self.missing_ranges(key, start, fetch_end,
+                                             bar_period(barSizeSetting))
+            if not ranges:
+                self.hits += 1
+            for range_start, range_end in ranges:
+                self.fetches += 1
+                new_bars = self.fetch(
+                    contract, start=range_start, end=range_end,
+                    barSizeSetting=barSizeSetting, whatToShow=whatToShow,
+                    useRTH=useRTH, **fetch_kwargs
+                )
+                self.merge(key, new_bars, range_start, range_end)
+            bars = self.read(key)
+        dates = bars['date']
+        bars = bars[(dates >= start) & (dates <= end)]
+        return bars.reset_index(drop=True)
@@ -0,0 +1,199 @@
+import threading
+import time
+
+from interactive_trader.ibkr_app import order_ack_statuses
+from interactive_trader.ibkr_app import order_reject_statuses
+from interactive_trader.request_registry import is_warning
+
+# Basket states. A basket is 'working' until every leg is acknowledged (or
+#   filled, with complete_on='fill'), which makes it 'complete'; a rejected
+#   leg makes it 'rejected' and the deadline passing makes it 'timed_out',
+#   and either way the legs still working are cancelled.
+basket_final_states = ('complete', 'rejected', 'timed_out')
+# Leg statuses after which nothing more happens to the order.
+settled_statuses = ('Filled',) + order_reject_statuses
+
+
+class basket_order:
+    # Places every leg of a basket (e.g. a pair trade's stock_a and stock_b
+    #   orders) back to back over one session, with ids allocated together
+    #   up front, and follows all the legs in one object.
+    #
+    #   pair = basket_order(session, [(pep, buy_pep), (ko, sell_ko)],
+    #                       on_done=handle_pair).submit()
+    #   pair.wait()      # 'complete', 'rejected' or 'timed_out'
+    #   pair.report()    # legs' statuses, submit / ack / fill skew
+    #
+    # on_done is called once, with the basket, when it reaches a final
+    #   state. The legs are still followed after that (e.g. the fills of a
+    #   basket complete on 'ack') until none is working; close() stops it
+    #   sooner.
+    # Skews are the spread between the first and last leg: of the placeOrder
+    #   calls, of the acknowledgements and of the fills. The submit skew is
+    #   the part this code controls. 'sent' is taken when placeOrder is
+    #   called: with an outbound_scheduler running that's when the order is
+    #   queued, and the socket write happens later on the scheduler's
+    #   thread, so the real skew can be larger by the 'orders' lane wait
+    #   that scheduler.stats() reports.
+
+    def __init__(self, session, legs, complete_on='ack', timeout=10,
+                 on_done=None):
+        if complete_on not in ('ack', 'fill'):
+            raise Exception("basket_order", "complete_on",
+                            "must be 'ack' or 'fill'")
+        self.session = session
+        self.app = session.app
+        self.complete_on = complete_on
+        self.timeout = timeout
+        self.on_done = on_done
+        self.state = 'new'
+        self.reason = None
+        self._orders = list(legs)
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._timer = None
+        self.legs = []
+
+    def submit(self):
+        app = self.app
+        first_id = app.order_ids.allocate(len(self._orders))
+        with self._lock:
+            for i, (contract, order) in enumerate(self._orders):
+                self.legs.append({
+                    'order_id': first_id + i, 'symbol': contract.symbol,
+                    'action': order.action, 'quantity': order.totalQuantity,
+                    'status': None, 'filled': 0.0, 'avg_fill_price': None,
+                    'sent': None, 'acked': None, 'filled_at': None,
+                    'error': None
+                })
+            self._by_order_id = {leg['order_id']: leg for leg in self.legs}
+            self.state = 'working'
+        app.add_event_listener(self._on_event)
+        if self.timeout is not None:
+            self._timer = threading.Timer(self.timeout, self._time_out)
+            self._timer.daemon = True
+            self._timer.start()
+        for leg, (contract, order) in zip(self.legs, self._orders):
+            with self._lock:
+                if self.state != 'working':
+                    # A leg already failed: don't send the rest.
+                    leg['status'] = 'NotSent'
+                    continue
+                leg['sent'] = time.perf_counter()
+            app.placeOrder(leg['order_id'], contract, order)
+        return self
+
+    def wait(self, timeout=None):
+        # The basket's final state, or its current one if timeout runs out.
+        self._done.wait(timeout)
+        return self.state
+
+    def close(self):
+        # Stops following the legs. Done by itself once every sent leg is
+        #   filled, rejected or cancelled.
+        self.app.remove_event_listener(self._on_event)
+
+    def _on_event(self, event, data):
+        now = time.perf_counter()
+        row = data['row']
+        finish = False
+        if event == 'order_status':
+            leg = self._by_order_id.get(row['order_id'])
+            if leg is None:
+                return
+            with self._lock:
+                leg['status'] = row['status']
+                leg['filled'] = row['filled']
+                leg['avg_fill_price'] = row['avg_fill_price']
+                if leg['acked'] is None and \
+                        row['status'] in order_ack_statuses:
+                    leg['acked'] = now
+                if leg['filled_at'] is None and row['status'] == 'Filled':
+                    leg['filled_at'] = now
+                if row['status'] in order_reject_statuses:
+                    finish = self._finish_locked(
+                        'rejected',
+                        'order %s %s' % (row['order_id'], row['status']))
+                elif all(leg[self._done_key] is not None
+                         for leg in self.legs):
+                    finish = self._finish_locked('complete')
+                settled = self.state != 'working' and \
+                    not any(self._working(leg) for leg in self.legs)
+        elif event == 'error_message':
+            leg = self._by_order_id.get(row['reqId'])
+            if leg is None or is_warning(row['errorCode']):
+                return
+            with self._lock:
+                leg['error'] = '%s: %s' % (row['errorCode'],
+                                           row['errorString'])
+                finish = self._finish_locked(
+                    'rejected', 'order %s error %s' % (row['reqId'],
+                                                       leg['error']))
+            settled = False
+        else:
+            return
+        if finish:
+            self._after_finish()
+        if settled:
+            self.close()
+
+    @property
+    def _done_key(self):
+        return 'acked' if self.complete_on == 'ack' else 'filled_at'
+
+    @staticmethod
+    def _working(leg):
+        # Sent, and neither finished nor refused by IB.
+        return leg['sent'] is not None and leg['error'] is None and \
+            leg['status'] not in settled_statuses
+
+    def _time_out(self):
+        with self._lock:
+            finish = self._finish_locked('timed_out',
+                                         'not %s after %s s' % (
+                                             self.complete_on, self.timeout))
+        if finish:
+            self._after_finish()
+
+    def _finish_locked(self, state, reason=None):
+        # True if this call ended the basket; the caller then runs
+        #   _after_finish once the lock is released.
+        if self.state != 'working':
+            return False
+        self.state = state
+        self.reason = reason
+        return True
+
+    def _after_finish(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        if self.state != 'complete':
+            # Cancel what's still working.
+            for leg in self.legs:
+                if self._working(leg):
+                    self.app.cancelOrder(leg['order_id'])
+        self._done.set()
+        if self.on_done is not None:
+            self.on_done(self)
+
+    def report(self):
+        # The legs (times in ms after the first placeOrder) and the skews.
+        with self._lock:
+            legs = [dict(leg) for leg in self.legs]
+        starts = [leg['sent'] for leg in legs if leg['sent'] is not None]
+        origin = min(starts) if starts else None
+
+        def skew_ms(key):
+            times = [leg[key] for leg in legs if leg[key] is not None]
+            if len(times) < len(legs):
+                return None
+            return (max(times) - min(times)) * 1e3
+
+        skews = {'submit_skew_ms': skew_ms('sent'),
+                 'ack_skew_ms': skew_ms('acked'),
+                 'fill_skew_ms': skew_ms('filled_at')}
+        for leg in legs:
+            for key in ('sent', 'acked', 'filled_at'):
+                if leg[key] is not None:
+                    leg[key] = (leg[key] - origin) * 1e3
+        return dict(state=self.state, reason=self.reason, legs=legs, **skews)
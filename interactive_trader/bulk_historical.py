@@ -0,0 +1,206 @@
+import queue
+import time
+from collections import deque, namedtuple
+
+from interactive_trader.session import get_session
+from interactive_trader.session import default_hostname, default_port
+from interactive_trader.session import default_client_id
+
+# One historical data download. Fields after whatToShow are optional.
+historical_job = namedtuple(
+    'historical_job',
+    ['contract', 'durationStr', 'barSizeSetting', 'whatToShow',
+     'endDateTime', 'useRTH'],
+    defaults=['', True]
+)
+
+
+def is_pacing_error(error):
+    # IB reports pacing violations as error 162 ('... pacing violation') or
+    #   420 ('Invalid Real-time Query: ... pacing violation').
+    if len(error.args) < 3 or error.args[0] != "ibkr_app":
+        return False
+    code, message = error.args[1], str(error.args[2])
+    return code == 420 or (code == 162 and 'pacing violation' in message)
+
+
+def is_no_data_error(error):
+    # A request covering only a weekend or holiday gets error 162 'HMDS
+    #   query returned no data' rather than an empty set of bars.
+    if len(error.args) < 3 or error.args[0] != "ibkr_app":
+        return False
+    return error.args[1] == 162 and 'returned no data' in str(error.args[2])
+
+
+def is_retryable(error):
+    # Timeouts and dropped connections are worth another try; anything else
+    #   IB rejected (no data, bad contract, no permissions) isn't.
+    return len(error.args) >= 2 and error.args[1] in ("timeout",
+                                                      "disconnected")
+
+
+def print_progress(progress):
+    print(
+        f"{progress['completed']}/{progress['total']} done, "
+        f"{progress['failed']} failed, {progress['in_flight']} in flight, "
+        f"{progress['queued']} queued, {progress['retries']} retries, "
+        f"{progress['jobs_per_sec']:.2f} jobs/sec, "
+        f"{progress['bars_per_sec']:.0f} bars/sec"
+    )
+
+
+class bulk_historical_downloader:
+    # Downloads many historical data jobs over one session while staying
+    #   inside IB's historical data pacing rules:
+    #   * at most max_in_flight requests outstanding at once (IB allows 50);
+    #   * new requests are paced by a token bucket holding `burst` tokens
+    #     and refilling so that no interval_sec window ever sees more than
+    #     requests_per_interval requests (by default 60 per 10 minutes);
+    #     the bucket belongs to the session, so downloaders run one after
+    #     another on the same connection share it instead of each starting
+    #     with a full burst;
+    #   * a pacing violation empties the bucket and pauses sending, starting
+    #     at backoff_sec and doubling up to max_backoff_sec while violations
+    #     keep coming; the job goes back on the queue;
+    #   * timeouts and disconnects are retried up to max_retries times.
+    # on_progress, if given, is called with a dict of counters every
+    #   report_interval seconds and once at the end. on_result, if given, is
+    #   called as on_result(job_index, bars) as each job completes.
+
+    def __init__(self, session, max_in_flight=50, requests_per_interval=60,
+                 interval_sec=600, burst=6, max_retries=3, backoff_sec=15,
+                 max_backoff_sec=600, request_timeout=60, on_progress=None,
+                 report_interval=5, on_result=None):
+        self.session = session
+        self.max_in_flight = max_in_flight
+        # A full bucket plus a window's worth of refill must fit the limit.
+        burst = max(min(burst, requests_per_interval - 1), 1)
+        rate = max(requests_per_interval - burst, 1) / interval_sec
+        self.bucket = session.historical_bucket(rate, burst)
+        self.max_retries = max_retries
+        self.backoff_sec = backoff_sec
+        self.max_backoff_sec = max_backoff_sec
+        self.request_timeout = request_timeout
+        self.on_progress = on_progress
+        self.report_interval = report_interval
+        self.on_result = on_result
+
+    def run(self, jobs):
+        # Returns one entry per job, in job order: the DataFrame of bars, or
+        #   the exception that made the job fail for good.
+        jobs = [job if isinstance(job, historical_job)
+                else historical_job(*job) for job in jobs]
+        results = [None] * len(jobs)
+        attempts = [0] * len(jobs)
+        waiting = deque(range(len(jobs)))
+        done = queue.Queue()
+        in_flight = {}
+        self.progress = {
+            'total': len(jobs), 'completed': 0, 'failed': 0, 'in_flight': 0,
+            'queued': len(waiting), 'retries': 0, 'pacing_violations': 0,
+            'bars': 0, 'jobs_per_sec': 0.0, 'bars_per_sec': 0.0
+        }
+        start = time.monotonic()
+        paused_until = 0.0
+        paused_at = float('-inf')
+        backoff = self.backoff_sec
+        sent_at = {}
+        next_report = start + self.report_interval
+
+        while waiting or in_flight:
+            now = time.monotonic()
+            # Send as much as the in-flight cap, the bucket and any pacing
+            #   pause allow.
+            while (waiting and len(in_flight) < self.max_in_flight and
+                   now >= paused_until and self.bucket.try_acquire()):
+                i = waiting.popleft()
+                attempts[i] += 1
+                req_id, request = self._send(jobs[i], i, done)
+                in_flight[req_id] = request
+                sent_at[req_id] = time.monotonic()
+
+            # Sleep until a response arrives or there's something else to do.
+            wake = next_report
+            if waiting and len(in_flight) < self.max_in_flight:
+                wake = min(wake, max(paused_until,
+                                     now + self.bucket.wait_time()))
+            deadlines = [r.deadline for r in in_flight.values()
+                         if r.deadline is not None]
+            if deadlines:
+                wake = min(wake, min(deadlines))
+            try:
+                req_id, i, request = done.get(
+                    timeout=max(wake - time.monotonic(), 0.0))
+            except queue.Empty:
+                req_id = None
+            # Overdue requests fail with a timeout and come back through the
+            #   queue on a later pass.
+            self.session.app.requests.expire()
+
+            if req_id is not None:
+                del in_flight[req_id]
+                request_sent_at = sent_at.pop(req_id)
+                error = request.exception()
+                if error is None:
+                    results[i] = request.result()
+                    self.progress['completed'] += 1
+                    self.progress['bars'] += len(results[i])
+                    backoff = self.backoff_sec
+                    if self.on_result is not None:
+                        self.on_result(i, results[i])
+                elif is_pacing_error(error):
+                    self.progress['pacing_violations'] += 1
+                    self.progress['retries'] += 1
+                    # Requests sent before the current pause began belong to
+                    #   the burst that caused it, so they don't extend it.
+                    if request_sent_at >= paused_at:
+                        self.bucket.drain()
+                        paused_at = time.monotonic()
+                        paused_until = paused_at + backoff
+                        backoff = min(backoff * 2, self.max_backoff_sec)
+                    waiting.appendleft(i)
+                elif is_retryable(error) and attempts[i] <= self.max_retries:
+                    if error.args[1] == "timeout":
+                        self.session.app.cancelHistoricalData(req_id)
+                    self.progress['retries'] += 1
+                    waiting.append(i)
+                else:
+                    results[i] = error
+                    self.progress['failed'] += 1
+
+            if time.monotonic() >= next_report:
+                self._report(start, waiting, in_flight)
+                next_report = time.monotonic() + self.report_interval
+
+        self._report(start, waiting, in_flight)
+        return results
+
+    def _send(self, job, i, done):
+        session = self.session
+        req_id = session.next_req_id()
+        request = session.request(req_id, self.request_timeout)
+        request.add_done_callback(lambda r: done.put((req_id, i, r)))
+        session.app.reqHistoricalData(
+            req_id, job.contract, job.endDateTime, job.durationStr,
+            job.barSizeSetting, job.whatToShow, job.useRTH, formatDate=1,
+            keepUpToDate=False, chartOptions=[])
+        return req_id, request
+
+    def _report(self, start, waiting, in_flight):
+        elapsed = max(time.monotonic() - start, 1e-9)
+        self.progress['in_flight'] = len(in_flight)
+        self.progress['queued'] = len(waiting)
+        self.progress['jobs_per_sec'] = self.progress['completed'] / elapsed
+        self.progress['bars_per_sec'] = self.progress['bars'] / elapsed
+        if self.on_progress is not None:
+            self.on_progress(dict(self.progress))
+
+
+def fetch_historical_data_bulk(jobs, hostname=default_hostname,
+                               port=default_port, client_id=default_client_id,
+                               session=None, **kwargs):
+    # jobs: (contract, durationStr, barSizeSetting, whatToShow[, endDateTime,
+    #   useRTH]) tuples or historical_job objects. kwargs go to
+    #   bulk_historical_downloader.
+    session = session or get_session(hostname, port, client_id)
+    return bulk_historical_downloader(session, **kwargs).run(jobs)
@@ -0,0 +1,135 @@
+import atexit
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+# In-memory LRU cache with a time-to-live, for lookups whose answers rarely
+#   change during a day: contract details and symbol searches. Entries
+#   expire ttl_sec after they were stored, and once max_entries is reached
+#   the least recently used entry is dropped. If path is given the cache is
+#   loaded from it on creation and saved back save_delay_sec after a change
+#   (so a fan-out of hundreds of lookups is written once) and at exit, so it
+#   survives restarts. hits, misses and evictions count cache traffic.
+# The fetch functions key their entries by gateway host and port as well,
+#   so a paper and a live session never share answers.
+#
+#   cache = contract_cache(max_entries=5000, ttl_sec=6 * 3600,
+#                          path='contract_cache.pickle')
+#   fetch_contract_details(contract, cache=cache)
+
+
+def contract_key(contract):
+    # Every Contract field that changes what reqContractDetails matches.
+    return (
+        contract.conId, contract.symbol, contract.secType,
+        contract.lastTradeDateOrContractMonth, contract.strike,
+        contract.right, contract.multiplier, contract.exchange,
+        contract.primaryExchange, contract.currency, contract.localSymbol,
+        contract.tradingClass, contract.includeExpired, contract.secIdType,
+        contract.secId
+    )
+
+
+class contract_cache:
+
+    def __init__(self, max_entries=1024, ttl_sec=24 * 3600, path=None,
+                 save_delay_sec=1.0):
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self.path = path
+        self.save_delay_sec = save_delay_sec
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # key -> (expiry as a unix time, value); oldest use first.
+        self._entries = OrderedDict()
+        self._save_timer = None
+        if path is not None:
+            if os.path.exists(path):
+                self.load()
+            atexit.register(self.flush)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries), 'hits': self.hits,
+                'misses': self.misses, 'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+    def get(self, key):
+        # The cached value, or None if there's none or it has expired.
+        #   DataFrames are copied so callers can't change the cached one.
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.time():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return entry[1].copy()
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl_sec, value.copy())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._schedule_save()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._schedule_save()
+
+    def flush(self):
+        # Saves a pending change now instead of when the save timer fires.
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+                self._save()
+
+    def load(self):
+        with open(self.path, 'rb') as f:
+            entries = pickle.load(f)
+        now = time.time()
+        with self._lock:
+            self._entries = OrderedDict(
+                (key, entry) for key, entry in entries.items()
+                if entry[0] > now
+            )
+
+    def _schedule_save(self):
+        # Called holding _lock. Changes made before the timer fires go out
+        #   in the same save.
+        if self.path is None or self._save_timer is not None:
+            return
+        self._save_timer = threading.Timer(self.save_delay_sec, self.flush)
+        self._save_timer.daemon = True
+        self._save_timer.start()
+
+    def _save(self):
+        # Written to a temporary file and swapped in, so a crash mid-write
+        #   leaves the previous file intact.
+        tmp = self.path + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(self._entries, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
+
+
+# Used by fetch_contract_details and fetch_matching_symbols unless they're
+#   given another cache, or cache=None to always ask IB.
+shared_contract_cache = contract_cache()
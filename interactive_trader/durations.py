@@ -0,0 +1,86 @@
+import math
+
+import pandas as pd
+
+# Helpers for turning time ranges into the endDateTime / durationStr
+#   arguments reqHistoricalData expects.
+
+day = 86400
+
+# Longest span (seconds) one reqHistoricalData call may cover for each bar
+#   size, following IB's historical data step-size table. None means IB
+#   serves years of bars in one request, so ranges are never split.
+max_duration_seconds = {
+    '1 secs': 1800, '5 secs': 3600, '10 secs': 14400, '15 secs': 14400,
+    '30 secs': 28800, '1 min': day, '2 mins': 2 * day, '3 mins': 7 * day,
+    '5 mins': 7 * day, '10 mins': 7 * day, '15 mins': 7 * day,
+    '20 mins': 7 * day, '30 mins': 30 * day, '1 hour': 30 * day,
+    '2 hours': 30 * day, '3 hours': 30 * day, '4 hours': 30 * day,
+    '8 hours': 30 * day, '1 day': None, '1 week': None, '1 month': None
+}
+
+
+def bar_period(barSizeSetting):
+    # Length of one bar at barSizeSetting ('1 month' counts as 31 days).
+    if barSizeSetting not in max_duration_seconds:
+        raise Exception("bar_period", "bar size",
+                        "unknown barSizeSetting %r" % barSizeSetting)
+    n, unit = barSizeSetting.split()
+    unit = {'secs': 'seconds', 'min': 'minutes', 'mins': 'minutes',
+            'hour': 'hours', 'hours': 'hours', 'day': 'days',
+            'week': 'weeks', 'month': 'days'}[unit]
+    if barSizeSetting == '1 month':
+        n = 31
+    return pd.Timedelta(**{unit: int(n)})
+
+
+def last_completed_bar(barSizeSetting, now=None):
+    # Start of the newest bar at barSizeSetting that has finished by now
+    #   (default the current time); the bar after it is still forming.
+    now = pd.Timestamp.now() if now is None else pd.Timestamp(now)
+    if barSizeSetting == '1 month':
+        return now.normalize().replace(day=1) - pd.DateOffset(months=1)
+    if barSizeSetting == '1 week':
+        week = now.normalize() - pd.Timedelta(days=now.weekday())
+        return week - pd.Timedelta(days=7)
+    period = bar_period(barSizeSetting)
+    return now.floor(period) - period
+
+
+def duration_str(start, end):
+    # Smallest IB duration string covering [start, end]. IB only accepts
+    #   seconds up to a day and days up to a year, so longer spans are
+    #   rounded up to whole years.
+    seconds = (pd.Timestamp(end) - pd.Timestamp(start)).total_seconds()
+    seconds = max(int(math.ceil(seconds)), 1)
+    if seconds <= day:
+        return '%d S' % seconds
+    days = int(math.ceil(seconds / day))
+    if days <= 365:
+        return '%d D' % days
+    return '%d Y' % int(math.ceil(days / 365))
+
+
+def end_date_time(end):
+    # endDateTime string for a timestamp, in the gateway's local time zone.
+    return pd.Timestamp(end).strftime('%Y%m%d %H:%M:%S')
+
+
+def chunk_ranges(start, end, barSizeSetting):
+    # Splits [start, end] into consecutive (chunk_start, chunk_end) pieces,
+    #   oldest first, each short enough for one request at barSizeSetting.
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    if barSizeSetting not in max_duration_seconds:
+        raise Exception("chunk_ranges", "bar size",
+                        "unknown barSizeSetting %r" % barSizeSetting)
+    limit = max_duration_seconds[barSizeSetting]
+    if limit is None or end <= start:
+        return [(start, end)]
+    step = pd.Timedelta(seconds=limit)
+    ranges = []
+    chunk_start = start
+    while chunk_start < end:
+        chunk_end = min(chunk_start + step, end)
+        ranges.append((chunk_start, chunk_end))
+        chunk_start = chunk_end
+    return ranges
@@ -0,0 +1,129 @@
+import logging
+import logging.handlers
+import threading
+import time
+from collections import Counter, deque
+
+import numpy as np
+import pandas as pd
+
+error_columns = ['reqId', 'errorCode', 'errorString']
+
+
+class error_log:
+    # Fixed-capacity ring buffer of the errors and notices IB sends on a
+    #   connection. Once full, each new message evicts the oldest one, so a
+    #   long-lived connection uses constant memory no matter how many pacing
+    #   warnings and farm notices arrive.
+    # Secondary indexes by reqId and errorCode, plus lifetime counts per
+    #   errorCode, are kept up to date on every insert and eviction.
+    # If spill_path is given, evicted messages are written there through a
+    #   RotatingFileHandler instead of being dropped.
+
+    def __init__(self, capacity=1000, spill_path=None,
+                 spill_max_bytes=10 * 2 ** 20, spill_backup_count=5):
+        capacity = max(int(capacity), 1)
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        # Sequence number of the next message; also the log's version.
+        self.version = 0
+        self._req_ids = np.zeros(capacity, dtype=np.int64)
+        self._error_codes = np.zeros(capacity, dtype=np.int64)
+        self._timestamps = np.zeros(capacity, dtype=np.float64)
+        self._error_strings = [None] * capacity
+        self._by_req_id = {}
+        self._by_error_code = {}
+        self.counts = Counter()
+        self._snapshot = None
+        self._snapshot_version = -1
+
+        self._spill = None
+        if spill_path is not None:
+            handler = logging.handlers.RotatingFileHandler(
+                spill_path, maxBytes=spill_max_bytes,
+                backupCount=spill_backup_count
+            )
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            self._spill = logging.Logger('interactive_trader.error_log.spill')
+            self._spill.addHandler(handler)
+            self._spill.propagate = False
+
+    def __len__(self):
+        return min(self.version, self.capacity)
+
+    @property
+    def first_seq(self):
+        # Sequence number of the oldest message still held.
+        return self.version - len(self)
+
+    def append(self, req_id, error_code, error_string):
+        with self._lock:
+            seq = self.version
+            slot = seq % self.capacity
+            if seq >= self.capacity:
+                self._evict(slot)
+            self._req_ids[slot] = req_id
+            self._error_codes[slot] = error_code
+            self._timestamps[slot] = time.time()
+            self._error_strings[slot] = error_string
+            self._by_req_id.setdefault(req_id, deque()).append(seq)
+            self._by_error_code.setdefault(error_code, deque()).append(seq)
+            self.counts[error_code] += 1
+            self.version = seq + 1
+            return seq
+
+    def _evict(self, slot):
+        # The message in `slot` is the oldest one held, so it is also the
+        #   oldest entry in both of its index deques.
+        req_id = int(self._req_ids[slot])
+        error_code = int(self._error_codes[slot])
+        for index, key in ((self._by_req_id, req_id),
+                           (self._by_error_code, error_code)):
+            seqs = index[key]
+            seqs.popleft()
+            if not seqs:
+                del index[key]
+        if self._spill is not None:
+            self._spill.error(
+                '%.6f\t%d\t%d\t%s', self._timestamps[slot], req_id,
+                error_code, self._error_strings[slot]
+            )
+
+    def _frame(self, seqs):
+        slots = [seq % self.capacity for seq in seqs]
+        return pd.DataFrame({
+            'reqId': self._req_ids[slots],
+            'errorCode': self._error_codes[slots],
+            'errorString': [self._error_strings[i] for i in slots]
+        }, columns=error_columns)
+
+    def since(self, seq):
+        # Messages with sequence number >= seq that are still held, and the
+        #   sequence number to pass next time.
+        with self._lock:
+            start = max(seq, self.first_seq)
+            return self._frame(range(start, self.version)), self.version
+
+    def by_req_id(self, req_id):
+        with self._lock:
+            return self._frame(list(self._by_req_id.get(req_id, ())))
+
+    def by_error_code(self, error_code):
+        with self._lock:
+            return self._frame(list(self._by_error_code.get(error_code, ())))
+
+    def snapshot(self):
+        # Every message still held, oldest first, in the layout of the old
+        #   ibkr_app.error_messages frame. Rebuilt only when a message arrived
+        #   since the previous call.
+        with self._lock:
+            if self._snapshot_version != self.version:
+                self._snapshot = self._frame(range(self.first_seq,
+                                                   self.version))
+                self._snapshot_version = self.version
+            return self._snapshot
+
+    def close(self):
+        if self._spill is not None:
+            for handler in self._spill.handlers:
+                handler.close()
@@ -1,4 +1,6 @@
 
+import socket
+import threading
 import pandas as pd
 from ibapi.client import EClient
 from ibapi.wrapper import EWrapper
@@ -7,94 +9,220 @@ from ibapi.contract import *
 from ibapi.order import *
 from ibapi.order_state import OrderState
 from datetime import datetime
+from interactive_trader.bar_buffer import bar_buffer, empty_historical_data
+from interactive_trader.error_log import error_log
+from interactive_trader.order_ids import order_id_allocator
+from interactive_trader.order_state_store import order_state_store
+from interactive_trader.request_registry import request_registry, is_warning
+
+contract_details_columns = [
+    'con_id', 'symbol', 'long_name', 'industry', 'category', 'subcategory',
+    'sec_type', 'stock_type', 'exchange', 'primary_exchange', 'currency',
+    'local_symbol', 'market_name', 'min_tick', 'order_types',
+    'valid_exchanges', 'price_magnifier', 'time_zone_id', 'trading_hours',
+    'liquid_hours'
+]
+
+# Order statuses that count as IB having accepted or rejected an order.
+order_ack_statuses = ('Submitted', 'Filled')
+order_reject_statuses = ('ApiCancelled', 'Cancelled', 'Inactive')
 
 # This is the main app that we'll be using for sync and async functions.
 class ibkr_app(EWrapper, EClient):
-    def __init__(self):
+    def __init__(self, error_capacity=1000, error_spill_path=None):
         EClient.__init__(self, self)
-        self.error_messages = pd.DataFrame(columns=[
-            'reqId', 'errorCode', 'errorString'
-        ])
+        # Only the most recent error_capacity messages are kept in memory;
+        #   older ones are written to error_spill_path if one is given.
+        self.errors = error_log(error_capacity, error_spill_path)
         self.next_valid_id = None
+        # Order (and request) ids, seeded by nextValidId and then handed out
+        #   locally; checked against the gateway with reqIds now and then.
+        self.order_ids = order_id_allocator(request_ids=lambda: self.reqIds(-1))
         self.current_time = None
-        self.historical_data = pd.DataFrame(
-            columns=['date', 'open', 'high', 'low', 'close', 'volume',
-                     'bar_count', 'average']
-        )
+        # Bars are collected per reqId in a columnar buffer while a request
+        #   is in flight, and turned into a DataFrame once, at
+        #   historicalDataEnd. historical_data always holds the most recently
+        #   finished request; historical_data_by_req_id holds all of them.
+        self.historical_data_buffers = {}
+        self.historical_data_by_req_id = {}
+        self.historical_data = empty_historical_data()
         self.historical_data_end = None
+        # reqId -> callables given (reqId, bar) for every bar that arrives on
+        #   that request: historical, keepUpToDate updates and real-time bars.
+        self.bar_listeners = {}
+        # Callables given (event, data) for every order status change
+        #   ('order_status', the order's row and the store version) and every
+        #   message ('error_message', the row and its sequence number).
+        self.event_listeners = []
+        # Guards both listener collections. Listeners are called on a
+        #   snapshot taken under it, so one may add or remove listeners
+        #   (itself included) while it's being called.
+        self.listeners_lock = threading.Lock()
+        # Contract details rows are collected per reqId until
+        #   contractDetailsEnd; contract_details holds the latest finished set.
+        self.contract_details_rows = {}
         self.contract_details = None
         self.contract_details_end = None
+        self.contract_details_by_req_id = {}
         self.matching_symbols = None
-        self.order_status = pd.DataFrame(
-            columns=['order_id', 'perm_id', 'status', 'filled', 'remaining',
-                     'avg_fill_price', 'parent_id', 'last_fill_price',
-                     'client_id', 'why_held', 'mkt_cap_price']
-        )
+        self.matching_symbols_by_req_id = {}
+        self.order_states = order_state_store()
+        # Outstanding requests, resolved by the callbacks below. A finished
+        #   response goes to whoever registered for it; if nobody did, it's
+        #   left in the matching *_by_req_id dict, unless it's the late
+        #   answer to a request that timed out, which nobody will collect.
+        self.requests = request_registry()
+
+    @property
+    def order_status(self):
+        # Latest status of every order, one row per order_id.
+        return self.order_states.snapshot()
+
+    @property
+    def error_messages(self):
+        # Errors still held by the error log, oldest first.
+        return self.errors.snapshot()
 
+    def add_event_listener(self, listener):
+        with self.listeners_lock:
+            self.event_listeners.append(listener)
+
+    def remove_event_listener(self, listener):
+        with self.listeners_lock:
+            if listener in self.event_listeners:
+                self.event_listeners.remove(listener)
+
+    def _notify_event(self, event, data):
+        with self.listeners_lock:
+            listeners = tuple(self.event_listeners)
+        for listener in listeners:
+            listener(event, data)
 
     def error(self, reqId:TickerId, errorCode:int, errorString:str):
-        self.error_messages = pd.concat(
-            [self.error_messages, pd.DataFrame({
-                "reqId": [reqId],
-                "errorCode": [errorCode],
-                "errorString": [errorString]
-            })])
+        seq = self.errors.append(reqId, errorCode, errorString)
+        if self.event_listeners:
+            self._notify_event('error_message', {
+                'seq': seq,
+                'row': {'reqId': reqId, 'errorCode': errorCode,
+                        'errorString': errorString}
+            })
+        if reqId != -1 and not is_warning(errorCode):
+            error = Exception("ibkr_app", errorCode, errorString)
+            # Drop anything a failed request had collected so far.
+            self.historical_data_buffers.pop(reqId, None)
+            self.contract_details_rows.pop(reqId, None)
+            if not self.requests.fail(reqId, error):
+                # A timed-out request failing late: no answer will follow.
+                self.requests.abandoned(reqId)
+            self.requests.fail(('order', reqId), error)
+
+    def connectAck(self):
+        # ibapi leaves Nagle's algorithm on, so a message sent right after
+        #   another (the second leg of a pair, pipelined requests) waits for
+        #   the gateway to acknowledge the first.
+        self.conn.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY,
+                                    1)
+
+    def connectionClosed(self):
+        self.requests.fail_all(
+            Exception("ibkr_app", "disconnected", "connection closed")
+        )
 
     def managedAccounts(self, accountsList:str):
         self.managed_accounts = [i for i in accountsList.split(",") if i]
 
     def nextValidId(self, orderId:int):
         self.next_valid_id = orderId
+        self.order_ids.seed(orderId)
+        self.requests.resolve('next_valid_id', orderId)
 
     def currentTime(self, time:int):
         self.current_time = datetime.fromtimestamp(time)
+        self.requests.resolve('current_time', self.current_time)
+
+    def add_bar_listener(self, reqId, listener):
+        with self.listeners_lock:
+            self.bar_listeners.setdefault(reqId, []).append(listener)
+
+    def remove_bar_listener(self, reqId, listener):
+        with self.listeners_lock:
+            listeners = self.bar_listeners.get(reqId, [])
+            if listener in listeners:
+                listeners.remove(listener)
+            if not listeners:
+                self.bar_listeners.pop(reqId, None)
+
+    def _notify_bar(self, reqId, bar):
+        with self.listeners_lock:
+            listeners = tuple(self.bar_listeners.get(reqId, ()))
+        for listener in listeners:
+            listener(reqId, bar)
 
     def historicalData(self, reqId:int, bar:BarData):
-        self.historical_data = pd.concat(
-            [
-                self.historical_data,
-                pd.DataFrame(
-                    {
-                        'date': [bar.date],
-                        'open': [bar.open],
-                        'high': [bar.high],
-                        'low': [bar.low],
-                        'close': [bar.close],
-                    }
-                )
-            ],
-            ignore_index=True
-        )
+        buffer = self.historical_data_buffers.get(reqId)
+        if buffer is None:
+            buffer = self.historical_data_buffers[reqId] = bar_buffer()
+        buffer.append(bar)
+        self._notify_bar(reqId, bar)
+
+    def historicalDataUpdate(self, reqId:int, bar:BarData):
+        # keepUpToDate requests: the bar still forming is sent again each
+        #   time it changes, then the next one starts.
+        self._notify_bar(reqId, bar)
+
+    def realtimeBar(self, reqId:TickerId, time:int, open_:float, high:float,
+                    low:float, close:float, volume:int, wap:float,
+                    count:int):
+        # Passed on as a BarData dated with its epoch start time, so
+        #   listeners see the same kind of bar as from historicalData.
+        bar = BarData()
+        bar.date = time
+        bar.open, bar.high, bar.low, bar.close = open_, high, low, close
+        bar.volume, bar.average, bar.barCount = volume, wap, count
+        self._notify_bar(reqId, bar)
+
+    def _keep_unclaimed(self, reqId, answers, answer):
+        # An answer nobody was waiting for.
+        if not self.requests.abandoned(reqId):
+            answers[reqId] = answer
 
     def historicalDataEnd(self, reqId:int, start:str, end:str):
+        buffer = self.historical_data_buffers.pop(reqId, None)
+        if buffer is None:
+            historical_data = empty_historical_data()
+        else:
+            historical_data = buffer.to_dataframe()
+        self.historical_data = historical_data
         self.historical_data_end = reqId
+        if not self.requests.resolve(reqId, historical_data):
+            self._keep_unclaimed(reqId, self.historical_data_by_req_id,
+                                 historical_data)
 
     def contractDetailsEnd(self, reqId: int):
         self.contract_details_end = reqId
+        rows = self.contract_details_rows.pop(reqId, [])
+        self.contract_details = pd.DataFrame(rows,
+                                             columns=contract_details_columns)
+        if not self.requests.resolve(reqId, self.contract_details):
+            self._keep_unclaimed(reqId, self.contract_details_by_req_id,
+                                 self.contract_details)
 
     def contractDetails(self, reqId:int, contractDetails:ContractDetails):
-        self.contract_details = pd.DataFrame({
-            "con_id": [contractDetails.contract.conId],
-            "symbol": [contractDetails.contract.symbol],
-            "long_name": [contractDetails.longName],
-            "industry": [contractDetails.industry],
-            "category": [contractDetails.category],
-            "subcategory": [contractDetails.subcategory],
-            "sec_type": [contractDetails.contract.secType],
-            "stock_type": [contractDetails.stockType],
-            "exchange": [contractDetails.contract.exchange],
-            "primary_exchange": [contractDetails.contract.primaryExchange],
-            "currency": [contractDetails.contract.currency],
-            "local_symbol": [contractDetails.contract.localSymbol],
-            "market_name": [contractDetails.marketName],
-            "min_tick": [contractDetails.minTick],
-            "order_types": [contractDetails.orderTypes],
-            "valid_exchanges": [contractDetails.validExchanges],
-            "price_magnifier": [contractDetails.priceMagnifier],
-            "time_zone_id": [contractDetails.timeZoneId],
-            "trading_hours": [contractDetails.tradingHours],
-            "liquid_hours": [contractDetails.liquidHours]
-        })
+        # An ambiguous contract gets one callback per match; they're all
+        #   collected and handed over together at contractDetailsEnd.
+        contract = contractDetails.contract
+        self.contract_details_rows.setdefault(reqId, []).append((
+            contract.conId, contract.symbol, contractDetails.longName,
+            contractDetails.industry, contractDetails.category,
+            contractDetails.subcategory, contract.secType,
+            contractDetails.stockType, contract.exchange,
+            contract.primaryExchange, contract.currency,
+            contract.localSymbol, contractDetails.marketName,
+            contractDetails.minTick, contractDetails.orderTypes,
+            contractDetails.validExchanges, contractDetails.priceMagnifier,
+            contractDetails.timeZoneId, contractDetails.tradingHours,
+            contractDetails.liquidHours
+        ))
 
     def symbolSamples(self, reqId:int,
                       contractDescriptions:ListOfContractDescription):
@@ -119,28 +247,26 @@ class ibkr_app(EWrapper, EClient):
                 ignore_index=True
             )
         self.matching_symbols = df
+        if not self.requests.resolve(reqId, df):
+            self._keep_unclaimed(reqId, self.matching_symbols_by_req_id, df)
 
     def orderStatus(self, orderId:OrderId , status:str, filled:float,
                     remaining:float, avgFillPrice:float, permId:int,
                     parentId:int, lastFillPrice:float, clientId:int,
                     whyHeld:str, mktCapPrice: float):
-        self.order_status = pd.concat(
-            [
-                self.order_status,
-                pd.DataFrame({
-                    'order_id': [orderId],
-                    'perm_id': [permId],
-                    'status': [status],
-                    'filled': [filled],
-                    'remaining': [remaining],
-                    'avg_fill_price': [avgFillPrice],
-                    'parent_id': [parentId],
-                    'last_fill_price': [lastFillPrice],
-                    'client_id': [clientId],
-                    'why_held': [whyHeld],
-                    'mkt_cap_price': [mktCapPrice]
-                })
-            ],
-            ignore_index=True
+        previous_version = self.order_states.version
+        version = self.order_states.update(
+            orderId, permId, status, filled, remaining, avgFillPrice,
+            parentId, lastFillPrice, clientId, whyHeld, mktCapPrice
         )
-        self.order_status.drop_duplicates(inplace=True)
+        # Repeats of an unchanged status don't bump the version.
+        if self.event_listeners and version != previous_version:
+            self._notify_event('order_status', {
+                'version': version, 'row': self.order_states.get(orderId)
+            })
+        if status in order_ack_statuses:
+            self.requests.resolve(('order', orderId),
+                                  self.order_states.get(orderId))
+        elif status in order_reject_statuses:
+            self.requests.fail(('order', orderId),
+                               Exception("ibkr_app", "order", status))
@@ -0,0 +1,60 @@
+import threading
+import time
+
+
+class order_id_allocator:
+    # Hands out order ids locally from one counter, instead of a reqIds
+    #   round trip per order. It's seeded by the first nextValidId and never
+    #   goes backwards: every later nextValidId (a reconnect, or the periodic
+    #   resync below) can only move it forward, past ids used elsewhere.
+    # If request_ids is given, it's called (e.g. app.reqIds(-1)) by the
+    #   first allocate() more than resync_sec after the last nextValidId (or
+    #   the last unanswered resync), and the answer comes back through
+    #   seed().
+    #
+    #   ids = order_id_allocator(request_ids=lambda: app.reqIds(-1))
+    #   ids.seed(next_valid_id)       # from the nextValidId callback
+    #   order_id = ids.allocate()
+    #   first = ids.allocate(2)       # first, first + 1 for a pair
+
+    def __init__(self, request_ids=None, resync_sec=60):
+        self.request_ids = request_ids
+        self.resync_sec = resync_sec
+        self.allocated = 0
+        self.resyncs = 0
+        self._lock = threading.Lock()
+        self._next_id = None
+        self._last_synced = None
+
+    @property
+    def is_seeded(self):
+        return self._next_id is not None
+
+    def seed(self, next_valid_id):
+        with self._lock:
+            if self._next_id is None or next_valid_id > self._next_id:
+                self._next_id = next_valid_id
+            self._last_synced = time.monotonic()
+
+    def peek(self):
+        # The id the next allocate() will start at.
+        return self._next_id
+
+    def allocate(self, n=1):
+        # The first of n consecutive ids, now reserved for the caller.
+        with self._lock:
+            if self._next_id is None:
+                raise Exception("order_id_allocator", "not_seeded",
+                                "no nextValidId received yet")
+            order_id = self._next_id
+            self._next_id += n
+            self.allocated += n
+            now = time.monotonic()
+            resync = (self.request_ids is not None and
+                      now - self._last_synced >= self.resync_sec)
+            if resync:
+                self._last_synced = now
+                self.resyncs += 1
+        if resync:
+            self.request_ids()
+        return order_id
@@ -0,0 +1,151 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+order_status_columns = ['order_id', 'perm_id', 'status', 'filled', 'remaining',
+                        'avg_fill_price', 'parent_id', 'last_fill_price',
+                        'client_id', 'why_held', 'mkt_cap_price']
+
+# Statuses documented by IB, so the history buffer can hold a small integer
+#   code instead of a string. Anything else gets a new code when first seen.
+order_status_codes = ['ApiPending', 'PendingSubmit', 'PendingCancel',
+                      'PreSubmitted', 'Submitted', 'ApiCancelled', 'Cancelled',
+                      'Filled', 'Inactive']
+
+_history_dtype = np.dtype([
+    ('version', np.int64),
+    ('timestamp', np.float64),
+    ('order_id', np.int64),
+    ('perm_id', np.int64),
+    ('status', np.int16),
+    ('filled', np.float64),
+    ('remaining', np.float64),
+    ('avg_fill_price', np.float64),
+    ('last_fill_price', np.float64),
+])
+
+
+class order_state_store:
+    # Latest state of every order seen on a connection, keyed by order_id.
+    # Each orderStatus update is O(1): it replaces the order's row in a dict
+    #   and appends one record to a typed transition history. Every update
+    #   bumps a version number so readers can cheaply ask what changed since
+    #   the last time they looked.
+
+    def __init__(self, history_capacity=1024):
+        self._lock = threading.Lock()
+        self.version = 0
+        # order_id -> (version, row), in the order the orders were first seen.
+        self._latest = {}
+        # order_id -> its row number in snapshot().
+        self._positions = {}
+        # order_id -> version, most recently updated last, so changed_since()
+        #   only walks the orders that actually changed.
+        self._changes = OrderedDict()
+        self._order_id_by_perm_id = {}
+        self._status_codes = {s: i for i, s in enumerate(order_status_codes)}
+        self._history = np.empty(max(int(history_capacity), 1),
+                                 dtype=_history_dtype)
+        self._history_size = 0
+        self._snapshot = None
+        self._snapshot_version = -1
+
+    def __len__(self):
+        return len(self._latest)
+
+    def status_code(self, status):
+        code = self._status_codes.get(status)
+        if code is None:
+            code = self._status_codes[status] = len(self._status_codes)
+        return code
+
+    @property
+    def status_names(self):
+        # Index -> status string, for decoding the 'status' history column.
+        return list(self._status_codes)
+
+    def update(self, order_id, perm_id, status, filled, remaining,
+               avg_fill_price, parent_id, last_fill_price, client_id,
+               why_held, mkt_cap_price):
+        row = (order_id, perm_id, status, filled, remaining, avg_fill_price,
+               parent_id, last_fill_price, client_id, why_held, mkt_cap_price)
+        with self._lock:
+            previous = self._latest.get(order_id)
+            # IB often repeats an identical status; those aren't transitions.
+            if previous is not None and previous[1] == row:
+                return self.version
+            self.version += 1
+            if previous is None:
+                self._positions[order_id] = len(self._latest)
+            self._latest[order_id] = (self.version, row)
+            self._changes[order_id] = self.version
+            self._changes.move_to_end(order_id)
+            if perm_id:
+                self._order_id_by_perm_id[perm_id] = order_id
+            self._append_history(row)
+            return self.version
+
+    def _append_history(self, row):
+        if self._history_size == len(self._history):
+            grown = np.empty(len(self._history) * 2, dtype=_history_dtype)
+            grown[:self._history_size] = self._history
+            self._history = grown
+        self._history[self._history_size] = (
+            self.version, time.time(), row[0], row[1],
+            self.status_code(row[2]), row[3], row[4], row[5], row[7]
+        )
+        self._history_size += 1
+
+    def get(self, order_id):
+        # Latest row for an order as a dict, or None if it hasn't been seen.
+        with self._lock:
+            entry = self._latest.get(order_id)
+        if entry is None:
+            return None
+        return dict(zip(order_status_columns, entry[1]))
+
+    def get_by_perm_id(self, perm_id):
+        order_id = self._order_id_by_perm_id.get(perm_id)
+        if order_id is None:
+            return None
+        return self.get(order_id)
+
+    def changed_since(self, version):
+        # Rows of the orders updated after `version`, oldest change first, and
+        #   the version they bring the caller up to.
+        with self._lock:
+            rows = []
+            for order_id, row_version in reversed(self._changes.items()):
+                if row_version <= version:
+                    break
+                rows.append(self._latest[order_id][1])
+            current = self.version
+        rows.reverse()
+        return pd.DataFrame(rows, columns=order_status_columns), current
+
+    def row_positions(self, order_ids):
+        # Row number of each order in snapshot(), which never changes once
+        #   an order has been seen.
+        with self._lock:
+            return [self._positions[order_id] for order_id in order_ids]
+
+    def snapshot(self):
+        # Latest state of every order as a DataFrame, in the same layout as
+        #   the old ibkr_app.order_status frame. Rebuilt only when something
+        #   changed since the previous call.
+        with self._lock:
+            if self._snapshot_version != self.version:
+                self._snapshot = pd.DataFrame(
+                    [row for _, row in self._latest.values()],
+                    columns=order_status_columns
+                )
+                self._snapshot_version = self.version
+            return self._snapshot
+
+    def history(self):
+        # Every recorded transition, oldest first, as a typed record array.
+        with self._lock:
+            return self._history[:self._history_size].copy()
@@ -0,0 +1,110 @@
+import threading
+import time
+
+import numpy as np
+
+from interactive_trader.ibkr_app import order_reject_statuses
+from interactive_trader.token_bucket import token_bucket
+
+
+class order_submitter:
+    # Places orders over one long-lived, connected ibkr_app as fast as the
+    #   caller (or rate_limit) allows: ids come from app.order_ids, so no
+    #   order waits for a reqIds or for the previous order's answer. Each
+    #   order's submit-to-acknowledge latency is the time from placeOrder to
+    #   its first orderStatus callback.
+    #
+    #   submitter = order_submitter(session.app)
+    #   for contract, order in orders:
+    #       submitter.submit(contract, order)
+    #   submitter.wait(timeout=10)
+    #   submitter.latency_stats()  # {'acked': ..., 'p50_ms': ..., ...}
+    #
+    # rate_limit / burst: orders per second and how many may go out at once
+    #   (IB disconnects a client sending more than 50 messages per second,
+    #   so the default stays under it like outbound_scheduler's). None sends
+    #   as fast as submit() is called, e.g. when an outbound_scheduler is
+    #   already pacing the connection.
+
+    def __init__(self, app, rate_limit=45, burst=5):
+        self.app = app
+        self.bucket = None
+        if rate_limit is not None:
+            self.bucket = token_bucket(rate_limit, burst or rate_limit)
+        self._lock = threading.Lock()
+        self._all_acked = threading.Condition(self._lock)
+        # order_id -> perf_counter() at placeOrder, until acknowledged.
+        self._sent = {}
+        self._latencies = []
+        self._statuses = {}
+        self.submitted = 0
+        self.rejected = 0
+        app.add_event_listener(self._on_event)
+
+    def close(self):
+        self.app.remove_event_listener(self._on_event)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def submit(self, contract, order, order_id=None):
+        # Returns the order's id (allocated here unless given).
+        if self.bucket is not None:
+            self.bucket.acquire()
+        if order_id is None:
+            order_id = self.app.order_ids.allocate()
+        with self._lock:
+            self._sent[order_id] = time.perf_counter()
+            self.submitted += 1
+        self.app.placeOrder(order_id, contract, order)
+        return order_id
+
+    def _on_event(self, event, data):
+        if event != 'order_status':
+            return
+        arrived = time.perf_counter()
+        order_id = data['row']['order_id']
+        with self._lock:
+            sent = self._sent.pop(order_id, None)
+            if sent is None:
+                # Not ours, or a later status of an acknowledged order.
+                if order_id in self._statuses:
+                    self._statuses[order_id] = data['row']['status']
+                return
+            self._latencies.append(arrived - sent)
+            self._statuses[order_id] = data['row']['status']
+            if data['row']['status'] in order_reject_statuses:
+                self.rejected += 1
+            if not self._sent:
+                self._all_acked.notify_all()
+
+    def status(self, order_id):
+        # Latest status of one of this submitter's orders; None until its
+        #   first orderStatus.
+        return self._statuses.get(order_id)
+
+    @property
+    def pending(self):
+        return len(self._sent)
+
+    def wait(self, timeout=None):
+        # True once every order submitted so far has been acknowledged.
+        with self._lock:
+            return self._all_acked.wait_for(lambda: not self._sent, timeout)
+
+    def latency_stats(self):
+        with self._lock:
+            latencies = np.array(self._latencies) * 1e3
+            stats = {'submitted': self.submitted, 'acked': len(latencies),
+                     'rejected': self.rejected, 'pending': len(self._sent)}
+        if len(latencies):
+            stats.update({
+                'mean_ms': latencies.mean(),
+                'p50_ms': np.percentile(latencies, 50),
+                'p99_ms': np.percentile(latencies, 99),
+                'max_ms': latencies.max()
+            })
+        return stats
@@ -0,0 +1,171 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+from ibapi.client import EClient
+from ibapi.message import OUT
+
+from interactive_trader.token_bucket import token_bucket
+
+# Lanes in priority order. Orders and their cancels go first, then market
+#   data subscriptions, contract lookups and historical backfill. Anything
+#   else (startApi, reqIds, currentTime, account requests) is rare and
+#   small and goes in 'control', ahead of everything.
+lanes = ('control', 'orders', 'market_data', 'contracts', 'historical')
+
+lane_message_ids = {
+    'orders': (OUT.PLACE_ORDER, OUT.CANCEL_ORDER, OUT.REQ_GLOBAL_CANCEL,
+               OUT.EXERCISE_OPTIONS),
+    'market_data': (OUT.REQ_MKT_DATA, OUT.CANCEL_MKT_DATA, OUT.REQ_MKT_DEPTH,
+                    OUT.CANCEL_MKT_DEPTH, OUT.REQ_REAL_TIME_BARS,
+                    OUT.CANCEL_REAL_TIME_BARS, OUT.REQ_TICK_BY_TICK_DATA,
+                    OUT.CANCEL_TICK_BY_TICK_DATA),
+    'contracts': (OUT.REQ_CONTRACT_DATA, OUT.REQ_MATCHING_SYMBOLS,
+                  OUT.REQ_SEC_DEF_OPT_PARAMS, OUT.REQ_MARKET_RULE),
+    'historical': (OUT.REQ_HISTORICAL_DATA, OUT.CANCEL_HISTORICAL_DATA,
+                   OUT.REQ_HEAD_TIMESTAMP, OUT.CANCEL_HEAD_TIMESTAMP,
+                   OUT.REQ_HISTORICAL_TICKS, OUT.REQ_HISTOGRAM_DATA,
+                   OUT.CANCEL_HISTOGRAM_DATA)
+}
+_lane_by_message_id = {message_id: lane
+                       for lane, message_ids in lane_message_ids.items()
+                       for message_id in message_ids}
+
+
+def default_lane_for(message_id):
+    return _lane_by_message_id.get(message_id, 'control')
+
+
+class outbound_scheduler:
+    # Sits between an ibkr_app's request methods and its socket: every
+    #   message EClient would send goes into a queue per lane instead, and
+    #   one thread sends them, always from the highest-priority lane that
+    #   may send. So an order placed during a burst of historical requests
+    #   waits for at most one message, not for the whole burst.
+    #
+    #   scheduler = outbound_scheduler(session.app).start()
+    #   ...
+    #   scheduler.stats()   # per lane: sent, queued, queue wait p50/p99/max
+    #   scheduler.stop()
+    #
+    # max_rate / burst: a token bucket for all messages together; IB
+    #   disconnects a client sending more than 50 messages per second.
+    #   lane_rates: optional per-lane limits in messages per second (a lane
+    #   missing or None is limited only by max_rate), e.g. to keep
+    #   historical backfill from using up the whole budget.
+    # Messages keep their order within a lane (a cancel never overtakes its
+    #   request), not across lanes.
+
+    def __init__(self, app, max_rate=45, burst=5, lane_rates=None,
+                 lane_for=default_lane_for, wait_samples=10000):
+        if lane_rates is None:
+            lane_rates = {'market_data': 20, 'contracts': 20,
+                          'historical': 10}
+        self.app = app
+        self.lane_for = lane_for
+        self.bucket = token_bucket(max_rate, burst)
+        self.lane_buckets = {
+            lane: token_bucket(rate, max(1, min(burst, rate)))
+            for lane, rate in lane_rates.items() if rate is not None
+        }
+        self._queues = {lane: deque() for lane in lanes}
+        self._ready = threading.Condition()
+        self._running = False
+        self._thread = None
+        self._sent = dict.fromkeys(lanes, 0)
+        self._dropped = 0
+        # Recent queue waits per lane, in seconds.
+        self._waits = {lane: deque(maxlen=wait_samples) for lane in lanes}
+
+    def start(self):
+        # Takes over app.sendMsg and starts the sending thread.
+        self._running = True
+        self._thread = threading.Thread(target=self._send_loop,
+                                        name='outbound-scheduler',
+                                        daemon=True)
+        self._thread.start()
+        self.app.sendMsg = self.send
+        return self
+
+    def stop(self):
+        # Sends what's queued, then gives app.sendMsg back.
+        with self._ready:
+            self._running = False
+            self._ready.notify()
+        if self._thread is not None:
+            self._thread.join()
+        if self.app.__dict__.get('sendMsg') == self.send:
+            del self.app.sendMsg
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def send(self, msg):
+        # Called by EClient in place of sendMsg, from the requesting thread.
+        lane = self.lane_for(int(msg[:msg.index('\0')]))
+        with self._ready:
+            self._queues[lane].append((time.perf_counter(), msg))
+            self._ready.notify()
+
+    def _next_message(self):
+        # The lane and message to send next, and 0; or None and how long
+        #   to wait before something may go. Called holding _ready.
+        wait = None
+        for lane in lanes:
+            if not self._queues[lane]:
+                continue
+            bucket = self.lane_buckets.get(lane)
+            if bucket is not None:
+                lane_wait = bucket.wait_time()
+                if lane_wait > 0:
+                    wait = lane_wait if wait is None else min(wait, lane_wait)
+                    continue
+            global_wait = self.bucket.wait_time()
+            if global_wait > 0:
+                return None, global_wait
+            if bucket is not None:
+                bucket.try_acquire()
+            self.bucket.try_acquire()
+            return (lane, self._queues[lane].popleft()), 0
+        return None, wait
+
+    def _send_loop(self):
+        while True:
+            with self._ready:
+                message, wait = self._next_message()
+                if message is None:
+                    if not self._running and \
+                            not any(self._queues.values()):
+                        return
+                    self._ready.wait(wait)
+                    continue
+            lane, (queued, msg) = message
+            self._waits[lane].append(time.perf_counter() - queued)
+            try:
+                EClient.sendMsg(self.app, msg)
+                self._sent[lane] += 1
+            except Exception:
+                # Disconnected while it was queued; EClient would have
+                #   failed the same way.
+                self._dropped += 1
+
+    def stats(self):
+        stats = {}
+        with self._ready:
+            queued = {lane: len(queue) for lane, queue in self._queues.items()}
+            waits = {lane: np.array(samples) * 1e3
+                     for lane, samples in self._waits.items()}
+        for lane in lanes:
+            stats[lane] = {'sent': self._sent[lane], 'queued': queued[lane]}
+            if len(waits[lane]):
+                stats[lane].update({
+                    'wait_p50_ms': np.percentile(waits[lane], 50),
+                    'wait_p99_ms': np.percentile(waits[lane], 99),
+                    'wait_max_ms': waits[lane].max()
+                })
+        stats['dropped'] = self._dropped
+        return stats
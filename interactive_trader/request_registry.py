@@ -0,0 +1,133 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError
+
+# Error codes IB uses for notices and warnings rather than for a failed
+#   request: 2100-2199 (data farm and account notices), 399 (order warning)
+#   and 10167 (delayed market data is being shown).
+def is_warning(error_code):
+    return 2100 <= error_code < 2200 or error_code in (399, 10167)
+
+
+class pending_request(Future):
+    # A concurrent.futures.Future for one outstanding request, with the
+    #   deadline it was registered with. The wrapper callbacks resolve it
+    #   directly, so a waiting caller wakes up as soon as the response is in.
+
+    def __init__(self, key, timeout=None):
+        Future.__init__(self)
+        self.key = key
+        self.timeout = timeout
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+
+    def remaining(self):
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0.0)
+
+
+class request_registry:
+    # Maps each outstanding request to a pending_request. Keys are the reqId
+    #   for tagged requests, ('order', orderId) for order acknowledgements and
+    #   a name ('next_valid_id', 'current_time') for responses IB doesn't tag.
+
+    # A request given up on (timed out) is remembered as abandoned, so its
+    #   answer, if it still comes, can be dropped instead of kept for a
+    #   caller that's gone. Only the abandoned_capacity most recent are.
+
+    def __init__(self, abandoned_capacity=1000):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self.abandoned_capacity = abandoned_capacity
+        self._abandoned = OrderedDict()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def __contains__(self, key):
+        return key in self._pending
+
+    def register(self, key, timeout=None):
+        # Register before sending the request, so a fast response can't
+        #   arrive before anyone is listening for it.
+        request = pending_request(key, timeout)
+        with self._lock:
+            self._pending[key] = request
+        return request
+
+    def get(self, key):
+        return self._pending.get(key)
+
+    def discard(self, key):
+        with self._lock:
+            return self._pending.pop(key, None)
+
+    def abandon(self, key):
+        # Stops waiting for key; see abandoned().
+        with self._lock:
+            request = self._pending.pop(key, None)
+            self._abandoned[key] = None
+            while len(self._abandoned) > self.abandoned_capacity:
+                self._abandoned.popitem(last=False)
+        return request
+
+    def abandoned(self, key):
+        # True (once) if key was abandoned: its late answer can be dropped.
+        with self._lock:
+            if key not in self._abandoned:
+                return False
+            del self._abandoned[key]
+            return True
+
+    def resolve(self, key, result):
+        # True if a request was waiting for this key.
+        request = self.discard(key)
+        if request is None or request.done():
+            return False
+        request.set_result(result)
+        return True
+
+    def fail(self, key, error):
+        request = self.discard(key)
+        if request is None or request.done():
+            return False
+        request.set_exception(error)
+        return True
+
+    def fail_all(self, error):
+        with self._lock:
+            requests = list(self._pending.values())
+            self._pending.clear()
+        for request in requests:
+            if not request.done():
+                request.set_exception(error)
+
+    def expire(self):
+        # Fails every request whose deadline has passed. Needed by callers
+        #   that collect results through callbacks instead of wait().
+        now = time.monotonic()
+        with self._lock:
+            expired = [r for r in self._pending.values()
+                       if r.deadline is not None and r.deadline <= now]
+            for request in expired:
+                del self._pending[request.key]
+                self._abandoned[request.key] = None
+            while len(self._abandoned) > self.abandoned_capacity:
+                self._abandoned.popitem(last=False)
+        for request in expired:
+            if not request.done():
+                request.set_exception(Exception(
+                    "ibkr_app", "timeout", "%r not received" % (request.key,)
+                ))
+        return len(expired)
+
+    def wait(self, request, function_name, what):
+        # Blocks until the request is resolved or its deadline passes, and
+        #   raises the same timeout exception the synchronous functions always
+        #   have if it doesn't arrive in time.
+        try:
+            return request.result(request.remaining())
+        except TimeoutError:
+            self.abandon(request.key)
+            raise Exception(function_name, "timeout", what + " not received")
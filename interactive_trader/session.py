@@ -0,0 +1,148 @@
+from interactive_trader.ibkr_app import ibkr_app
+from interactive_trader.token_bucket import token_bucket
+import threading
+
+# If you want different default values, configure it here.
+default_hostname = '127.0.0.1'
+default_port = 7497
+default_client_id = 10645 # can set and use your Master Client ID
+timeout_sec = 5
+
+
+class ibkr_session:
+    # One connected ibkr_app, kept alive and shared by many requests.
+    # Connecting costs a socket handshake, a reader thread and a wait for
+    #   nextValidId; a session pays that once and then hands out request ids
+    #   so several requests can be in flight on the same connection.
+    #
+    #   with ibkr_session(port=7497, client_id=1) as session:
+    #       fetch_contract_details(contract, session=session)
+
+    def __init__(self, hostname=default_hostname, port=default_port,
+                 client_id=default_client_id, timeout=timeout_sec):
+        self.hostname = hostname
+        self.port = int(port)
+        self.client_id = int(client_id)
+        self.timeout = timeout
+        self.app = None
+        self._lock = threading.Lock()
+        self._untagged_lock = threading.Lock()
+        self._historical_bucket = None
+
+    def __enter__(self):
+        return self.connect()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.disconnect()
+
+    def is_connected(self):
+        return self.app is not None and self.app.isConnected()
+
+    def connect(self):
+        with self._lock:
+            if self.is_connected():
+                return self
+            app = ibkr_app()
+            ready = app.requests.register('next_valid_id', self.timeout)
+            # EClient.connect() does the handshake itself, so once it returns
+            #   we're either connected or never will be.
+            app.connect(self.hostname, self.port, self.client_id)
+            if not app.isConnected():
+                app.disconnect()
+                raise Exception(
+                    "ibkr_session",
+                    "connection",
+                    "couldn't connect to IBKR"
+                )
+
+            api_thread = threading.Thread(target=app.run, daemon=True)
+            api_thread.start()
+            try:
+                app.requests.wait(ready, "ibkr_session", "next_valid_id")
+            except Exception:
+                app.disconnect()
+                raise
+            self.app = app
+            return self
+
+    def disconnect(self):
+        with self._lock:
+            if self.app is not None:
+                self.app.disconnect()
+                self.app = None
+
+    def next_req_id(self):
+        # Request ids and order ids come from one counter starting at
+        #   nextValidId (the app's order_ids), so an error message's id
+        #   always points at exactly one outstanding request or order.
+        return self.app.order_ids.allocate()
+
+    next_order_id = next_req_id
+
+    def request(self, key, timeout=None):
+        # Registers a pending response on the session's connection; send the
+        #   request after this and pass the result to wait().
+        timeout = self.timeout if timeout is None else timeout
+        return self.app.requests.register(key, timeout)
+
+    def untagged_request(self, key, send):
+        # Responses IB doesn't tag with a reqId (e.g. currentTime) can't be
+        #   told apart, so concurrent callers share one outstanding request.
+        with self._untagged_lock:
+            request = self.app.requests.get(key)
+            if request is None:
+                request = self.request(key)
+                send()
+            return request
+
+    def historical_bucket(self, rate, capacity):
+        # The token bucket pacing historical data requests on this
+        #   connection. IB's pacing limits apply per connection, so every
+        #   bulk_historical_downloader on the session draws from the same
+        #   bucket; the first one to ask sets its rate and capacity.
+        with self._lock:
+            if self._historical_bucket is None:
+                self._historical_bucket = token_bucket(rate, capacity)
+            return self._historical_bucket
+
+    def wait(self, request, function_name, what):
+        return self.app.requests.wait(request, function_name, what)
+
+
+# Sessions shared by the synchronous functions, one per
+#   (hostname, port, client_id), created on first use.
+_sessions = {}
+_sessions_lock = threading.Lock()
+_exit_watcher = None
+
+
+def _close_sessions_at_exit():
+    # ibapi's reader thread isn't a daemon, so an open session would keep the
+    #   interpreter alive after the main thread ends. This daemon thread wakes
+    #   up when the main thread finishes and disconnects the shared sessions.
+    threading.main_thread().join()
+    close_sessions()
+
+
+def get_session(hostname=default_hostname, port=default_port,
+                client_id=default_client_id):
+    global _exit_watcher
+    key = (hostname, int(port), int(client_id))
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _sessions[key] = ibkr_session(*key)
+        if _exit_watcher is None:
+            _exit_watcher = threading.Thread(target=_close_sessions_at_exit,
+                                             daemon=True)
+            _exit_watcher.start()
+    return session.connect()
+
+
+def close_sessions():
+    # Disconnects every shared session, e.g. before the process exits.
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        session.disconnect()
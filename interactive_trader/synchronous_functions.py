@@ -1,256 +1,199 @@
-
-from interactive_trader.ibkr_app import ibkr_app
-import threading
-import time
-from datetime import datetime
-
-# If you want different default values, configure it here.
-default_hostname = '127.0.0.1'
-default_port = 7497
-default_client_id = 10645 # can set and use your Master Client ID
-timeout_sec = 5
+import pandas as pd
+
+from interactive_trader.bar_buffer import empty_historical_data
+from interactive_trader.bulk_historical import bulk_historical_downloader
+from interactive_trader.bulk_historical import historical_job
+from interactive_trader.bulk_historical import is_no_data_error
+from interactive_trader.contract_cache import contract_key
+from interactive_trader.contract_cache import shared_contract_cache
+from interactive_trader.durations import chunk_ranges, duration_str
+from interactive_trader.durations import end_date_time
+from interactive_trader.session import get_session
+from interactive_trader.session import default_hostname, default_port
+from interactive_trader.session import default_client_id, timeout_sec
+
+# Every function below runs over an ibkr_session. Pass session= to use one
+#   you manage yourself; otherwise a shared session for (hostname, port,
+#   client_id) is created on first use and kept connected for later calls.
+
+# Each function is split into the steps before and after the wait, shared
+#   with the awaitable versions in aio.py: _request_* registers and sends a
+#   request and returns its pending_request, and the rest of the function
+#   only waits for it.
+
+def _check_range_arguments(start, end, on_chunk, pacing):
+    if start is None and (pacing or on_chunk is not None or
+                          end is not None):
+        raise Exception("fetch_historical_data", "arguments",
+                        "end, on_chunk and pacing need start")
+
+def _cache_key(session, hostname, port, key):
+    # Cache entries are kept per gateway, so a paper and a live session
+    #   never answer for each other.
+    if session is not None:
+        hostname, port = session.hostname, session.port
+    return (hostname, int(port)) + key
+
+def _request_current_time(session):
+    return session.untagged_request('current_time', session.app.reqCurrentTime)
+
+def _request_historical_data(session, contract, endDateTime, durationStr,
+                             barSizeSetting, whatToShow, useRTH, timeout):
+    tickerId = session.next_req_id()
+    request = session.request(tickerId, timeout)
+    session.app.reqHistoricalData(
+        tickerId, contract, endDateTime, durationStr, barSizeSetting,
+        whatToShow, useRTH, formatDate=1, keepUpToDate=False, chartOptions=[])
+    return request
+
+def _request_contract_details(session, contract):
+    tickerId = session.next_req_id()
+    request = session.request(tickerId)
+    session.app.reqContractDetails(tickerId, contract)
+    return request
+
+def _request_matching_symbols(session, pattern):
+    req_id = session.next_req_id()
+    request = session.request(req_id)
+    session.app.reqMatchingSymbols(req_id, pattern)
+    return request
+
+def _request_order(session, contract, order):
+    # The order's id and the request its acknowledgement resolves.
+    order_id = session.next_order_id()
+    request = session.request(('order', order_id))
+    session.app.placeOrder(order_id, contract, order)
+    return order_id, request
+
+def _unacknowledged_order(session, order_id, error):
+    # An order whose acknowledgement timed out may still go live at IB with
+    #   nobody following it, so it's cancelled and the error names it. Any
+    #   other error is passed through.
+    if len(error.args) < 2 or error.args[1] != "timeout":
+        return error
+    session.app.cancelOrder(order_id)
+    return Exception("place_order", "timeout",
+                     "order %d not acknowledged, cancelled" % order_id)
+
+def _order_status(app, order_id):
+    order_status = app.order_status
+    order_status = order_status[order_status['order_id'] == order_id]
+    return order_status.reset_index(drop=True)
 
 def fetch_managed_accounts(hostname=default_hostname, port=default_port,
-                           client_id=default_client_id):
-
-    app = ibkr_app()
-    app.connect(hostname, int(port), int(client_id))
-
-    start_time = datetime.now()
-    while not app.isConnected():
-        time.sleep(0.01)
-        if (datetime.now() - start_time).seconds > timeout_sec:
-            app.disconnect()
-            raise Exception(
-                "fetch_managed_accounts",
-                "timeout",
-                "couldn't connect to IBKR"
-            )
-
-    def run_loop():
-        app.run()
-
-    api_thread = threading.Thread(target=run_loop, daemon=True)
-    api_thread.start()
-    while app.next_valid_id is None:
-        time.sleep(0.01)
-    app.disconnect()
-    return app.managed_accounts
+                           client_id=default_client_id, session=None):
+    session = session or get_session(hostname, port, client_id)
+    return session.app.managed_accounts
 
 def fetch_current_time(hostname=default_hostname,
-                       port=default_port, client_id=default_client_id):
-    app = ibkr_app()
-    app.connect(hostname, int(port), int(client_id))
-    start_time = datetime.now()
-    while not app.isConnected():
-        time.sleep(0.01)
-        if (datetime.now() - start_time).seconds > timeout_sec:
-            app.disconnect()
-            raise Exception(
-                "fetch_current_time",
-                "timeout",
-                "couldn't connect to IBKR"
-            )
-
-    def run_loop():
-        app.run()
-
-    api_thread = threading.Thread(target=run_loop, daemon=True)
-    api_thread.start()
-    start_time = datetime.now()
-    while app.next_valid_id is None:
-        time.sleep(0.01)
-        if (datetime.now() - start_time).seconds > timeout_sec:
-            app.disconnect()
-            raise Exception(
-                "fetch_current_time",
-                "timeout",
-                "next_valid_id not received"
-            )
-
-    app.reqCurrentTime()
-    start_time = datetime.now()
-    while app.current_time is None:
-        time.sleep(0.01)
-        if (datetime.now() - start_time).seconds > timeout_sec:
-            app.disconnect()
-            raise Exception(
-                "fetch_current_time",
-                "timeout",
-                "current_time not received"
-            )
-    app.disconnect()
-    return app.current_time
+                       port=default_port, client_id=default_client_id,
+                       session=None):
+    session = session or get_session(hostname, port, client_id)
+    request = _request_current_time(session)
+    return session.wait(request, "fetch_current_time", "current_time")
 
 
 def fetch_historical_data(contract, endDateTime='', durationStr='30 D',
                           barSizeSetting='1 hour', whatToShow='MIDPOINT',
                           useRTH=True, hostname=default_hostname,
-                          port=default_port, client_id=default_client_id):
-    app = ibkr_app()
-    app.connect(hostname, int(port), int(client_id))
-    start_time = datetime.now()
-    while not app.isConnected():
-        time.sleep(0.01)
-    if (datetime.now() - start_time).seconds > timeout_sec:
-        app.disconnect()
-        raise Exception(
-            "fetch_historical_data",
-            "timeout",
-            "couldn't connect to IBKR"
+                          port=default_port, client_id=default_client_id,
+                          session=None, start=None, end=None, on_chunk=None,
+                          timeout=None, pacing=None):
+    # Pass start (and optionally end, default now) instead of endDateTime /
+    #   durationStr to fetch an arbitrary range: it's split into chunks IB
+    #   will serve at barSizeSetting, fetched in parallel within IB's pacing
+    #   limits and stitched back together in date order. pacing is a dict
+    #   of bulk_historical_downloader arguments, e.g. {'max_in_flight': 10}.
+    #   on_chunk(chunk_start, chunk_end, bars) is called as each chunk
+    #   arrives.
+    _check_range_arguments(start, end, on_chunk, pacing)
+    session = session or get_session(hostname, port, client_id)
+    if start is not None:
+        return _fetch_historical_range(
+            session, contract, start, end, barSizeSetting, whatToShow, useRTH,
+            on_chunk, timeout, pacing
         )
-
-    def run_loop():
-        app.run()
-    api_thread = threading.Thread(target=run_loop, daemon=True)
-    api_thread.start()
-    start_time = datetime.now()
-    while app.next_valid_id is None:
-        time.sleep(0.01)
-        if (datetime.now() - start_time).seconds > timeout_sec:
-            app.disconnect()
-            raise Exception(
-                "fetch_historical_data",
-                "timeout",
-                "next_valid_id not received"
-            )
-    tickerId = app.next_valid_id
-    app.reqHistoricalData(
-        tickerId, contract, endDateTime, durationStr, barSizeSetting,
-        whatToShow, useRTH, formatDate=1, keepUpToDate=False, chartOptions=[])
-    start_time = datetime.now()
-    while app.historical_data_end != tickerId:
-        time.sleep(0.01)
-        if (datetime.now() - start_time).seconds > timeout_sec:
-            app.disconnect()
-            raise Exception(
-                "fetch_historical_data",
-                "timeout",
-                "historical_data not received"
-            )
-    app.disconnect()
-    return app.historical_data
+    request = _request_historical_data(
+        session, contract, endDateTime, durationStr, barSizeSetting,
+        whatToShow, useRTH, timeout)
+    return session.wait(request, "fetch_historical_data", "historical_data")
+
+def _fetch_historical_range(session, contract, start, end, barSizeSetting,
+                            whatToShow, useRTH, on_chunk, timeout, pacing):
+    start = pd.Timestamp(start)
+    end = pd.Timestamp.now() if end is None else pd.Timestamp(end)
+    chunks = chunk_ranges(start, end, barSizeSetting)
+    jobs = [historical_job(contract, duration_str(chunk_start, chunk_end),
+                           barSizeSetting, whatToShow,
+                           end_date_time(chunk_end), useRTH)
+            for chunk_start, chunk_end in chunks]
+
+    def on_result(i, bars):
+        if on_chunk is not None:
+            on_chunk(chunks[i][0], chunks[i][1], bars)
+
+    pacing = dict(pacing or {})
+    if timeout is not None:
+        pacing['request_timeout'] = timeout
+    results = bulk_historical_downloader(
+        session, on_result=on_result, **pacing
+    ).run(jobs)
+    # Chunks IB has no data for (weekends, holidays) just add no bars.
+    for result in results:
+        if isinstance(result, Exception) and not is_no_data_error(result):
+            raise result
+
+    frames = [bars for bars in results
+              if not isinstance(bars, Exception) and len(bars)]
+    if not frames:
+        return empty_historical_data()
+    bars = pd.concat(frames, ignore_index=True)
+    bars = bars.drop_duplicates('date', keep='last')
+    bars = bars.sort_values('date', kind='stable')
+    bars = bars[(bars['date'] >= start) & (bars['date'] <= end)]
+    return bars.reset_index(drop=True)
 
 def fetch_contract_details(contract, hostname=default_hostname,
-                           port=default_port, client_id=default_client_id):
-    app = ibkr_app()
-    app.connect(hostname, int(port), int(client_id))
-    start_time = datetime.now()
-    while not app.isConnected():
-        time.sleep(0.01)
-        if (datetime.now() - start_time).seconds > timeout_sec:
-            app.disconnect()
-            raise Exception(
-                "fetch_contract_details",
-                "timeout",
-                "couldn't connect to IBKR"
-            )
-
-    def run_loop():
-        app.run()
-
-    api_thread = threading.Thread(target=run_loop, daemon=True)
-    api_thread.start()
-    start_time = datetime.now()
-    while app.next_valid_id is None:
-        time.sleep(0.01)
-        if (datetime.now() - start_time).seconds > timeout_sec:
-            app.disconnect()
-            raise Exception(
-                "fetch_contract_details",
-                "timeout",
-                "next_valid_id not received"
-            )
-
-    tickerId = app.next_valid_id
-    app.reqContractDetails(tickerId, contract)
-
-    start_time = datetime.now()
-    while app.contract_details_end != tickerId:
-        time.sleep(0.01)
-        if (datetime.now() - start_time).seconds > timeout_sec:
-            app.disconnect()
-            raise Exception(
-                "fetch_contract_details",
-                "timeout",
-                "contract_details not received"
-            )
-
-    app.disconnect()
-
-    return app.contract_details
+                           port=default_port, client_id=default_client_id,
+                           session=None, cache=shared_contract_cache):
+    # Answers come from cache when it holds an unexpired result for the
+    #   same contract fields; pass cache=None to always ask IB.
+    key = _cache_key(session, hostname, port, contract_key(contract))
+    details = None if cache is None else cache.get(key)
+    if details is not None:
+        return details
+    session = session or get_session(hostname, port, client_id)
+    request = _request_contract_details(session, contract)
+    details = session.wait(request, "fetch_contract_details",
+                           "contract_details")
+    if cache is not None:
+        cache.put(key, details)
+    return details
 
 def fetch_matching_symbols(pattern, hostname=default_hostname,
-                           port=default_port, client_id=default_client_id):
-    app = ibkr_app()
-    app.connect(hostname, int(port), int(client_id))
-    start_time = datetime.now()
-    while not app.isConnected():
-        time.sleep(0.01)
-        if (datetime.now() - start_time).seconds > timeout_sec:
-            app.disconnect()
-            raise Exception(
-                "fetch_contract_details",
-                "timeout",
-                "couldn't connect to IBKR"
-            )
-
-    def run_loop():
-        app.run()
-
-    api_thread = threading.Thread(target=run_loop, daemon=True)
-    api_thread.start()
-    start_time = datetime.now()
-    while app.next_valid_id is None:
-        time.sleep(0.01)
-        if (datetime.now() - start_time).seconds > timeout_sec:
-            app.disconnect()
-            raise Exception(
-                "fetch_contract_details",
-                "timeout",
-                "next_valid_id not received"
-            )
-
-    req_id = app.next_valid_id
-    app.reqMatchingSymbols(req_id, pattern)
-
-    start_time = datetime.now()
-    while app.matching_symbols is None:
-        time.sleep(0.01)
-        if (datetime.now() - start_time).seconds > timeout_sec:
-            app.disconnect()
-            raise Exception(
-                "fetch_contract_details",
-                "timeout",
-                "contract_details not received"
-            )
-
-    app.disconnect()
-
-    return app.matching_symbols
+                           port=default_port, client_id=default_client_id,
+                           session=None, cache=shared_contract_cache):
+    key = _cache_key(session, hostname, port, ('matching_symbols', pattern))
+    symbols = None if cache is None else cache.get(key)
+    if symbols is not None:
+        return symbols
+    session = session or get_session(hostname, port, client_id)
+    request = _request_matching_symbols(session, pattern)
+    symbols = session.wait(request, "fetch_matching_symbols",
+                           "matching_symbols")
+    if cache is not None:
+        cache.put(key, symbols)
+    return symbols
 
 def place_order(contract, order, hostname=default_hostname,
-                           port=default_port, client_id=default_client_id):
-
-    app = ibkr_app()
-    app.connect(hostname, port, client_id)
-    while not app.isConnected():
-        time.sleep(0.01)
-
-    def run_loop():
-        app.run()
-
-    api_thread = threading.Thread(target=run_loop, daemon=True)
-    api_thread.start()
-
-    while app.next_valid_id is None:
-        time.sleep(0.01)
-
-    app.placeOrder(app.next_valid_id, contract, order)
-    while not ('Submitted' in set(app.order_status['status'])):
-        time.sleep(0.25)
-
-    app.disconnect()
-
-    return app.order_status
-
+                           port=default_port, client_id=default_client_id,
+                           session=None):
+    # The order's rows of order_status once IB has acknowledged it. If that
+    #   takes longer than the session's timeout the order is cancelled.
+    session = session or get_session(hostname, port, client_id)
+    order_id, request = _request_order(session, contract, order)
+    try:
+        session.wait(request, "place_order", "order_status")
+    except Exception as error:
+        raise _unacknowledged_order(session, order_id, error)
+    return _order_status(session.app, order_id)
@@ -0,0 +1,64 @@
+import threading
+import time
+
+
+class token_bucket:
+    # Classic token bucket: holds up to `capacity` tokens and refills at
+    #   `rate` tokens per second. Taking a token when one is available is
+    #   free; otherwise wait_time() says how long until the next one.
+    # e.g. IB's "60 historical requests per 10 minutes" is
+    #   token_bucket(rate=60 / 600, capacity=60).
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity,
+                           self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    @property
+    def tokens(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+    def try_acquire(self, tokens=1):
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def wait_time(self, tokens=1):
+        # Seconds until `tokens` tokens will be available (0 if they are now).
+        with self._lock:
+            self._refill(time.monotonic())
+            missing = tokens - self._tokens
+            if missing <= 0:
+                return 0.0
+            return missing / self.rate
+
+    def acquire(self, tokens=1, timeout=None):
+        # Blocks until the tokens are taken; False if timeout ran out first.
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.try_acquire(tokens):
+            wait = self.wait_time(tokens)
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+        return True
+
+    def drain(self):
+        # Empties the bucket, e.g. after the server says we're going too fast.
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = 0.0
@@ -0,0 +1,177 @@
+import numpy as np
+
+from blotter import _two_product, _two_sum
+
+# Live version of blotter.py's get_spread -> get_bolling_band ->
+#   get_full_signal for one pair. It keeps only the last n spreads, so each
+#   new bar costs the same however long it has been running. Fed the bars of
+#   a price history in order, it returns exactly the rows get_full_signal
+#   would, one per bar.
+#
+#   engine = pair_signal_engine('pep', 'ko', n=20, k=2)
+#   row = engine.update('2022-04-13', pep_bar, ko_bar)
+#   if row is not None and row['signal'] != 'false': ...
+#
+# or straight from an ibkr_app's bar callbacks, given the reqIds of a
+#   historical (optionally keepUpToDate) or real-time bar request per stock:
+#   engine.attach(app, req_id_pep, req_id_ko, on_row=handle_row)
+#
+# A bar with the same date as the last one replaces it, as keepUpToDate
+#   sends the bar still forming each time it changes; the returned row is
+#   that date's again, recomputed.
+
+
+def _exact_mean(values):
+    # blotter._exact_window_mean for a single window, on Python floats:
+    #   the same operations in the same order, so the same result.
+    n = len(values)
+    total, error = values[0], 0.0
+    for value in values[1:]:
+        total, e = _two_sum(total, value)
+        error += e
+    hi, lo = _two_sum(total, error)
+    quotient = hi / n
+    p, e = _two_product(quotient, float(n))
+    return quotient + (((hi - p) - e) + lo) / n
+
+
+class pair_signal_engine:
+
+    def __init__(self, stock_a, stock_b, n, k, exact=True, block_size=1 << 16):
+        # exact: as in blotter.rolling_mean_std. exact=True gives the same
+        #   floats as get_bolling_band at O(n) work per bar; exact=False
+        #   keeps running sums, O(1) per bar, re-summed from the window
+        #   every block_size bars so their error stays as small as
+        #   rolling_mean_std's.
+        self.stock_a = stock_a
+        self.stock_b = stock_b
+        self.n = n
+        self.k = k
+        self.exact = exact
+        self.block_size = block_size
+        # The last n spreads, stored twice so the window is always the
+        #   contiguous slice _window[_head:_head + n], oldest first.
+        self._window = np.zeros(2 * n)
+        self._head = 0
+        self.count = 0
+        self._last_date = None
+        # Bands of the latest bar and of the one before it; a revised bar
+        #   is compared with _previous again.
+        self._latest = None
+        self._previous = None
+        self._anchor = 0.0
+        self._sum = 0.0
+        self._sum_squares = 0.0
+        self._since_resum = 0
+        # Bars by date for on_bar, until the other stock's bar arrives.
+        self._pending = {}
+
+    def update(self, date, bar_a, bar_b):
+        # bar_a, bar_b: one bar per stock for date, anything with open,
+        #   high, low and close (e.g. an ibapi BarData). Returns the row
+        #   get_full_signal would give for date, as a dict with date,
+        #   <stock>_Open for both stocks, spread, upper_band, lower_band and
+        #   signal; None while fewer than n + 1 bars have been seen.
+        spread = ((bar_a.high + bar_a.low + bar_a.close) / 3 -
+                  (bar_b.high + bar_b.low + bar_b.close) / 3)
+        revised = date == self._last_date
+        if revised:
+            removed = self._window[self._head + self.n - 1]
+        else:
+            removed = self._window[self._head] if self.count >= self.n \
+                else None
+            self._head = (self._head + 1) % self.n
+            self.count += 1
+            self._previous = self._latest
+            self._last_date = date
+        newest = (self._head + self.n - 1) % self.n
+        self._window[newest] = self._window[newest + self.n] = spread
+        if self.count < self.n:
+            self._latest = None
+            return None
+
+        mean, std = self._mean_std(spread, removed, revised)
+        self._latest = (spread, mean + self.k * std, mean - self.k * std)
+        if self._previous is None:
+            # get_full_signal drops the first banded row: it has nothing to
+            #   cross from.
+            return None
+        spread, upper_band, lower_band = self._latest
+        previous_spread, previous_upper, previous_lower = self._previous
+        signal = "false"
+        if spread > upper_band and previous_spread <= previous_upper:
+            signal = "x_up"
+        if spread < lower_band and previous_spread >= previous_lower:
+            signal = "x_down"
+        return {
+            'date': date,
+            self.stock_a + '_Open': bar_a.open,
+            self.stock_b + '_Open': bar_b.open,
+            'spread': spread,
+            'upper_band': upper_band,
+            'lower_band': lower_band,
+            'signal': signal
+        }
+
+    def _mean_std(self, spread, removed, revised):
+        window = self._window[self._head:self._head + self.n]
+        if self.exact:
+            return _exact_mean(window.tolist()), window.std()
+        if self.count == self.n or self._since_resum >= self.block_size:
+            # Re-summed from scratch, shifted by the oldest spread to keep
+            #   the sums small.
+            self._anchor = window[0]
+            shifted = window - self._anchor
+            self._sum = shifted.sum()
+            self._sum_squares = (shifted * shifted).sum()
+            self._since_resum = 0
+        else:
+            added = spread - self._anchor
+            self._sum += added
+            self._sum_squares += added * added
+            if removed is not None:
+                removed -= self._anchor
+                self._sum -= removed
+                self._sum_squares -= removed * removed
+            if not revised:
+                self._since_resum += 1
+        mean = self._sum / self.n
+        variance = self._sum_squares / self.n - mean * mean
+        return mean + self._anchor, np.sqrt(max(variance, 0.0))
+
+    def on_bar(self, stock, bar):
+        # One stock's bar; the pair is updated once both stocks have a bar
+        #   for bar.date. Returns what update() does, or None while waiting.
+        #   A date one stock never gets a bar for is skipped.
+        legs = self._pending.setdefault(bar.date, {})
+        legs[stock] = bar
+        if self.stock_a not in legs or self.stock_b not in legs:
+            return None
+        # Older dates can't complete any more; the latest is kept in case
+        #   either bar is revised.
+        for date in list(self._pending):
+            if date == bar.date:
+                break
+            del self._pending[date]
+        return self.update(bar.date, legs[self.stock_a], legs[self.stock_b])
+
+    def attach(self, app, req_id_a, req_id_b, on_row=None):
+        # Feeds the engine from app's bars for req_id_a (stock A) and
+        #   req_id_b (stock B). on_row is called with every row update()
+        #   returns. Returns a function that detaches the engine again.
+        def listener_for(stock):
+            def listener(reqId, bar):
+                row = self.on_bar(stock, bar)
+                if row is not None and on_row is not None:
+                    on_row(row)
+            return listener
+
+        listeners = ((req_id_a, listener_for(self.stock_a)),
+                     (req_id_b, listener_for(self.stock_b)))
+        for req_id, listener in listeners:
+            app.add_bar_listener(req_id, listener)
+
+        def detach():
+            for req_id, listener in listeners:
+                app.remove_bar_listener(req_id, listener)
+        return detach
@@ -8,10 +8,16 @@ blotter = pd.DataFrame(
              'client_id', 'why_held', 'mkt_cap_price']
 )
 
-order_page = dash_table.DataTable(
-    columns=[{"name": i, "id": i} for i in blotter.columns],
-    data=blotter.to_dict('records'),
-    id='trade-blotter'
-)
+
+def make_order_page(data=None):
+    # The blotter table, already holding `data` (records) if given.
+    return dash_table.DataTable(
+        columns=[{"name": i, "id": i} for i in blotter.columns],
+        data=blotter.to_dict('records') if data is None else data,
+        id='trade-blotter'
+    )
+
+
+order_page = make_order_page()
 
 
@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+
+# Turns an order blotter (get_whole_orders' output: DATE index, SYMBOL,
+#   ACTION, SIZE, PRICE, TRIP and TRADE columns) plus the price frame from
+#   onboard_historical_price_data into P&L and risk numbers. Everything is
+#   computed from per-date position and cash arrays, so a backtest takes a
+#   few milliseconds and the functions can run inside parameter sweeps.
+#
+#   curve = equity_curve(whole_orders, historical_price_data)
+#   stats = performance(whole_orders, historical_price_data)
+#
+# trip_pnl pairs exits with entries by the TRADE column
+#   blotter.get_whole_orders fills in. A blotter without one (e.g. one built
+#   by hand) is matched first in, first out per symbol by date: the k-th
+#   exit of a symbol closes its k-th entry.
+
+
+def _orders(blotter):
+    # Blotter columns as arrays sorted by date, with signed quantities
+    #   (+ for BUY), the cash each order costs and, if the blotter has
+    #   them, the trade numbers.
+    dates = pd.to_datetime(blotter.index).to_numpy()
+    order = np.argsort(dates, kind='stable')
+    trades = None
+    if 'TRADE' in blotter.columns:
+        trades = blotter['TRADE'].to_numpy(dtype=np.int64)
+    quantity = (np.where(blotter['ACTION'].to_numpy() == 'BUY', 1, -1) *
+                blotter['SIZE'].to_numpy(dtype=float))[order]
+    price = blotter['PRICE'].to_numpy(dtype=float)[order]
+    return {
+        'date': dates[order],
+        'symbol': blotter['SYMBOL'].to_numpy()[order],
+        'exit': (blotter['TRIP'].to_numpy() == 'Exit')[order],
+        'quantity': quantity,
+        'cost': quantity * price,
+        'trade': None if trades is None else trades[order]
+    }
+
+
+def trip_pnl(blotter):
+    # One row per closed trip: entry_date, exit_date and pnl (both legs).
+    orders = _orders(blotter)
+    if not len(orders['date']):
+        return pd.DataFrame({'entry_date': orders['date'],
+                             'exit_date': orders['date'],
+                             'pnl': orders['cost']})
+    codes, symbols = pd.factorize(orders['symbol'])
+    if orders['trade'] is not None:
+        lot = orders['trade']
+    else:
+        # lot: how many earlier entries (or exits) the same symbol had.
+        key = codes * 2 + orders['exit']
+        by_key = np.argsort(key, kind='stable')
+        sorted_key = key[by_key]
+        lot = np.empty(len(key), dtype=np.int64)
+        lot[by_key] = (np.arange(len(key)) -
+                       np.searchsorted(sorted_key, sorted_key, side='left'))
+
+    # symbol x lot tables of each leg's cost and date; an exit closes the
+    #   entry with the same symbol and lot.
+    shape = (len(symbols), lot.max() + 1)
+    cost = np.full((2,) + shape, np.nan)
+    date = np.full((2,) + shape, np.datetime64('NaT'), dtype='M8[ns]')
+    side = orders['exit'].astype(int)
+    cost[side, codes, lot] = orders['cost']
+    date[side, codes, lot] = orders['date']
+    closed = ~np.isnan(cost[0]) & ~np.isnan(cost[1])
+    leg_pnl = np.where(closed, -(cost[0] + cost[1]), 0.0)
+    trips = closed.any(axis=0)
+    closed = closed[:, trips]
+    nat = np.datetime64('NaT')
+    return pd.DataFrame({
+        'entry_date': np.nanmin(np.where(closed, date[0][:, trips], nat),
+                                axis=0),
+        'exit_date': np.nanmax(np.where(closed, date[1][:, trips], nat),
+                               axis=0),
+        'pnl': leg_pnl[:, trips].sum(axis=0)
+    })
+
+
+def equity_curve(blotter, hpd):
+    # Date-indexed frame of cash, market_value (positions at the close),
+    #   equity (their sum), drawdown (equity below its running peak) and
+    #   gross_exposure (absolute value of all positions), for every date in
+    #   hpd and the blotter.
+    orders = _orders(blotter)
+    symbols = list(pd.unique(orders['symbol']))
+    closes = hpd[[s + '_Close' for s in symbols]]
+    closes.columns = symbols
+    closes.index = pd.to_datetime(closes.index)
+    dates = closes.index.union(pd.Index(np.unique(orders['date'])))
+    closes = closes.reindex(dates).sort_index().ffill().to_numpy()
+
+    row = dates.get_indexer(orders['date'])
+    column = pd.Index(symbols).get_indexer(orders['symbol'])
+    flows = np.zeros((len(dates), len(symbols)))
+    np.add.at(flows, (row, column), orders['quantity'])
+    positions = np.cumsum(flows, axis=0)
+    cash = -np.cumsum(np.bincount(row, orders['cost'],
+                                  minlength=len(dates)))
+    held = positions * closes
+    market_value = np.nansum(held, axis=1)
+    equity = cash + market_value
+    return pd.DataFrame({
+        'cash': cash,
+        'market_value': market_value,
+        'equity': equity,
+        'drawdown': equity - np.maximum.accumulate(equity),
+        'gross_exposure': np.nansum(np.abs(held), axis=1)
+    }, index=dates)
+
+
+def performance(blotter, hpd, capital=None, periods_per_year=252):
+    # Summary statistics for one backtest. Returns are daily P&L over
+    #   capital, which defaults to the largest gross exposure the strategy
+    #   ever had. Sharpe and Sortino are annualised with periods_per_year;
+    #   turnover is traded notional per year as a multiple of capital.
+    curve = equity_curve(blotter, hpd)
+    trips = trip_pnl(blotter)
+    equity = curve['equity'].to_numpy()
+    if capital is None:
+        capital = curve['gross_exposure'].max()
+    capital = capital if capital > 0 else np.nan
+
+    returns = np.diff(equity, prepend=0.0) / capital
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = returns.mean() / returns.std(ddof=1)
+        sortino = returns.mean() / np.sqrt(
+            np.mean(np.minimum(returns, 0.0) ** 2))
+    years = len(equity) / periods_per_year
+    traded = np.abs(blotter['SIZE'].to_numpy(dtype=float) *
+                    blotter['PRICE'].to_numpy(dtype=float)).sum()
+    return {
+        'trades': int((blotter['TRIP'] == 'Entry').sum() // 2),
+        'closed_trades': len(trips),
+        'pnl': equity[-1] if len(equity) else 0.0,
+        'realized_pnl': trips['pnl'].sum(),
+        'max_drawdown': curve['drawdown'].min(),
+        'max_drawdown_pct': curve['drawdown'].min() / capital,
+        'sharpe': sharpe * np.sqrt(periods_per_year),
+        'sortino': sortino * np.sqrt(periods_per_year),
+        'turnover': traded / capital / years if years else np.nan,
+        'hit_rate': (trips['pnl'] > 0).mean() if len(trips) else np.nan
+    }
@@ -0,0 +1,142 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from blotter import onboard_historical_price_data
+
+# Screens every pair of symbols in a wide price file (columns like
+#   pep_High, pep_Low, pep_Close, ko_High, ...) for the pairs strategy in
+#   blotter.py. For each pair it computes the same typical-price spread and
+#   n-day, k-std bands as get_spread / get_bolling_band, and reports:
+#   correlation:   of the two symbols' daily typical-price returns;
+#   crossings:     days the spread crossed out of its bands, i.e. the
+#                  x_up / x_down signals get_full_signal would give;
+#   crossing_rate: crossings per day with a full window;
+#   band_width:    average upper - lower band, relative to the pair's
+#                  average typical price;
+#   z_score:       where the latest spread sits within its bands.
+# Pairs are processed pairs_per_chunk at a time as (pairs x days) arrays, so
+#   memory stays bounded however many symbols there are.
+#
+#   ranking = screen_pairs('pep_ko_ivv.csv', n=20, k=2, min_correlation=0.5)
+#
+# or from the command line:
+#   python screener.py pep_ko_ivv.csv --n 20 --k 2 --top 20
+
+price_fields = ['High', 'Low', 'Close']
+
+
+def typical_prices(prices, symbols=None):
+    # (high + low + close) / 3 for every symbol with all three columns, as a
+    #   date x symbol frame. Symbols with missing prices are left out, since
+    #   a gap would poison every rolling window that covers it.
+    if symbols is None:
+        symbols = [c[:-len('_Close')] for c in prices.columns
+                   if c.endswith('_Close')]
+    symbols = [s for s in symbols
+               if all(s + '_' + f in prices.columns for f in price_fields)]
+    typical = pd.DataFrame({
+        s: (prices[s + '_High'] + prices[s + '_Low'] +
+            prices[s + '_Close']) / 3
+        for s in symbols
+    }, index=prices.index)
+    return typical.loc[:, typical.notna().all()]
+
+
+def _rolling_mean_std(values, n):
+    # Mean and population std of each full n-value window along each row,
+    #   from cumulative sums. Rows are shifted by their first value to keep
+    #   the sums small.
+    first = values[:, :1]
+    shifted = values - first
+    zeros = np.zeros((len(values), 1))
+    sums = np.concatenate((zeros, np.cumsum(shifted, axis=1)), axis=1)
+    squares = np.concatenate((zeros, np.cumsum(shifted * shifted, axis=1)),
+                             axis=1)
+    mean = (sums[:, n:] - sums[:, :-n]) / n
+    variance = (squares[:, n:] - squares[:, :-n]) / n - mean ** 2
+    return mean + first, np.sqrt(np.maximum(variance, 0.0))
+
+
+def _screen_chunk(typical, returns_corr, a, b, n, k):
+    # typical is symbol x day, so each pair's spread is a contiguous row.
+    spread = typical[a] - typical[b]
+    mean, std = _rolling_mean_std(spread, n)
+    spread = spread[:, n - 1:]
+    upper = mean + k * std
+    lower = mean - k * std
+    crossed_up = (spread[:, 1:] > upper[:, 1:]) & \
+        (spread[:, :-1] <= upper[:, :-1])
+    crossed_down = (spread[:, 1:] < lower[:, 1:]) & \
+        (spread[:, :-1] >= lower[:, :-1])
+    crossings = (crossed_up | crossed_down).sum(axis=1)
+    level = (typical[a, n - 1:] + typical[b, n - 1:]).mean(axis=1) / 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z_score = (spread[:, -1] - mean[:, -1]) / std[:, -1]
+    return {
+        'correlation': returns_corr[a, b],
+        'crossings': crossings,
+        'crossing_rate': crossings / max(spread.shape[1] - 1, 1),
+        'band_width': (upper - lower).mean(axis=1) / level,
+        'z_score': z_score
+    }
+
+
+def screen_pairs(prices, n=20, k=2, symbols=None, min_correlation=None,
+                 pairs_per_chunk=1000):
+    # prices: a CSV filename or a frame from onboard_historical_price_data.
+    # symbols: which symbols to pair up (default: all in the file).
+    # min_correlation: drop pairs whose returns correlate less than this.
+    # Returns one row per pair (stock_a, stock_b and the metrics above),
+    #   ranked by crossing_rate and then correlation, best first.
+    if isinstance(prices, str):
+        prices = onboard_historical_price_data(prices)
+    typical = typical_prices(prices, symbols)
+    names = np.array(typical.columns)
+    values = np.ascontiguousarray(typical.to_numpy(dtype=np.float64).T)
+    returns = values[:, 1:] / values[:, :-1] - 1
+    returns_corr = np.corrcoef(returns).reshape(len(names), len(names))
+
+    a_all, b_all = np.triu_indices(len(names), k=1)
+    if min_correlation is not None:
+        keep = returns_corr[a_all, b_all] >= min_correlation
+        a_all, b_all = a_all[keep], b_all[keep]
+    if values.shape[1] < n + 1:
+        a_all = b_all = a_all[:0]
+
+    chunks = []
+    for start in range(0, len(a_all), pairs_per_chunk):
+        a = a_all[start:start + pairs_per_chunk]
+        b = b_all[start:start + pairs_per_chunk]
+        chunk = _screen_chunk(values, returns_corr, a, b, n, k)
+        chunk['stock_a'] = names[a]
+        chunk['stock_b'] = names[b]
+        chunks.append(pd.DataFrame(chunk))
+    columns = ['stock_a', 'stock_b', 'correlation', 'crossings',
+               'crossing_rate', 'band_width', 'z_score']
+    if not chunks:
+        return pd.DataFrame(columns=columns)
+    ranking = pd.concat(chunks, ignore_index=True)[columns]
+    ranking = ranking.sort_values(['crossing_rate', 'correlation'],
+                                  ascending=False, kind='stable')
+    return ranking.reset_index(drop=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Rank every pair of symbols in a wide price file.')
+    parser.add_argument('prices', help='CSV of date-indexed prices')
+    parser.add_argument('--n', type=int, default=20)
+    parser.add_argument('--k', type=float, default=2.0)
+    parser.add_argument('--min-correlation', type=float, default=None)
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--out', default=None,
+                        help='also write the full ranking to this CSV')
+    args = parser.parse_args()
+
+    ranking = screen_pairs(args.prices, args.n, args.k,
+                           min_correlation=args.min_correlation)
+    if args.out is not None:
+        ranking.to_csv(args.out, index=False)
+    print(ranking.head(args.top).to_string())
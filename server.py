@@ -1,4 +1,6 @@
 from waitress import serve
 import app
 
-serve(app.server, host='localhost', port=3001)
\ No newline at end of file
+# Every open tab holds a thread for its /events stream, so leave plenty over
+#   for the dash callbacks.
+serve(app.server, host='localhost', port=3001, threads=64)
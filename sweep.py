@@ -0,0 +1,179 @@
+import argparse
+import itertools
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from blotter import onboard_historical_price_data, get_spread
+from blotter import get_bolling_band, get_full_signal
+from blotter import calculate_entry_orders, calculate_exit_orders
+from blotter import get_whole_orders
+from performance import performance
+
+# Parameter sweep for the pairs strategy in blotter.py. Every combination of
+#   n, k, timeout and stop_loss is backtested across a process pool and
+#   summarised as one row of a results table (see performance.py for the
+#   metrics).
+#
+# The prices are written once to a .npy file that every worker memory-maps
+#   read-only, so they're never pickled per task. A task is one (n, k) pair:
+#   its bands, signals and entries are computed once and reused for every
+#   (timeout, stop_loss) combination. Finished rows are appended to `out`
+#   as they arrive, and a rerun with the same `out` skips whatever is
+#   already in it, so an interrupted sweep picks up where it stopped.
+#
+#   results = run_sweep('pep_ko_ivv.csv', 'pep', 'ko', n=[10, 20, 30],
+#                       k=[1.5, 2, 2.5], timeout=[2, 5], stop_loss=[0.1],
+#                       out='sweep_results.csv')
+#
+# or from the command line:
+#   python sweep.py pep_ko_ivv.csv pep ko --n 10 20 30 --k 1.5 2 2.5 \
+#       --timeout 2 5 --stop-loss 0.1 --out sweep_results.csv
+
+param_columns = ['n', 'k', 'timeout', 'stop_loss']
+price_fields = ['Open', 'High', 'Low', 'Close']
+
+# Set in each worker by _init_worker.
+_worker = {}
+
+
+def summarize(entry_orders, exit_orders, hpd):
+    # Summary metrics for one backtest: performance() over all its orders,
+    #   with any open position marked at the last close.
+    return performance(get_whole_orders(entry_orders, exit_orders), hpd)
+
+
+def _price_frame(prices, columns, index):
+    # A frame over the memory-mapped prices without copying them: the file
+    #   is column-major, so each column is a contiguous view, as in
+    #   blotter's price cache.
+    return pd.DataFrame({c: prices[:, i] for i, c in enumerate(columns)},
+                        index=index, copy=False)
+
+
+def _init_worker(prices_path, columns, dates, stock_a, stock_b, sizes):
+    prices = np.load(prices_path, mmap_mode='r')
+    index = pd.Index(dates, name='Date')
+    hpd = _price_frame(prices, columns, index)
+    # get_spread adds its columns to the frame it's given; a second frame
+    #   over the same prices takes them, so hpd stays as it was.
+    spread = get_spread(_price_frame(prices, columns, index), stock_a,
+                        stock_b)
+    _worker.update(hpd=hpd, spread=spread, stock_a=stock_a,
+                   stock_b=stock_b, sizes=sizes)
+
+
+def _run_task(n, k, exits):
+    # Backtests (n, k) with every (timeout, stop_loss) in exits.
+    w = _worker
+    stock_a, stock_b = w['stock_a'], w['stock_b']
+    size_a, size_b = w['sizes']
+    bands = get_bolling_band(w['spread'], n, k, stock_a, stock_b)
+    fsignal = get_full_signal(bands)
+    entry_orders = calculate_entry_orders(fsignal, stock_a, stock_b, size_a,
+                                          size_b, 'N/A', 'FILLED', 'N/A',
+                                          'FILLED')
+    rows = []
+    for timeout, stop_loss in exits:
+        exit_orders = calculate_exit_orders(entry_orders, fsignal, w['hpd'],
+                                            timeout, stop_loss)
+        row = {'n': n, 'k': k, 'timeout': timeout, 'stop_loss': stop_loss}
+        row.update(summarize(entry_orders, exit_orders, w['hpd']))
+        rows.append(row)
+    return rows
+
+
+def _completed(out):
+    # Parameter sets already in a results file from an earlier run.
+    if out is None or not os.path.exists(out):
+        return pd.DataFrame(columns=param_columns), set()
+    # A row cut short by an interruption is dropped (and rerun), so the
+    #   next append starts on a line of its own. Metrics may be NaN, e.g.
+    #   sharpe for a combination that never trades.
+    with open(out, 'rb+') as f:
+        data = f.read()
+        if data and not data.endswith(b'\n'):
+            f.truncate(data.rfind(b'\n') + 1)
+    done = pd.read_csv(out).dropna(subset=param_columns)
+    keys = set(zip(*(done[c].tolist() for c in param_columns)))
+    return done, keys
+
+
+def run_sweep(prices, stock_a, stock_b, n, k, timeout, stop_loss,
+              size_a=1000, size_b=1000, workers=None, out=None,
+              on_result=None):
+    # prices: a CSV filename or a frame from onboard_historical_price_data.
+    # n, k, timeout, stop_loss: lists of values; every combination is run.
+    # workers: pool size (default: one per CPU).
+    # out: CSV the results are appended to as they finish, and read back to
+    #   skip finished combinations on a rerun.
+    # on_result: called with the list of rows from each finished task.
+    # Returns every result (old and new) as one DataFrame sorted by
+    #   parameters.
+    if isinstance(prices, str):
+        prices = onboard_historical_price_data(prices)
+    columns = [s + '_' + f for s in (stock_a, stock_b) for f in price_fields]
+    done, done_keys = _completed(out)
+
+    tasks = []
+    for n_, k_ in itertools.product(n, k):
+        exits = [(t, s) for t, s in itertools.product(timeout, stop_loss)
+                 if (n_, k_, t, s) not in done_keys]
+        if exits:
+            tasks.append((n_, k_, exits))
+
+    new_rows = []
+    if tasks:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            prices_path = os.path.join(tmp_dir, 'prices.npy')
+            np.save(prices_path, np.asfortranarray(
+                prices[columns].to_numpy(dtype=np.float64)))
+            init_args = (prices_path, columns, prices.index.to_numpy(),
+                         stock_a, stock_b, (size_a, size_b))
+            with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                     initargs=init_args) as pool:
+                futures = [pool.submit(_run_task, *task) for task in tasks]
+                for future in as_completed(futures):
+                    rows = future.result()
+                    new_rows.extend(rows)
+                    if out is not None:
+                        pd.DataFrame(rows).to_csv(
+                            out, mode='a', index=False,
+                            header=not os.path.exists(out)
+                        )
+                    if on_result is not None:
+                        on_result(rows)
+
+    frames = [df for df in (done, pd.DataFrame(new_rows)) if len(df)]
+    if not frames:
+        return done
+    results = pd.concat(frames, ignore_index=True)
+    results = results.sort_values(param_columns, kind='stable')
+    return results.reset_index(drop=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Backtest every combination of the given parameters.')
+    parser.add_argument('prices', help='CSV of date-indexed prices')
+    parser.add_argument('stock_a')
+    parser.add_argument('stock_b')
+    parser.add_argument('--n', type=int, nargs='+', default=[20])
+    parser.add_argument('--k', type=float, nargs='+', default=[2.0])
+    parser.add_argument('--timeout', type=int, nargs='+', default=[2])
+    parser.add_argument('--stop-loss', type=float, nargs='+', default=[0.1])
+    parser.add_argument('--size-a', type=int, default=1000)
+    parser.add_argument('--size-b', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--out', default='sweep_results.csv',
+                        help='results CSV; rerun with the same file to '
+                             'resume')
+    args = parser.parse_args()
+
+    results = run_sweep(args.prices, args.stock_a, args.stock_b, args.n,
+                        args.k, args.timeout, args.stop_loss, args.size_a,
+                        args.size_b, args.workers, args.out)
+    print(results.to_string(index=False))
@@ -0,0 +1,128 @@
+import threading
+
+from dash import Patch, no_update
+from plotly.io.json import to_json_plotly
+
+# Turns the changes in an ibkr_app's order_states / errors into updates for
+#   the DataTables on the blotter and error pages. Each browser keeps in a
+#   dcc.Store which version of a table it has; a tick where nothing changed
+#   returns no_update, and otherwise only the new or changed rows are sent
+#   as a dash Patch. A browser with nothing yet (or out of step, e.g. after
+#   a restart) gets every row once.
+#
+#   data, seen = order_rows_update(app.order_states, seen)
+#   data, seen = error_rows_update(app.errors, seen)
+#
+# update_metrics counts what each tick sent: shared_update_metrics.stats.
+
+
+class update_metrics:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tables = {}
+
+    def record(self, table, rows, payload):
+        # payload: the value sent for the table's data, or no_update.
+        sent = 0 if payload is no_update else len(to_json_plotly(payload))
+        with self._lock:
+            stats = self._tables.setdefault(table, {
+                'ticks': 0, 'unchanged_ticks': 0, 'full_updates': 0,
+                'rows_sent': 0, 'bytes_sent': 0, 'last_bytes': 0
+            })
+            stats['ticks'] += 1
+            stats['unchanged_ticks'] += payload is no_update
+            stats['full_updates'] += isinstance(payload, list)
+            stats['rows_sent'] += rows
+            stats['bytes_sent'] += sent
+            stats['last_bytes'] = sent
+        return sent
+
+    @property
+    def stats(self):
+        with self._lock:
+            stats = {}
+            for table, counts in self._tables.items():
+                stats[table] = dict(counts)
+                stats[table]['bytes_per_tick'] = \
+                    counts['bytes_sent'] / counts['ticks']
+            return stats
+
+
+shared_update_metrics = update_metrics()
+
+
+def order_rows_snapshot(order_states):
+    # Every order row, and the store value saying a browser has them all.
+    #   The version is read first, so anything that changes while the rows
+    #   are read is sent again rather than missed.
+    version = order_states.version
+    records = order_states.snapshot().to_dict('records')
+    return records, {'version': version, 'rows': len(records)}
+
+
+def error_rows_snapshot(errors):
+    # Every message held, and the matching store value.
+    held, version = errors.since(0)
+    records = held.to_dict('records')
+    return records, {'seq': version, 'first': version - len(records)}
+
+
+def order_rows_update(order_states, seen, metrics=shared_update_metrics):
+    # order_states: an order_state_store. seen: what the browser's store
+    #   holds, {'version': ..., 'rows': ...}, or None for nothing yet.
+    # Returns the value for the table's data (no_update, a Patch, or every
+    #   row) and the value for the store.
+    version = order_states.version
+    if seen is not None and seen['version'] == version:
+        metrics.record('orders', 0, no_update)
+        return no_update, no_update
+    if seen is None or seen['version'] > version:
+        records, seen = order_rows_snapshot(order_states)
+        metrics.record('orders', len(records), records)
+        return records, seen
+
+    changed, version = order_states.changed_since(seen['version'])
+    positions = order_states.row_positions(changed['order_id'])
+    records = changed.to_dict('records')
+    patch = Patch()
+    new_rows = []
+    for position, record in zip(positions, records):
+        if position < seen['rows']:
+            patch[position] = record
+        else:
+            new_rows.append((position, record))
+    # New orders go on the end in the order they were first seen.
+    new_rows.sort(key=lambda new_row: new_row[0])
+    if new_rows:
+        patch.extend([record for _, record in new_rows])
+    metrics.record('orders', len(records), patch)
+    return patch, {'version': version, 'rows': seen['rows'] + len(new_rows)}
+
+
+def error_rows_update(errors, seen, metrics=shared_update_metrics):
+    # errors: an error_log. seen: what the browser's store holds,
+    #   {'seq': next message it hasn't got, 'first': its oldest message},
+    #   or None. Messages the log has since evicted are deleted from the
+    #   front of the table. Returns like order_rows_update.
+    if seen is not None and seen['seq'] == errors.version:
+        metrics.record('errors', 0, no_update)
+        return no_update, no_update
+    if seen is not None and errors.first_seq <= seen['seq'] <= \
+            errors.version:
+        new, version = errors.since(seen['seq'])
+        first = max(version - errors.capacity, 0)
+        evicted = first - seen['first']
+        if evicted < seen['seq'] - seen['first']:
+            patch = Patch()
+            for _ in range(evicted):
+                del patch[0]
+            records = new.to_dict('records')
+            patch.extend(records)
+            metrics.record('errors', len(records), patch)
+            return patch, {'seq': version, 'first': first}
+
+    # Nothing yet, out of step, or most of the table evicted: send it all.
+    records, seen = error_rows_snapshot(errors)
+    metrics.record('errors', len(records), records)
+    return records, seen
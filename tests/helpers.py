@@ -0,0 +1,42 @@
+from ibapi.contract import Contract
+from ibapi.order import Order
+
+# Contracts, orders and requests shared by the tests and the benchmarks.
+
+
+def stock(symbol):
+    contract = Contract()
+    contract.symbol = symbol
+    contract.secType = 'STK'
+    contract.exchange = 'SMART'
+    contract.currency = 'USD'
+    return contract
+
+def eur_usd():
+    contract = Contract()
+    contract.symbol = 'EUR'
+    contract.secType = 'CASH'
+    contract.exchange = 'IDEALPRO'
+    contract.currency = 'USD'
+    return contract
+
+def market_order(quantity=100):
+    order = Order()
+    order.action = 'BUY'
+    order.orderType = 'MKT'
+    order.totalQuantity = quantity
+    return order
+
+def dash_callback(app, output_prefix, inputs, state):
+    # The request the browser sends to run the callback whose outputs start
+    #   with output_prefix.
+    output = next(key for key in app.app.callback_map
+                  if key.startswith('..' + output_prefix))
+    outputs = [dict(zip(('id', 'property'), part.split('.', 1)))
+               for part in output.strip('.').split('...')]
+    as_props = lambda values: [
+        {'id': name.split('.')[0], 'property': name.split('.')[1],
+         'value': value} for name, value in values.items()]
+    return {'output': output, 'outputs': outputs,
+            'inputs': as_props(inputs), 'state': as_props(state),
+            'changedPropIds': list(inputs)[-1:]}
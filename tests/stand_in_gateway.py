@@ -0,0 +1,295 @@
+import socket
+import struct
+import threading
+import time
+from datetime import datetime, timedelta
+
+from ibapi.message import IN, OUT
+from ibapi.server_versions import MAX_CLIENT_VER
+
+# A tiny local stand-in for TWS / IB Gateway that speaks just enough of the
+#   socket protocol for interactive_trader's requests: the handshake,
+#   nextValidId, managed accounts, current time, contract details,
+#   matching symbols, historical data and order status. Responses are
+#   synthetic.
+# It exists so the session, scheduling and web code can be exercised and
+#   benchmarked without a real gateway; it's test code, not part of the
+#   package:
+#
+#   gateway = stand_in_gateway(port=0).start()
+#   fetch_contract_details(contract, port=gateway.port)
+#   gateway.stop()
+
+server_version = MAX_CLIENT_VER
+
+bar_unit_seconds = {'sec': 1, 'min': 60, 'hour': 3600, 'day': 86400,
+                    'week': 7 * 86400, 'month': 30 * 86400}
+duration_unit_seconds = {'S': 1, 'D': 86400, 'W': 7 * 86400, 'M': 30 * 86400,
+                         'Y': 365 * 86400}
+
+
+def make_msg(*fields):
+    text = ''.join(str(field) + '\0' for field in fields).encode()
+    return struct.pack('!I', len(text)) + text
+
+
+class stand_in_gateway:
+
+    def __init__(self, hostname='127.0.0.1', port=0, next_valid_id=1,
+                 accounts='DU0000001', handshake_delay=0.0,
+                 response_delay=0.0, contract_details_rows=1,
+                 historical_bars=None, stall=False, pacing_limit=None,
+                 pacing_window=1.0, reject_symbols=(), fill_orders=False,
+                 no_data_weekdays=()):
+        # handshake_delay: seconds to wait before answering a new connection.
+        # response_delay: seconds between receiving a request and sending its
+        #   answer. Requests are answered independently, like a real gateway
+        #   with network latency, so pipelined requests overlap.
+        # contract_details_rows: how many matches each contract lookup returns.
+        # historical_bars: how many bars each historical request returns; by
+        #   default enough to fill durationStr at barSizeSetting, one bar
+        #   every bar period (no trading calendar).
+        # stall: accept connections but never answer anything.
+        # pacing_limit: historical requests a connection may make in any
+        #   pacing_window seconds; more are rejected with a pacing violation
+        #   (error 162).
+        # no_data_weekdays: historical requests whose endDateTime falls on
+        #   one of these weekdays (Monday is 0) get error 162 'HMDS query
+        #   returned no data', like a chunk covering only a weekend.
+        # reject_symbols: orders for these symbols are answered 'Inactive'
+        #   with error 201 instead of being acknowledged.
+        # fill_orders: acknowledged orders are then filled in full at 100.
+        self.hostname = hostname
+        self.port = port
+        self.next_valid_id = next_valid_id
+        self.accounts = accounts
+        self.handshake_delay = handshake_delay
+        self.response_delay = response_delay
+        self.contract_details_rows = contract_details_rows
+        self.historical_bars = historical_bars
+        self.stall = stall
+        self.pacing_limit = pacing_limit
+        self.pacing_window = pacing_window
+        self.pacing_violations = 0
+        self.reject_symbols = set(reject_symbols)
+        self.fill_orders = fill_orders
+        self.no_data_weekdays = set(no_data_weekdays)
+        self.requests = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._next_perm_id = 1000
+        self._socket = None
+        self._threads = []
+        self._running = False
+
+    def start(self):
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((self.hostname, self.port))
+        self._socket.listen(128)
+        self.port = self._socket.getsockname()[1]
+        self._running = True
+        thread = threading.Thread(target=self._accept_loop, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                conn, _ = self._socket.accept()
+            except OSError:
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self._lock:
+                self.connections += 1
+            thread = threading.Thread(target=self._serve, args=(conn,),
+                                      daemon=True)
+            thread.start()
+
+    def _serve(self, conn):
+        state = {'historical_requests': [], 'handshake': False}
+        send_lock = threading.Lock()
+        buf = b''
+        try:
+            while self._running:
+                data = conn.recv(65536)
+                if not data:
+                    return
+                if self.stall:
+                    continue
+                buf += data
+                if not state['handshake']:
+                    if not buf.startswith(b'API\0') or len(buf) < 8:
+                        continue
+                    buf = buf[4:]
+                    size = struct.unpack('!I', buf[:4])[0]
+                    if len(buf) < 4 + size:
+                        buf = b'API\0' + buf
+                        continue
+                    buf = buf[4 + size:]
+                    time.sleep(self.handshake_delay)
+                    conn.sendall(make_msg(
+                        server_version,
+                        datetime.now().strftime('%Y%m%d %H:%M:%S EST')
+                    ))
+                    state['handshake'] = True
+                while len(buf) >= 4:
+                    size = struct.unpack('!I', buf[:4])[0]
+                    if len(buf) < 4 + size:
+                        break
+                    fields = buf[4:4 + size].split(b'\0')[:-1]
+                    buf = buf[4 + size:]
+                    fields = [f.decode() for f in fields]
+                    with self._lock:
+                        self.requests.append((time.perf_counter(), fields))
+                    reply = self._respond(fields, state)
+                    if reply and self.response_delay:
+                        timer = threading.Timer(self.response_delay, self._send,
+                                                args=(conn, send_lock, reply))
+                        timer.daemon = True
+                        timer.start()
+                    elif reply:
+                        self._send(conn, send_lock, reply)
+        except OSError:
+            return
+        finally:
+            conn.close()
+
+    def _send(self, conn, send_lock, reply):
+        with send_lock:
+            try:
+                conn.sendall(reply)
+            except OSError:
+                pass
+
+    def _respond(self, fields, state):
+        msg_id = int(fields[0])
+        if msg_id == OUT.START_API:
+            return (make_msg(IN.MANAGED_ACCTS, 1, self.accounts) +
+                    make_msg(IN.NEXT_VALID_ID, 1, self.next_valid_id))
+        if msg_id == OUT.REQ_IDS:
+            return make_msg(IN.NEXT_VALID_ID, 1, self.next_valid_id)
+        if msg_id == OUT.REQ_MANAGED_ACCTS:
+            return make_msg(IN.MANAGED_ACCTS, 1, self.accounts)
+        if msg_id == OUT.REQ_CURRENT_TIME:
+            return make_msg(IN.CURRENT_TIME, 1, int(time.time()))
+        if msg_id == OUT.REQ_CONTRACT_DATA:
+            return self._contract_details(fields)
+        if msg_id == OUT.REQ_MATCHING_SYMBOLS:
+            return self._symbol_samples(fields)
+        if msg_id == OUT.REQ_HISTORICAL_DATA:
+            return self._historical_data(fields, state)
+        if msg_id == OUT.PLACE_ORDER:
+            return self._order_status(fields)
+        if msg_id == OUT.CANCEL_ORDER:
+            order_id = int(fields[2])
+            return make_msg(IN.ORDER_STATUS, order_id, 'Cancelled', 0, 0, 0,
+                            0, 0, 0, 0, '', 0)
+        return b''
+
+    def _contract_details(self, fields):
+        req_id, con_id, symbol, sec_type = fields[2:6]
+        exchange, primary_exchange, currency = fields[10:13]
+        reply = b''
+        for i in range(self.contract_details_rows):
+            reply += make_msg(
+                IN.CONTRACT_DATA, 8, req_id, symbol, sec_type, '', 0.0, '',
+                exchange, currency, symbol, symbol, symbol,
+                int(con_id or 0) or 100000 + i, 0.01, 1, '', 'LMT,MKT',
+                'SMART,' + (exchange or 'IDEALPRO'), 1, 0,
+                symbol + ' stand-in', primary_exchange, '', 'Industry',
+                'Category', 'Subcategory', 'US/Eastern',
+                '20220413:0930-20220413:1600', '20220413:0930-20220413:1600',
+                '', 0, 0, 0, '', '', '26', '', 'COMMON'
+            )
+        return reply + make_msg(IN.CONTRACT_DATA_END, 1, req_id)
+
+    def _symbol_samples(self, fields):
+        req_id, pattern = fields[1:3]
+        return make_msg(IN.SYMBOL_SAMPLES, req_id, 2,
+                        100001, pattern, 'STK', 'NASDAQ', 'USD', 1, 'OPT',
+                        100002, pattern + 'X', 'STK', 'NYSE', 'USD', 0)
+
+    def _historical_data(self, fields, state):
+        req_id = int(fields[1])
+        now = time.monotonic()
+        recent = [t for t in state['historical_requests']
+                  if now - t < self.pacing_window]
+        state['historical_requests'] = recent
+        if self.pacing_limit is not None and len(recent) >= self.pacing_limit:
+            with self._lock:
+                self.pacing_violations += 1
+            return make_msg(
+                IN.ERR_MSG, 2, req_id, 162,
+                'Historical Market Data Service error message:'
+                'Historical data request pacing violation'
+            )
+        recent.append(now)
+        end_str, bar_size, duration = fields[15:18]
+        end = (datetime.strptime(end_str[:17], '%Y%m%d %H:%M:%S')
+               if end_str else datetime.now().replace(microsecond=0))
+        if end.weekday() in self.no_data_weekdays:
+            return make_msg(
+                IN.ERR_MSG, 2, req_id, 162,
+                'Historical Market Data Service error message:'
+                'HMDS query returned no data: EUR.USD@IDEALPRO Midpoint'
+            )
+        n_units, bar_unit = bar_size.split()
+        bar_seconds = int(n_units) * bar_unit_seconds[bar_unit.rstrip('s')]
+        n_units, duration_unit = duration.split()
+        seconds = int(n_units) * duration_unit_seconds[duration_unit]
+        if self.historical_bars is not None:
+            n_bars = self.historical_bars
+        else:
+            n_bars = max(seconds // bar_seconds, 1)
+        if bar_seconds >= 86400:
+            end = end.replace(hour=0, minute=0, second=0)
+            date_format = '%Y%m%d'
+        else:
+            end = end - timedelta(seconds=end.timestamp() % bar_seconds)
+            date_format = '%Y%m%d  %H:%M:%S'
+        bars = []
+        for i in range(n_bars - 1, -1, -1):
+            bar_time = end - timedelta(seconds=i * bar_seconds)
+            price = 100.0 + int(bar_time.timestamp() // bar_seconds) % 50
+            bars += [bar_time.strftime(date_format), price, price + 1,
+                     price - 1, price + 0.5, 1000, price + 0.25, 10]
+        start = end - timedelta(seconds=n_bars * bar_seconds)
+        return make_msg(IN.HISTORICAL_DATA, req_id,
+                        start.strftime('%Y%m%d %H:%M:%S'),
+                        end.strftime('%Y%m%d %H:%M:%S'), n_bars, *bars)
+
+    def _order_status(self, fields):
+        order_id, symbol = int(fields[1]), fields[3]
+        with self._lock:
+            # Like TWS, later nextValidIds are past every id used so far.
+            self.next_valid_id = max(self.next_valid_id, order_id + 1)
+            self._next_perm_id += 1
+            perm_id = self._next_perm_id
+        if symbol in self.reject_symbols:
+            return (make_msg(IN.ERR_MSG, 2, order_id, 201,
+                             'Order rejected - reason:stand-in rejection') +
+                    make_msg(IN.ORDER_STATUS, order_id, 'Inactive', 0, 0, 0,
+                             perm_id, 0, 0, 0, '', 0))
+        quantity = fields[17]
+        reply = (make_msg(IN.ORDER_STATUS, order_id, 'PreSubmitted', 0,
+                          quantity, 0, perm_id, 0, 0, 0, '', 0) +
+                 make_msg(IN.ORDER_STATUS, order_id, 'Submitted', 0,
+                          quantity, 0, perm_id, 0, 0, 0, '', 0))
+        if self.fill_orders:
+            reply += make_msg(IN.ORDER_STATUS, order_id, 'Filled', quantity,
+                              0, 100.0, perm_id, 0, 100.0, 0, '', 0)
+        return reply
@@ -0,0 +1,78 @@
+import asyncio
+import unittest
+from datetime import datetime
+from interactive_trader import aio, ibkr_session
+from interactive_trader import shared_contract_cache
+from tests.stand_in_gateway import stand_in_gateway
+from tests.helpers import stock, market_order
+import pandas as pd
+
+
+class aio_test_case(unittest.TestCase):
+
+    def setUp(self):
+        self.gateway = stand_in_gateway(response_delay=0.05).start()
+        self.session = ibkr_session(port=self.gateway.port, client_id=1)
+        self.session.connect()
+
+    def tearDown(self):
+        self.session.disconnect()
+        self.gateway.stop()
+        # Stand-in answers mustn't be served to later tests.
+        shared_contract_cache.clear()
+
+    def test_gather_pipelines_requests(self):
+        symbols = ['SYM%d' % i for i in range(100)]
+
+        async def fetch_all():
+            return await asyncio.gather(*[
+                aio.fetch_contract_details(stock(s), session=self.session)
+                for s in symbols
+            ])
+        start = datetime.now()
+        details = asyncio.run(fetch_all())
+        # 100 requests at 50 ms each would take 5 s one after another.
+        self.assertLess((datetime.now() - start).total_seconds(), 2)
+        self.assertListEqual([d['symbol'].iloc[0] for d in details], symbols)
+
+    def test_other_functions(self):
+        order = market_order()
+
+        async def run():
+            return await asyncio.gather(
+                aio.fetch_current_time(session=self.session),
+                aio.fetch_current_time(session=self.session),
+                aio.fetch_matching_symbols('TSLA', session=self.session),
+                aio.fetch_historical_data(stock('IVV'), session=self.session),
+                aio.place_order(stock('IVV'), order, session=self.session),
+                aio.fetch_managed_accounts(session=self.session),
+            )
+        (time_1, time_2, symbols, bars, status,
+         accounts) = asyncio.run(run())
+        self.assertIsInstance(time_1, datetime)
+        self.assertEqual(time_1, time_2)
+        self.assertIsInstance(symbols, pd.DataFrame)
+        self.assertEqual(len(bars), 30 * 24)
+        self.assertListEqual(list(status['status']), ['Submitted'])
+        self.assertListEqual(accounts, ['DU0000001'])
+
+    def test_historical_data_range_and_timeout(self):
+        async def run():
+            chunks = []
+            bars = await aio.fetch_historical_data(
+                stock('IVV'), start='2022-01-01', end='2022-01-04',
+                barSizeSetting='1 min', session=self.session,
+                on_chunk=lambda s, e, b: chunks.append(len(b)))
+            with self.assertRaises(Exception) as cm:
+                await aio.fetch_historical_data(stock('IVV'),
+                                                session=self.session,
+                                                timeout=0.01)
+            return chunks, bars, cm.exception
+        chunks, bars, error = asyncio.run(run())
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(len(bars), 3 * 1440)
+        self.assertTrue(bars['date'].is_monotonic_increasing)
+        self.assertEqual(error.args[1], "timeout")
+
+if __name__ == '__main__':
+    unittest.main()
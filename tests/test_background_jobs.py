@@ -0,0 +1,123 @@
+import threading
+import time
+import unittest
+from background_jobs import job_runner
+from tests.stand_in_gateway import stand_in_gateway
+from tests.helpers import dash_callback
+
+
+def wait_for(jobs, job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while jobs.status(job_id)['state'] in ('queued', 'running'):
+        if time.monotonic() > deadline:
+            raise AssertionError('%s still running' % job_id)
+        time.sleep(0.01)
+    return jobs.status(job_id)
+
+class job_runner_test_case(unittest.TestCase):
+
+    def setUp(self):
+        self.jobs = job_runner(max_workers=2, keep=3)
+
+    def tearDown(self):
+        self.jobs.shutdown()
+
+    def test_submit_returns_before_the_job_finishes(self):
+        release = threading.Event()
+
+        def job(report):
+            report('waiting')
+            release.wait(5)
+            return 42
+        job_id = self.jobs.submit('slow', job)
+        time.sleep(0.05)
+        status = self.jobs.status(job_id)
+        self.assertEqual(status['state'], 'running')
+        self.assertEqual(status['progress'], 'waiting')
+        release.set()
+        status = wait_for(self.jobs, job_id)
+        self.assertEqual(status['state'], 'done')
+        self.assertEqual(status['result'], 42)
+
+    def test_errors_are_reported(self):
+        def job(report):
+            raise Exception("place_order", "connection", "not connected")
+        status = wait_for(self.jobs, self.jobs.submit('order', job))
+        self.assertEqual(status['state'], 'failed')
+        self.assertEqual(status['error'],
+                         'place_order: connection: not connected')
+
+    def test_stuck_job_times_out(self):
+        unstuck = threading.Event()
+        job_id = self.jobs.submit('connect', lambda report: unstuck.wait(5),
+                                  timeout=0.05, on_timeout=unstuck.set)
+        status = wait_for(self.jobs, job_id)
+        self.assertEqual(status['state'], 'failed')
+        self.assertIn('timeout', status['error'])
+        self.assertTrue(unstuck.wait(1))
+        # The job's own late return doesn't change the outcome.
+        time.sleep(0.05)
+        self.assertEqual(self.jobs.status(job_id)['state'], 'failed')
+
+    def test_old_finished_jobs_are_forgotten(self):
+        job_ids = [self.jobs.submit('n', lambda report, i=i: i)
+                   for i in range(6)]
+        wait_for(self.jobs, job_ids[-1])
+        time.sleep(0.05)
+        self.assertIsNone(self.jobs.status(job_ids[0]))
+        self.assertEqual(self.jobs.status(job_ids[-1])['result'], 5)
+        self.assertEqual(self.jobs.counts()['done'], 3)
+
+class app_jobs_test_case(unittest.TestCase):
+
+    def test_connect_callback_returns_while_gateway_stalls(self):
+        import app
+        client = app.server.test_client()
+        with stand_in_gateway(stall=True) as gateway:
+            start = time.perf_counter()
+            response = client.post('/_dash-update-component', json=dash_callback(
+                app, 'ibkr-async-conn-status',
+                {'ibkr-async-conn-status.children': None,
+                 'master-client-id.value': 1, 'port.value': gateway.port,
+                 'hostname.value': '127.0.0.1'},
+                {'ibkr-jobs.data': []}
+            ))
+            elapsed = time.perf_counter() - start
+            self.assertLess(elapsed, 1)
+            update = response.json['response']
+            self.assertEqual(update['ibkr-async-conn-status']['children'],
+                             'CONNECTING')
+            job_id, = update['ibkr-jobs']['data']
+            time.sleep(0.2)
+            self.assertEqual(client.get('/jobs/' + job_id).json['state'],
+                             'running')
+            # What the job's timeout does: the stuck handshake gives up.
+            app.ibkr_async_conn.disconnect()
+            status = wait_for(app.ibkr_jobs, job_id)
+            self.assertEqual(status['state'], 'failed')
+        self.assertEqual(client.get('/jobs/nope').status_code, 404)
+
+    def test_order_without_connection_fails_in_background(self):
+        import app
+        client = app.server.test_client()
+        response = client.post('/_dash-update-component', json=dash_callback(
+            app, 'placeholder-div',
+            {'trade-button.n_clicks': 1, 'contract-symbol.value': 'IVV',
+             'contract-sec-type.value': 'STK',
+             'contract-currency.value': 'USD',
+             'contract-exchange.value': 'SMART',
+             'contract-primary-exchange.value': 'ARCA',
+             'order-action.value': 'BUY', 'order-type.value': 'MKT',
+             'order-size.value': 100, 'order-lmt-price.value': None,
+             'order-account.value': None},
+            {'ibkr-jobs.data': ['connect-1']}
+        ))
+        update = response.json['response']
+        job_id = update['placeholder-div']['children']
+        self.assertEqual(update['ibkr-jobs']['data'], ['connect-1', job_id])
+        status = wait_for(app.ibkr_jobs, job_id)
+        self.assertEqual(status['state'], 'failed')
+        self.assertIn('not connected', status['error'])
+
+if __name__ == '__main__':
+    unittest.main()
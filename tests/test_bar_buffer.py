@@ -0,0 +1,71 @@
+import unittest
+from ibapi.common import BarData
+from interactive_trader import ibkr_app
+import pandas as pd
+
+
+def make_bar(date, price, volume=100):
+    bar = BarData()
+    bar.date = date
+    bar.open = price
+    bar.high = price + 1
+    bar.low = price - 1
+    bar.close = price + 0.5
+    bar.volume = volume
+    bar.barCount = 7
+    bar.average = price + 0.25
+    return bar
+
+class bar_buffer_test_case(unittest.TestCase):
+
+    def setUp(self):
+        self.app = ibkr_app()
+        # Two downloads in flight at once, interleaved on one connection.
+        for i in range(3000):
+            self.app.historicalData(
+                1, make_bar('20220413  09:%02d:00' % (i % 60), 100.0 + i))
+            if i % 2 == 0:
+                self.app.historicalData(
+                    2, make_bar('2022%02d%02d' % (i % 12 + 1, 1), 50.0 + i))
+        self.app.historicalDataEnd(1, '', '')
+        self.app.historicalDataEnd(2, '', '')
+
+    def test_historical_data_has_correct_columns(self):
+        correct_colnames = ['date', 'open', 'high', 'low', 'close', 'volume',
+                            'bar_count', 'average']
+        self.assertListEqual(
+            list(self.app.historical_data_by_req_id[1].columns),
+            correct_colnames
+        )
+
+    def test_bars_are_kept_per_req_id(self):
+        self.assertEqual(len(self.app.historical_data_by_req_id[1]), 3000)
+        self.assertEqual(len(self.app.historical_data_by_req_id[2]), 1500)
+        self.assertEqual(self.app.historical_data_by_req_id[2]['open'].iloc[1],
+                         52.0)
+        self.assertEqual(self.app.historical_data_end, 2)
+        self.assertEqual(self.app.historical_data_buffers, {})
+
+    def test_columns_are_typed(self):
+        df = self.app.historical_data_by_req_id[1]
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(df['date']))
+        self.assertEqual(df['close'].dtype, 'float64')
+        self.assertEqual(df['volume'].dtype, 'int64')
+        self.assertEqual(df['date'].iloc[61], pd.Timestamp('2022-04-13 09:01'))
+
+    def test_daily_and_time_zone_dates_are_parsed(self):
+        self.assertEqual(self.app.historical_data_by_req_id[2]['date'].iloc[0],
+                         pd.Timestamp('2022-01-01'))
+        self.app.historicalData(3, make_bar('20220413 09:30:00 US/Eastern', 1))
+        self.app.historicalDataEnd(3, '', '')
+        self.assertEqual(self.app.historical_data['date'].iloc[0],
+                         pd.Timestamp('2022-04-13 09:30'))
+
+    def test_request_without_bars_is_empty(self):
+        self.app.historicalDataEnd(4, '', '')
+        self.assertEqual(len(self.app.historical_data), 0)
+        self.assertListEqual(list(self.app.historical_data.columns),
+                             list(self.app.historical_data_by_req_id[1].columns))
+
+if __name__ == '__main__':
+    unittest.main()
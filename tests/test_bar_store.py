@@ -0,0 +1,76 @@
+import tempfile
+import unittest
+from interactive_trader import ibkr_session
+from interactive_trader.bar_store import bar_store
+from interactive_trader.durations import last_completed_bar
+from tests.stand_in_gateway import stand_in_gateway
+from tests.helpers import stock
+import pandas as pd
+
+
+class bar_store_test_case(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.gateway = stand_in_gateway().start()
+        self.session = ibkr_session(port=self.gateway.port, client_id=1)
+        self.session.connect()
+        self.store = bar_store(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.session.disconnect()
+        self.gateway.stop()
+        self.tmp_dir.cleanup()
+
+    def get_bars(self, symbol, start, end):
+        return self.store.get_bars(stock(symbol), start, end,
+                                   session=self.session)
+
+    def durations_requested(self):
+        return [fields[17] for _, fields in self.gateway.requests
+                if fields[0] == '20']
+
+    def test_cached_range_is_served_locally(self):
+        first = self.get_bars('PEP', '2022-01-01', '2022-03-01')
+        second = self.get_bars('PEP', '2022-01-15', '2022-02-15')
+        self.assertEqual(len(self.durations_requested()), 1)
+        self.assertEqual(self.store.hits, 1)
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(first['date']))
+        pd.testing.assert_frame_equal(
+            second,
+            first[(first['date'] >= '2022-01-15') &
+                  (first['date'] <= '2022-02-15')].reset_index(drop=True)
+        )
+
+    def test_only_gaps_are_fetched(self):
+        self.get_bars('PEP', '2022-02-01', '2022-03-01')
+        bars = self.get_bars('PEP', '2022-01-01', '2022-03-31')
+        # The tail starts a bar early to refresh the newest cached bar.
+        self.assertListEqual(self.durations_requested(),
+                             ['28 D', '31 D', '31 D'])
+        # No duplicates or holes where the fetched pieces join up.
+        steps = bars['date'].diff().dropna()
+        self.assertTrue((steps == pd.Timedelta(days=1)).all())
+        self.assertEqual(bars['date'].iloc[-1], pd.Timestamp('2022-03-31'))
+
+    def test_bars_up_to_now_stop_at_the_last_completed_bar(self):
+        start = pd.Timestamp.now().normalize() - pd.Timedelta(days=10)
+        first = self.store.get_bars(stock('PEP'), start,
+                                    session=self.session)
+        second = self.store.get_bars(stock('PEP'), start,
+                                     session=self.session)
+        self.assertEqual(len(self.durations_requested()), 1)
+        self.assertEqual(first['date'].iloc[-1],
+                         last_completed_bar('1 day'))
+        pd.testing.assert_frame_equal(first, second)
+
+    def test_series_are_kept_apart(self):
+        self.get_bars('PEP', '2022-02-01', '2022-03-01')
+        self.get_bars('KO', '2022-02-01', '2022-03-01')
+        self.assertEqual(len(self.durations_requested()), 2)
+        reopened = bar_store(self.tmp_dir.name, fetch=None)
+        self.assertEqual(len(reopened.get_bars(stock('KO'), '2022-02-10',
+                                               '2022-02-19')), 10)
+
+if __name__ == '__main__':
+    unittest.main()
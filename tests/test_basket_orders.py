@@ -0,0 +1,80 @@
+import time
+import unittest
+from ibapi.message import OUT
+from interactive_trader import basket_order, ibkr_session
+from tests.stand_in_gateway import stand_in_gateway
+from tests.helpers import stock, market_order
+
+
+def pair(symbol_a, symbol_b):
+    return [(stock(symbol_a), market_order(1000)),
+            (stock(symbol_b), market_order(1000))]
+
+class basket_order_test_case(unittest.TestCase):
+
+    def connect(self, **gateway_options):
+        self.gateway = stand_in_gateway(**gateway_options).start()
+        self.session = ibkr_session(port=self.gateway.port, client_id=1)
+        self.session.connect()
+
+    def tearDown(self):
+        self.session.disconnect()
+        self.gateway.stop()
+
+    def test_pair_is_acknowledged(self):
+        self.connect()
+        done = []
+        basket = basket_order(self.session, pair('PEP', 'KO'),
+                              on_done=done.append).submit()
+        self.assertEqual(basket.wait(5), 'complete')
+        self.assertListEqual(done, [basket])
+        report = basket.report()
+        order_ids = [leg['order_id'] for leg in report['legs']]
+        self.assertEqual(order_ids[1], order_ids[0] + 1)
+        self.assertListEqual([leg['status'] for leg in report['legs']],
+                             ['Submitted', 'Submitted'])
+        self.assertLess(report['submit_skew_ms'], 100)
+        self.assertIsNotNone(report['ack_skew_ms'])
+        self.assertIsNone(report['fill_skew_ms'])
+        basket.close()
+        self.assertListEqual(self.session.app.event_listeners, [])
+
+    def test_pair_is_filled(self):
+        self.connect(fill_orders=True)
+        basket = basket_order(self.session, pair('PEP', 'KO'),
+                              complete_on='fill').submit()
+        self.assertEqual(basket.wait(5), 'complete')
+        report = basket.report()
+        self.assertListEqual([leg['filled'] for leg in report['legs']],
+                             [1000, 1000])
+        self.assertIsNotNone(report['fill_skew_ms'])
+        # Every leg is settled, so the basket stopped listening.
+        self.assertListEqual(self.session.app.event_listeners, [])
+
+    def test_rejected_leg_cancels_the_other(self):
+        self.connect(reject_symbols=['KO'])
+        basket = basket_order(self.session, pair('PEP', 'KO')).submit()
+        self.assertEqual(basket.wait(5), 'rejected')
+        self.assertIn('201', basket.reason)
+        pep_id = basket.legs[0]['order_id']
+        for _ in range(100):
+            if basket.legs[0]['status'] == 'Cancelled':
+                break
+            time.sleep(0.05)
+        self.assertEqual(basket.legs[0]['status'], 'Cancelled')
+        cancels = [fields for _, fields in self.gateway.requests
+                   if int(fields[0]) == OUT.CANCEL_ORDER]
+        self.assertListEqual([int(fields[2]) for fields in cancels],
+                             [pep_id])
+
+    def test_unanswered_basket_times_out(self):
+        self.connect()
+        self.gateway.stall = True
+        basket = basket_order(self.session, pair('PEP', 'KO'),
+                              timeout=0.2).submit()
+        self.assertEqual(basket.wait(5), 'timed_out')
+        self.assertIsNone(basket.report()['ack_skew_ms'])
+        basket.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,344 @@
+import os
+import shutil
+import statistics
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+import blotter
+
+repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# The pep/ko backtest whose orders are in whole_process.
+reference = blotter.backtest_pipeline().run(
+    os.path.join(repo_root, 'pep_ko_ivv.csv'))
+
+
+def spreads():
+    hpd = blotter.onboard_historical_price_data(
+        os.path.join(repo_root, 'pep_ko_ivv.csv'))
+    return blotter.get_spread(hpd, 'pep', 'ko')
+
+def legacy_bands(spread, n, k):
+    # The loop get_bolling_band used before it was vectorized.
+    history, upper_band, lower_band = [], [], []
+    for value in spread:
+        history.append(value)
+        if len(history) > n:
+            del history[0]
+        upper_band.append(statistics.mean(history) + k * np.std(history))
+        lower_band.append(statistics.mean(history) - k * np.std(history))
+    return np.array(upper_band), np.array(lower_band)
+
+class bolling_band_test_case(unittest.TestCase):
+
+    def test_bands_match_legacy_loop_exactly(self):
+        hpd = spreads()
+        for n, k in ((20, 2), (5, 1.5), (60, 3)):
+            bands = blotter.get_bolling_band(hpd, n, k, 'pep', 'ko')
+            upper_band, lower_band = legacy_bands(hpd['spread'], n, k)
+            np.testing.assert_array_equal(bands['upper_band'],
+                                          upper_band[n - 1:])
+            np.testing.assert_array_equal(bands['lower_band'],
+                                          lower_band[n - 1:])
+
+    def test_warm_up_rows_follow_n(self):
+        hpd = spreads()
+        for n in (1, 20, 60):
+            bands = blotter.get_bolling_band(hpd, n, 2, 'pep', 'ko')
+            self.assertEqual(bands.index[0], hpd.index[n - 1])
+            self.assertEqual(len(bands), len(hpd) - n + 1)
+            self.assertFalse(bands.isna().any().any())
+
+    def test_cumulative_sums_agree_with_exact(self):
+        rng = np.random.default_rng(0)
+        values = 60 + np.cumsum(rng.normal(0, 0.5, 200000))
+        mean, std = blotter.rolling_mean_std(values, 20, block_size=4096)
+        fast_mean, fast_std = blotter.rolling_mean_std(
+            values, 20, exact=False, block_size=4096)
+        np.testing.assert_allclose(fast_mean, mean, rtol=0, atol=1e-9)
+        np.testing.assert_allclose(fast_std, std, rtol=0, atol=1e-6)
+
+class entry_orders_test_case(unittest.TestCase):
+
+    def test_reference_entry_orders_are_unchanged(self):
+        with open(os.path.join(repo_root, 'entry_orders.csv')) as f:
+            self.assertEqual(reference['entry_orders'].to_csv(), f.read())
+
+    def test_entries_follow_position_state(self):
+        rng = np.random.default_rng(0)
+        signals = rng.choice(['false', 'x_up', 'x_down'], 500,
+                             p=[0.6, 0.2, 0.2])
+        fsignal = pd.DataFrame(
+            {'a_Open': np.arange(500.0), 'b_Open': np.arange(500.0) + 0.5,
+             'signal': signals},
+            index=pd.Index(['d%03d' % i for i in range(500)], name='Date')
+        )
+        entries = blotter.calculate_entry_orders(fsignal, 'a', 'b', 10, 20,
+                                                 'N/A', 'FILLED', 1.5, 'OPEN')
+        # The row-by-row state machine the function used to run.
+        expected, position = [], 0
+        for i, signal in enumerate(signals[:-1]):
+            if signal == 'x_up' and position != 1:
+                expected += [('d%03d' % (i + 1), 'a', 'SELL', i + 1.0),
+                             ('d%03d' % (i + 1), 'b', 'BUY', i + 1.5)]
+            elif signal == 'x_down' and position != -1:
+                expected += [('d%03d' % (i + 1), 'a', 'BUY', i + 1.0),
+                             ('d%03d' % (i + 1), 'b', 'SELL', i + 1.5)]
+            position = {'x_up': 1, 'x_down': -1}.get(signal, 0)
+        self.assertListEqual(
+            list(zip(entries.index, entries['SYMBOL'], entries['ACTION'],
+                     entries['PRICE'])),
+            expected
+        )
+        self.assertListEqual(list(entries['SIZE'][:2]), [10, 20])
+        self.assertListEqual(list(entries['LMT_PRICE'][:2]), ['N/A', 1.5])
+
+def legacy_exit_orders(entry_blotter, fsignal, hpd, timeout, stop_loss):
+    # The nested scan calculate_exit_orders used before it was indexed,
+    #   with the up_down_exit_info closure inlined.
+    exit_list = []
+    for i in range(0, len(entry_blotter), 2):
+        entry_date = entry_blotter.index[i]
+        entry_price_pep = entry_blotter.iloc[i]["PRICE"]
+        entry_price_ko = entry_blotter.iloc[i + 1]["PRICE"]
+        entry_stock_a = entry_blotter.iloc[i]['SYMBOL']
+        entry_stock_b = entry_blotter.iloc[i + 1]['SYMBOL']
+
+        def exit_info(signal, date, price_a, price_b):
+            action_a, action_b = (("BUY", "SELL") if signal == "x_up"
+                                  else ("SELL", "BUY"))
+            for row, action, price in ((i, action_a, price_a),
+                                       (i + 1, action_b, price_b)):
+                exit_list.append([
+                    date, entry_blotter.iloc[row]['SYMBOL'], action,
+                    entry_blotter.iloc[row]['SIZE'], price, "Exit",
+                    entry_blotter.iloc[row]["LMT_PRICE"],
+                    entry_blotter.iloc[row]["STATUS"]
+                ])
+
+        for j in range(len(fsignal)):
+            if fsignal.index[j] != entry_date:
+                continue
+            signal = fsignal.iloc[j - 1]['signal']
+            interval = 0
+            for k in range(0, timeout):
+                row = j + k + 1
+                temp_date = fsignal.index[row]
+                spread = fsignal.iloc[row]['spread']
+                upper = fsignal.iloc[row]['upper_band']
+                lower = fsignal.iloc[row]['lower_band']
+                low_price_p = hpd.at[temp_date, 'pep_Low']
+                low_price_k = hpd.at[temp_date, 'ko_Low']
+                exit_date = fsignal.index[row + 1]
+                exit_price_a = fsignal.iloc[row + 1][entry_stock_a + "_Open"]
+                exit_price_b = fsignal.iloc[row + 1][entry_stock_b + "_Open"]
+                if signal == "x_up":
+                    loss_price_p = entry_price_pep * (1 + stop_loss)
+                    loss_price_k = entry_price_ko * (1 - stop_loss)
+                    if (low_price_p >= loss_price_p) & \
+                            (low_price_k <= loss_price_k):
+                        exit_info(signal, exit_date, exit_price_a,
+                                  exit_price_b)
+                        break
+                elif signal == "x_down":
+                    loss_price_p = entry_price_pep * (1 - stop_loss)
+                    loss_price_k = entry_price_pep * (1 + stop_loss)
+                    if (low_price_p <= loss_price_p) & \
+                            (low_price_k >= loss_price_k):
+                        exit_info(signal, exit_date, exit_price_a,
+                                  exit_price_b)
+                        break
+                if (spread < upper) & (spread > lower):
+                    exit_info(signal, exit_date, exit_price_a, exit_price_b)
+                    break
+                interval = interval + 1
+            if interval == timeout:
+                date_timeout = fsignal.index[j + timeout]
+                exit_info(signal, date_timeout,
+                          hpd.at[date_timeout, entry_stock_a + '_Close'],
+                          hpd.at[date_timeout, entry_stock_b + '_Close'])
+                break
+    exit_blotter = pd.DataFrame(exit_list, columns=[
+        "DATE", "SYMBOL", "ACTION", "SIZE", "PRICE", "TRIP", "LMT_PRICE",
+        "STATUS"])
+    return exit_blotter.set_index("DATE")
+
+class exit_orders_test_case(unittest.TestCase):
+
+    def test_matches_nested_scan(self):
+        hpd = reference['historical_price_data']
+        entries = reference['entry_orders']
+        for timeout, stop_loss in ((1, 0.1), (2, 0.0), (5, 0.02), (20, 0.3)):
+            exits = blotter.calculate_exit_orders(
+                entries, reference['full_signal'], hpd, timeout, stop_loss)
+            expected = legacy_exit_orders(
+                entries, reference['full_signal'], hpd, timeout, stop_loss)
+            self.assertEqual(exits.drop(columns='TRADE').to_csv(),
+                             expected.to_csv())
+
+    def test_trades_at_the_end_stay_open(self):
+        fsignal = reference['full_signal']
+        last = reference['entry_orders'].iloc[-2:]
+        start = fsignal.index.get_loc(last.index[0])
+        timeout = len(fsignal) - start
+        exits = blotter.calculate_exit_orders(
+            last, fsignal, reference['historical_price_data'], timeout, 0.1)
+        self.assertLessEqual(len(exits), 2)
+        if len(exits):
+            self.assertLess(fsignal.index.get_loc(exits.index[0]),
+                            len(fsignal))
+
+    def test_no_entries(self):
+        exits = blotter.calculate_exit_orders(
+            reference['entry_orders'].iloc[:0], reference['full_signal'],
+            reference['historical_price_data'], 2, 0.1)
+        self.assertEqual(len(exits), 0)
+        self.assertListEqual(list(exits.columns),
+                             list(reference['entry_orders'].columns) +
+                             ['TRADE'])
+
+class price_loader_test_case(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.csv = os.path.join(self.tmp_dir.name, 'prices.csv')
+        shutil.copy(os.path.join(repo_root, 'pep_ko_ivv.csv'), self.csv)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_types_and_order(self):
+        hpd = blotter.onboard_historical_price_data(self.csv, cache=False)
+        self.assertTrue(np.issubdtype(hpd.index.dtype, np.datetime64))
+        self.assertTrue(hpd.index.is_monotonic_increasing)
+        self.assertTrue((hpd.dtypes == np.float64).all())
+        self.assertNotIn('pep_PreviousCloseDate', hpd.columns)
+        self.assertIn('pep_Volume', hpd.columns)
+
+    def test_cache_matches_parse(self):
+        parsed = blotter.onboard_historical_price_data(self.csv, cache=False)
+        first = blotter.onboard_historical_price_data(self.csv)
+        self.assertTrue(os.path.exists(self.csv + '.npcache'))
+        cached = blotter.onboard_historical_price_data(self.csv)
+        pd.testing.assert_frame_equal(first, parsed)
+        pd.testing.assert_frame_equal(cached, parsed)
+        columns = ['pep_Close', 'ko_Open']
+        pd.testing.assert_frame_equal(
+            blotter.onboard_historical_price_data(self.csv, columns),
+            parsed[columns])
+
+    def test_changes_to_frame_stay_out_of_cache(self):
+        cached = blotter.onboard_historical_price_data(self.csv)
+        cached = blotter.onboard_historical_price_data(self.csv)
+        close = cached['pep_Close'].iloc[0]
+        cached.loc[cached.index[0], 'pep_Close'] = close + 1
+        again = blotter.onboard_historical_price_data(self.csv)
+        self.assertEqual(again['pep_Close'].iloc[0], close)
+
+    def test_cache_follows_csv(self):
+        blotter.onboard_historical_price_data(self.csv)
+        # Touched but unchanged: the cache is still used.
+        os.utime(self.csv, ns=(0, 0))
+        self.assertIsNotNone(blotter._read_price_cache(self.csv))
+        with open(self.csv) as f:
+            lines = f.readlines()
+        with open(self.csv, 'w') as f:
+            f.writelines(lines[:1] + lines[2:])
+        self.assertIsNone(blotter._read_price_cache(self.csv))
+        hpd = blotter.onboard_historical_price_data(self.csv)
+        self.assertEqual(len(hpd), len(lines) - 2)
+        self.assertEqual(len(blotter._read_price_cache(self.csv)),
+                         len(lines) - 2)
+
+    def test_pipeline_on_cached_prices(self):
+        blotter.onboard_historical_price_data(self.csv)
+        hpd = blotter.onboard_historical_price_data(self.csv)
+        fsignal = blotter.get_full_signal(blotter.get_bolling_band(
+            blotter.get_spread(hpd, 'pep', 'ko'), 20, 2, 'pep', 'ko'))
+        entries = blotter.calculate_entry_orders(
+            fsignal, 'pep', 'ko', 1000, 1000, 'N/A', 'FILLED', 'N/A',
+            'FILLED')
+        exits = blotter.calculate_exit_orders(entries, fsignal, hpd, 2, 0.1)
+        with open(os.path.join(repo_root, 'whole_process')) as f:
+            self.assertEqual(
+                blotter.get_whole_orders(entries, exits).drop(
+                    columns='TRADE').to_csv(), f.read())
+
+class backtest_pipeline_test_case(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.csv = os.path.join(self.tmp_dir.name, 'prices.csv')
+        shutil.copy(os.path.join(repo_root, 'pep_ko_ivv.csv'), self.csv)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_import_has_no_side_effects(self):
+        self.assertFalse(hasattr(blotter, 'whole_orders'))
+
+    def test_main_writes_whole_process(self):
+        out = os.path.join(self.tmp_dir.name, 'whole_process')
+        blotter.main([self.csv, '--out', out])
+        with open(out) as f, \
+                open(os.path.join(repo_root, 'whole_process')) as expected:
+            self.assertEqual(f.read(), expected.read())
+
+    def test_changed_exits_reuse_signals(self):
+        pipeline = blotter.backtest_pipeline()
+        first = pipeline.run(self.csv, timeout=2)
+        second = pipeline.run(self.csv, timeout=5)
+        self.assertEqual(pipeline.computed['bands'], 1)
+        self.assertEqual(pipeline.computed['signal'], 1)
+        self.assertEqual(pipeline.computed['entries'], 1)
+        self.assertEqual(pipeline.computed['exits'], 2)
+        self.assertIs(first['full_signal'], second['full_signal'])
+        expected = blotter.calculate_exit_orders(
+            reference['entry_orders'], reference['full_signal'],
+            reference['historical_price_data'], 5, 0.1)
+        self.assertEqual(second['exit_orders'].to_csv(), expected.to_csv())
+        # Same parameters again: nothing is recomputed.
+        third = pipeline.run(self.csv, timeout=2)
+        self.assertIs(third['whole_orders'], first['whole_orders'])
+        self.assertEqual(sum(pipeline.computed.values()), 7 + 2)
+
+    def test_cached_stages_are_not_changed(self):
+        pipeline = blotter.backtest_pipeline()
+        result = pipeline.run(self.csv)
+        self.assertNotIn('spread', result['historical_price_data'].columns)
+        self.assertNotIn('signal', result['bbands'].columns)
+        pipeline.run(self.csv, n=10)
+        self.assertNotIn('spread', result['historical_price_data'].columns)
+
+    def test_changed_file_is_rerun(self):
+        pipeline = blotter.backtest_pipeline()
+        first = pipeline.run(self.csv)
+        with open(self.csv) as f:
+            lines = f.readlines()
+        with open(self.csv, 'w') as f:
+            f.writelines(lines[:1] + lines[2:])
+        second = pipeline.run(self.csv)
+        self.assertEqual(pipeline.computed['prices'], 2)
+        self.assertEqual(len(second['historical_price_data']),
+                         len(first['historical_price_data']) - 1)
+
+    def test_oldest_results_are_dropped(self):
+        pipeline = blotter.backtest_pipeline(max_entries=7)
+        pipeline.run(self.csv, timeout=2)
+        pipeline.run(self.csv, timeout=5)
+        self.assertEqual(len(pipeline._results), 7)
+        pipeline.run(self.csv, timeout=2)
+        self.assertEqual(pipeline.computed['exits'], 3)
+
+class whole_process_test_case(unittest.TestCase):
+
+    def test_reference_backtest_is_unchanged(self):
+        with open(os.path.join(repo_root, 'whole_process')) as f:
+            self.assertEqual(
+                reference['whole_orders'].drop(columns='TRADE').to_csv(),
+                f.read())
+
+if __name__ == '__main__':
+    unittest.main()
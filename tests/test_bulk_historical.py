@@ -0,0 +1,66 @@
+import unittest
+from interactive_trader import *
+from tests.stand_in_gateway import stand_in_gateway
+from tests.helpers import stock
+from interactive_trader.token_bucket import token_bucket
+import pandas as pd
+
+
+class bulk_historical_test_case(unittest.TestCase):
+
+    def setUp(self):
+        # Four historical requests per 0.2 s, like a (much faster) IB.
+        self.gateway = stand_in_gateway(pacing_limit=4,
+                                        pacing_window=0.2).start()
+        self.session = ibkr_session(port=self.gateway.port, client_id=1)
+        self.session.connect()
+        self.jobs = [(stock('SYM%d' % i), '10 D', '1 day', 'TRADES')
+                     for i in range(20)]
+
+    def tearDown(self):
+        self.session.disconnect()
+        self.gateway.stop()
+
+    def test_backs_off_and_retries_pacing_violations(self):
+        reports = []
+        downloader = bulk_historical_downloader(
+            self.session, backoff_sec=0.05, requests_per_interval=1000,
+            interval_sec=1, burst=10, on_progress=reports.append,
+            report_interval=0.1
+        )
+        results = downloader.run(self.jobs)
+        self.assertTrue(all(isinstance(r, pd.DataFrame) for r in results))
+        self.assertGreater(self.gateway.pacing_violations, 0)
+        self.assertEqual(reports[-1]['completed'], 20)
+        self.assertEqual(reports[-1]['bars'], 200)
+        self.assertEqual(reports[-1]['pacing_violations'],
+                         self.gateway.pacing_violations)
+
+    def test_token_bucket_avoids_pacing_violations(self):
+        results = fetch_historical_data_bulk(
+            self.jobs, session=self.session, requests_per_interval=4,
+            interval_sec=0.3, burst=2
+        )
+        self.assertTrue(all(isinstance(r, pd.DataFrame) for r in results))
+        self.assertEqual(self.gateway.pacing_violations, 0)
+
+    def test_timeouts_are_retried_then_reported(self):
+        self.gateway.stall = True
+        results = fetch_historical_data_bulk(
+            self.jobs[:2], session=self.session, request_timeout=0.05,
+            max_retries=1
+        )
+        self.assertListEqual([r.args[1] for r in results],
+                             ["timeout", "timeout"])
+        self.assertEqual(len(self.session.app.requests), 0)
+
+    def test_token_bucket(self):
+        bucket = token_bucket(rate=10, capacity=2)
+        self.assertTrue(bucket.try_acquire())
+        self.assertTrue(bucket.try_acquire())
+        self.assertFalse(bucket.try_acquire())
+        self.assertGreater(bucket.wait_time(), 0)
+        self.assertTrue(bucket.acquire(timeout=1))
+
+if __name__ == '__main__':
+    unittest.main()
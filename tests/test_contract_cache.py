@@ -0,0 +1,115 @@
+import os
+import tempfile
+import time
+import unittest
+from interactive_trader import contract_cache, fetch_contract_details
+from interactive_trader import fetch_matching_symbols, ibkr_session
+from tests.stand_in_gateway import stand_in_gateway
+from tests.helpers import stock
+import pandas as pd
+
+
+class contract_cache_test_case(unittest.TestCase):
+
+    def test_least_recently_used_is_evicted(self):
+        cache = contract_cache(max_entries=2)
+        cache.put('a', pd.DataFrame({'x': [1]}))
+        cache.put('b', pd.DataFrame({'x': [2]}))
+        cache.get('a')
+        cache.put('c', pd.DataFrame({'x': [3]}))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a')['x'].iloc[0], 1)
+        self.assertEqual(cache.stats['evictions'], 1)
+
+    def test_entries_expire(self):
+        cache = contract_cache(ttl_sec=0.05)
+        cache.put('a', pd.DataFrame({'x': [1]}))
+        self.assertIsNotNone(cache.get('a'))
+        time.sleep(0.1)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 0)
+
+    def test_cached_frames_are_copies(self):
+        cache = contract_cache()
+        cache.put('a', pd.DataFrame({'x': [1]}))
+        df = cache.get('a')
+        df.loc[0, 'x'] = 99
+        self.assertEqual(cache.get('a')['x'].iloc[0], 1)
+
+    def test_persisted_across_instances(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'cache.pickle')
+            cache = contract_cache(path=path)
+            cache.put('a', pd.DataFrame({'x': [1]}))
+            cache.flush()
+            reopened = contract_cache(path=path)
+            self.assertEqual(reopened.get('a')['x'].iloc[0], 1)
+            self.assertEqual(reopened.stats['hits'], 1)
+
+    def test_saves_are_batched(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'cache.pickle')
+            cache = contract_cache(path=path, save_delay_sec=0.05)
+            cache.put('a', pd.DataFrame({'x': [1]}))
+            self.assertFalse(os.path.exists(path))
+            time.sleep(0.2)
+            self.assertEqual(len(contract_cache(path=path)), 1)
+            cache.save_delay_sec = 60
+            for i in range(500):
+                cache.put(i, pd.DataFrame({'x': [i]}))
+            self.assertEqual(len(contract_cache(path=path)), 1)
+            cache.flush()
+            self.assertEqual(len(contract_cache(path=path)), 501)
+
+class cached_fetch_test_case(unittest.TestCase):
+
+    def setUp(self):
+        self.gateway = stand_in_gateway(contract_details_rows=3).start()
+        self.session = ibkr_session(port=self.gateway.port, client_id=1)
+        self.session.connect()
+        self.cache = contract_cache()
+
+    def tearDown(self):
+        self.session.disconnect()
+        self.gateway.stop()
+
+    def sent(self, msg_id):
+        return sum(fields[0] == msg_id for _, fields in self.gateway.requests)
+
+    def test_every_contract_details_row_is_kept(self):
+        details = fetch_contract_details(stock('PEP'), session=self.session,
+                                         cache=None)
+        self.assertEqual(details.shape[0], 3)
+        self.assertTrue(details['con_id'].is_unique)
+
+    def test_repeat_lookups_are_served_from_cache(self):
+        for _ in range(3):
+            details = fetch_contract_details(stock('PEP'),
+                                             session=self.session,
+                                             cache=self.cache)
+            symbols = fetch_matching_symbols('PEP', session=self.session,
+                                             cache=self.cache)
+        fetch_contract_details(stock('KO'), session=self.session,
+                               cache=self.cache)
+        self.assertEqual(self.sent('9'), 2)
+        self.assertEqual(self.sent('81'), 1)
+        self.assertEqual(details.shape[0], 3)
+        self.assertEqual(symbols['symbol'].iloc[0], 'PEP')
+        self.assertEqual(self.cache.stats['hits'], 4)
+        self.assertEqual(self.cache.stats['misses'], 3)
+
+    def test_gateways_are_kept_apart(self):
+        other = stand_in_gateway(contract_details_rows=3).start()
+        try:
+            with ibkr_session(port=other.port, client_id=1) as session:
+                for each in (self.session, session, self.session, session):
+                    fetch_contract_details(stock('PEP'), session=each,
+                                           cache=self.cache)
+            self.assertEqual(self.sent('9'), 1)
+            self.assertEqual(sum(fields[0] == '9'
+                                 for _, fields in other.requests), 1)
+        finally:
+            other.stop()
+
+if __name__ == '__main__':
+    unittest.main()
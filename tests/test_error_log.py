@@ -0,0 +1,63 @@
+import os
+import tempfile
+import unittest
+from interactive_trader import ibkr_app
+import pandas as pd
+
+class error_log_test_case(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.spill_path = os.path.join(self.tmp_dir.name, 'errors.log')
+        self.app = ibkr_app(error_capacity=4,
+                            error_spill_path=self.spill_path)
+        self.app.error(-1, 2104, 'Market data farm connection is OK:usfarm')
+        self.app.error(-1, 2106, 'HMDS data farm connection is OK:ushmds')
+        self.app.error(7, 162, 'Historical Market Data Service error message')
+        self.app.error(-1, 2104, 'Market data farm connection is OK:cashfarm')
+        self.app.error(8, 200, 'No security definition has been found')
+        self.app.error(7, 162, 'Historical Market Data Service error message')
+
+    def tearDown(self):
+        self.app.errors.close()
+        self.tmp_dir.cleanup()
+
+    def test_error_messages_has_correct_columns(self):
+        self.assertIsInstance(self.app.error_messages, pd.DataFrame)
+        self.assertListEqual(list(self.app.error_messages.columns),
+                             ['reqId', 'errorCode', 'errorString'])
+
+    def test_capacity_is_bounded(self):
+        self.assertEqual(len(self.app.error_messages), 4)
+        self.assertListEqual(list(self.app.error_messages['errorCode']),
+                             [162, 2104, 200, 162])
+
+    def test_indexes_follow_evictions(self):
+        self.assertEqual(len(self.app.errors.by_req_id(7)), 2)
+        self.assertEqual(len(self.app.errors.by_req_id(-1)), 1)
+        self.assertEqual(len(self.app.errors.by_error_code(2106)), 0)
+        self.assertEqual(self.app.errors.counts[2104], 2)
+
+    def test_since(self):
+        new_errors, seq = self.app.errors.since(5)
+        self.assertListEqual(list(new_errors['reqId']), [7])
+        self.assertEqual(seq, 6)
+        new_errors, _ = self.app.errors.since(0)
+        self.assertEqual(len(new_errors), 4)
+
+    def test_snapshot_is_reused_until_something_changes(self):
+        snapshot = self.app.errors.snapshot()
+        self.assertIs(self.app.errors.snapshot(), snapshot)
+        self.app.error(-1, 2104, 'Market data farm connection is OK:usfarm')
+        self.assertIsNot(self.app.errors.snapshot(), snapshot)
+
+    def test_evicted_errors_are_spilled(self):
+        with open(self.spill_path) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].endswith('\t-1\t2106\t'
+                                          'HMDS data farm connection is '
+                                          'OK:ushmds'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,208 @@
+import json
+import os
+import shutil
+import subprocess
+import unittest
+from interactive_trader import ibkr_app
+from event_stream import event_hub, format_event
+from tests.test_blotter import repo_root
+
+
+def parse(text):
+    # (event, data) for every event frame in a chunk of SSE text.
+    events = []
+    for frame in text.split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in frame.split('\n')
+                      if line and not line.startswith(':'))
+        if 'event' in fields:
+            events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+def order_status(app, order_id, status, filled):
+    app.orderStatus(order_id, status, filled, 100 - filled, 1.5, 1000 + order_id,
+                    0, 1.5, 1, '', 0.0)
+
+class event_hub_test_case(unittest.TestCase):
+
+    def test_every_subscriber_gets_every_event(self):
+        hub = event_hub()
+        streams = [hub.stream() for _ in range(3)]
+        for stream in streams:
+            self.assertEqual(next(stream), 'retry: 1000\n\n')
+        self.assertEqual(len(hub), 3)
+        hub.publish('order_status', {'version': 1})
+        hub.publish('order_status', {'version': 2})
+        for stream in streams:
+            self.assertListEqual(parse(next(stream)),
+                                 [('order_status', {'version': 1}),
+                                  ('order_status', {'version': 2})])
+        self.assertEqual(hub.published, 2)
+        for stream in streams:
+            stream.close()
+        self.assertEqual(len(hub), 0)
+
+    def test_initial_events_come_first(self):
+        hub = event_hub()
+        stream = hub.stream(lambda: [('orders_snapshot', {'rows': []})])
+        self.assertListEqual(parse(next(stream)),
+                             [('orders_snapshot', {'rows': []})])
+
+    def test_idle_stream_sends_heartbeat(self):
+        hub = event_hub(heartbeat_sec=0.01)
+        stream = hub.stream()
+        next(stream)
+        self.assertEqual(next(stream), ': heartbeat\n\n')
+
+    def test_slow_subscriber_is_told_to_resync(self):
+        hub = event_hub(queue_size=5)
+        slow, fast = hub.stream(), hub.stream()
+        next(slow)
+        next(fast)
+        for i in range(3):
+            hub.publish('error_message', {'seq': i})
+        self.assertEqual(len(parse(next(fast))), 3)
+        for i in range(3, 7):
+            hub.publish('error_message', {'seq': i})
+        self.assertEqual(len(parse(next(fast))), 4)
+        self.assertListEqual(parse(next(slow)), [('resync', {})])
+        self.assertRaises(StopIteration, next, slow)
+        self.assertEqual(hub.resyncs, 1)
+        self.assertEqual(len(hub), 1)
+
+    def test_format_event(self):
+        self.assertEqual(format_event('resync', {}),
+                         'event: resync\ndata: {}\n\n')
+
+class ibkr_app_events_test_case(unittest.TestCase):
+
+    def test_order_status_changes_are_published(self):
+        app = ibkr_app()
+        events = []
+        app.add_event_listener(lambda event, data: events.append((event, data)))
+        order_status(app, 1, 'Submitted', 0)
+        order_status(app, 1, 'Submitted', 0)
+        order_status(app, 1, 'Filled', 100)
+        self.assertListEqual([event for event, _ in events],
+                             ['order_status', 'order_status'])
+        self.assertListEqual([data['version'] for _, data in events], [1, 2])
+        self.assertEqual(events[1][1]['row']['status'], 'Filled')
+        self.assertEqual(events[1][1]['row']['order_id'], 1)
+
+    def test_errors_are_published(self):
+        app = ibkr_app()
+        events = []
+        listener = lambda event, data: events.append((event, data))
+        app.add_event_listener(listener)
+        app.error(-1, 2104, 'farm connection is OK')
+        app.error(-1, 2106, 'HMDS data farm connection is OK')
+        self.assertListEqual(events, [
+            ('error_message', {'seq': 0, 'row': {
+                'reqId': -1, 'errorCode': 2104,
+                'errorString': 'farm connection is OK'}}),
+            ('error_message', {'seq': 1, 'row': {
+                'reqId': -1, 'errorCode': 2106,
+                'errorString': 'HMDS data farm connection is OK'}})
+        ])
+        app.remove_event_listener(listener)
+        app.error(-1, 2104, 'farm connection is OK')
+        self.assertEqual(len(events), 2)
+
+    def test_listener_removing_itself(self):
+        app = ibkr_app()
+        events = []
+        def once(event, data):
+            app.remove_event_listener(once)
+        app.add_event_listener(once)
+        app.add_event_listener(lambda event, data: events.append(event))
+        order_status(app, 1, 'Submitted', 0)
+        self.assertListEqual(events, ['order_status'])
+        self.assertEqual(len(app.event_listeners), 1)
+
+    def test_bar_listener_removing_itself(self):
+        app = ibkr_app()
+        bars = []
+        def once(req_id, bar):
+            app.remove_bar_listener(req_id, once)
+        app.add_bar_listener(1, once)
+        app.add_bar_listener(1, lambda req_id, bar: bars.append(bar))
+        app.historicalDataUpdate(1, 'bar')
+        self.assertListEqual(bars, ['bar'])
+        self.assertEqual(len(app.bar_listeners[1]), 1)
+
+class events_route_test_case(unittest.TestCase):
+
+    def test_stream_starts_with_snapshots(self):
+        import app as dash_app
+        conn = dash_app.ibkr_async_conn
+        order_status(conn, 31, 'Submitted', 0)
+        client = dash_app.server.test_client()
+        response = client.get('/events', buffered=False)
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        chunks = response.response
+        events = dict(parse(next(chunks).decode()))
+        orders = events['orders_snapshot']
+        self.assertEqual(orders['version'], conn.order_states.version)
+        self.assertIn(31, [row['order_id'] for row in orders['rows']])
+        self.assertEqual(events['errors_snapshot']['seq'],
+                         conn.errors.version)
+        order_status(conn, 31, 'Filled', 100)
+        (event, data), = parse(next(chunks).decode())
+        self.assertEqual(event, 'order_status')
+        self.assertEqual(data['row']['status'], 'Filled')
+        response.close()
+        self.assertEqual(len(dash_app.ibkr_events), 0)
+
+# Runs assets/event_stream.js against a fake browser, where only the page's
+#   tables have DOM nodes (dcc.Interval and dcc.Store render none), and
+#   prints the set_props calls it makes.
+browser_script = """
+var fs = require('fs');
+var calls = [], sources = [], onLoad;
+global.window = {
+    dash_clientside: {set_props: function (id, props) {
+        calls.push([id, props]);
+    }},
+    EventSource: true,
+    addEventListener: function (name, handler) { onLoad = handler; }
+};
+global.document = {getElementById: function (id) {
+    return id === 'trade-blotter' ? {} : null;
+}};
+global.EventSource = function () {
+    this.handlers = {};
+    this.addEventListener = function (name, handler) {
+        this.handlers[name] = handler;
+    };
+    sources.push(this);
+};
+eval(fs.readFileSync(process.argv[1], 'utf8'));
+onLoad();
+var source = sources[0];
+source.onopen();
+source.handlers.orders_snapshot({data: JSON.stringify(
+    {version: 1, rows: [{order_id: 1, status: 'Submitted'}]})});
+source.handlers.errors_snapshot({data: JSON.stringify(
+    {seq: 0, capacity: 10, rows: []})});
+source.onerror();
+console.log(JSON.stringify(calls));
+"""
+
+@unittest.skipUnless(shutil.which('node'), 'needs node')
+class event_stream_script_test_case(unittest.TestCase):
+
+    def test_polling_is_switched_with_the_stream(self):
+        output = subprocess.run(
+            ['node', '-e', browser_script,
+             os.path.join(repo_root, 'assets', 'event_stream.js')],
+            capture_output=True, text=True, check=True).stdout
+        self.assertListEqual(json.loads(output), [
+            ['ibkr-update-interval', {'disabled': True}],
+            ['trade-blotter',
+             {'data': [{'order_id': 1, 'status': 'Submitted'}]}],
+            ['ibkr-update-interval', {'disabled': False}],
+            ['trade-blotter-seen', {'data': None}],
+            ['errors-dt-seen', {'data': None}]
+        ])
+
+if __name__ == '__main__':
+    unittest.main()
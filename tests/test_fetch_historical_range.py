@@ -0,0 +1,142 @@
+import unittest
+from interactive_trader import fetch_historical_data, ibkr_session
+from interactive_trader.durations import chunk_ranges, duration_str
+from interactive_trader.durations import last_completed_bar
+from tests.stand_in_gateway import stand_in_gateway
+from tests.helpers import eur_usd
+import pandas as pd
+
+
+class chunk_ranges_test_case(unittest.TestCase):
+
+    def test_chunks_are_contiguous_and_legal(self):
+        chunks = chunk_ranges('2022-01-01', '2022-01-03 12:00', '1 min')
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(chunks[0][0], pd.Timestamp('2022-01-01'))
+        self.assertEqual(chunks[-1][1], pd.Timestamp('2022-01-03 12:00'))
+        for (_, previous_end), (chunk_start, _) in zip(chunks, chunks[1:]):
+            self.assertEqual(previous_end, chunk_start)
+        self.assertEqual(duration_str(*chunks[0]), '86400 S')
+
+    def test_daily_bars_are_not_split(self):
+        self.assertEqual(len(chunk_ranges('2012-01-01', '2022-01-01',
+                                          '1 day')), 1)
+
+    def test_last_completed_bar(self):
+        now = pd.Timestamp('2022-01-05 14:00:30')
+        self.assertEqual(last_completed_bar('1 day', now),
+                         pd.Timestamp('2022-01-04'))
+        self.assertEqual(last_completed_bar('1 min', now),
+                         pd.Timestamp('2022-01-05 13:59'))
+        self.assertEqual(last_completed_bar('1 week', now),
+                         pd.Timestamp('2021-12-27'))
+        self.assertEqual(last_completed_bar('1 month', now),
+                         pd.Timestamp('2021-12-01'))
+
+    def test_unknown_bar_size_raises(self):
+        with self.assertRaises(Exception):
+            chunk_ranges('2022-01-01', '2022-01-02', '7 mins')
+
+class fetch_historical_range_test_case(unittest.TestCase):
+
+    def setUp(self):
+        self.gateway = stand_in_gateway().start()
+        self.session = ibkr_session(port=self.gateway.port, client_id=1)
+        self.session.connect()
+
+    def tearDown(self):
+        self.session.disconnect()
+        self.gateway.stop()
+
+    def test_range_is_stitched_in_order(self):
+        chunks = []
+        bars = fetch_historical_data(
+            eur_usd(), start='2022-01-01', end='2022-01-04',
+            barSizeSetting='1 min', session=self.session,
+            on_chunk=lambda s, e, b: chunks.append((s, e, len(b)))
+        )
+        historical_requests = [fields for _, fields in self.gateway.requests
+                               if fields[0] == '20']
+        self.assertEqual(len(historical_requests), 3)
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(len(bars), 3 * 1440)
+        steps = bars['date'].diff().dropna()
+        self.assertTrue((steps == pd.Timedelta(minutes=1)).all())
+        self.assertEqual(bars['date'].iloc[-1], pd.Timestamp('2022-01-04'))
+
+    def test_overlapping_chunks_are_deduplicated(self):
+        self.gateway.historical_bars = 2000
+        bars = fetch_historical_data(
+            eur_usd(), start='2022-01-01', end='2022-01-03',
+            barSizeSetting='1 min', session=self.session
+        )
+        self.assertTrue(bars['date'].is_unique)
+        self.assertTrue(bars['date'].is_monotonic_increasing)
+        self.assertGreaterEqual(bars['date'].iloc[0],
+                                pd.Timestamp('2022-01-01'))
+
+    def test_pacing_goes_to_the_downloader(self):
+        pacing = {'max_in_flight': 1}
+        bars = fetch_historical_data(
+            eur_usd(), start='2022-01-01', end='2022-01-04',
+            barSizeSetting='1 min', session=self.session, timeout=5,
+            pacing=pacing
+        )
+        self.assertEqual(len(bars), 3 * 1440)
+        self.assertDictEqual(pacing, {'max_in_flight': 1})
+        with self.assertRaises(TypeError):
+            fetch_historical_data(eur_usd(), start='2022-01-01',
+                                  session=self.session, max_in_flight=1)
+
+    def test_back_to_back_ranges_share_the_pacing(self):
+        self.gateway.pacing_limit = 4
+        self.gateway.pacing_window = 0.5
+        pacing = {'requests_per_interval': 4, 'interval_sec': 0.5,
+                  'burst': 3, 'backoff_sec': 0.05}
+        for _ in range(2):
+            fetch_historical_data(
+                eur_usd(), start='2022-01-01', end='2022-01-04',
+                barSizeSetting='1 min', session=self.session, pacing=pacing
+            )
+        self.assertEqual(self.gateway.pacing_violations, 0)
+
+    def test_chunks_without_data_are_empty(self):
+        # 2022-01-01 and 2022-01-02 are a weekend: the chunks ending on
+        #   Sunday and Monday midnight have nothing in them.
+        self.gateway.no_data_weekdays = {6, 0}
+        bars = fetch_historical_data(
+            eur_usd(), start='2022-01-01', end='2022-01-04',
+            barSizeSetting='1 min', session=self.session
+        )
+        self.assertEqual(len(bars), 1440)
+        self.assertEqual(bars['date'].iloc[0],
+                         pd.Timestamp('2022-01-03 00:01'))
+        self.gateway.no_data_weekdays = {0, 1, 2, 3, 4, 5, 6}
+        bars = fetch_historical_data(
+            eur_usd(), start='2022-01-01', end='2022-01-04',
+            barSizeSetting='1 min', session=self.session
+        )
+        self.assertEqual(len(bars), 0)
+
+    def test_other_chunk_errors_are_raised(self):
+        self.gateway.response_delay = 0.5
+        with self.assertRaises(Exception) as raised:
+            fetch_historical_data(
+                eur_usd(), start='2022-01-01', end='2022-01-02',
+                barSizeSetting='1 min', session=self.session, timeout=0.05,
+                pacing={'max_retries': 0}
+            )
+        self.assertEqual(raised.exception.args[1], "timeout")
+
+    def test_range_arguments_need_start(self):
+        for arguments in ({'pacing': {'max_in_flight': 1}},
+                          {'end': '2022-01-04'},
+                          {'on_chunk': print}):
+            with self.assertRaises(Exception):
+                fetch_historical_data(eur_usd(), session=self.session,
+                                      **arguments)
+        self.assertListEqual([fields for _, fields in self.gateway.requests
+                              if fields[0] == '20'], [])
+
+if __name__ == '__main__':
+    unittest.main()
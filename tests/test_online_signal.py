@@ -0,0 +1,139 @@
+import os
+import unittest
+import numpy as np
+import pandas as pd
+from ibapi.common import BarData
+from interactive_trader import ibkr_app
+from tests.test_blotter import blotter, repo_root
+import online_signal
+
+hpd = blotter.onboard_historical_price_data(
+    os.path.join(repo_root, 'pep_ko_ivv.csv'), cache=False)
+
+
+def bars(stock, prices=hpd):
+    out = []
+    for date, row in prices.iterrows():
+        bar = BarData()
+        bar.date = date.strftime('%Y%m%d')
+        bar.open = row[stock + '_Open']
+        bar.high = row[stock + '_High']
+        bar.low = row[stock + '_Low']
+        bar.close = row[stock + '_Close']
+        out.append(bar)
+    return out
+
+def batch_signal(n, k):
+    spread = blotter.get_spread(hpd.copy(), 'pep', 'ko')
+    fsignal = blotter.get_full_signal(
+        blotter.get_bolling_band(spread, n, k, 'pep', 'ko'))
+    fsignal.index = fsignal.index.strftime('%Y%m%d')
+    return fsignal
+
+def replay(engine, bars_a, bars_b):
+    rows = []
+    for bar_a, bar_b in zip(bars_a, bars_b):
+        row = engine.update(bar_a.date, bar_a, bar_b)
+        if row is not None:
+            rows.append(row)
+    return as_frame(rows)
+
+def as_frame(rows):
+    fsignal = pd.DataFrame(rows).set_index('date')
+    fsignal.index.name = 'Date'
+    return fsignal
+
+class online_signal_test_case(unittest.TestCase):
+
+    def test_replay_matches_batch_exactly(self):
+        pep, ko = bars('pep'), bars('ko')
+        for n, k in ((20, 2), (5, 1.5), (60, 3), (1, 2)):
+            engine = online_signal.pair_signal_engine('pep', 'ko', n, k)
+            online = replay(engine, pep, ko)
+            expected = batch_signal(n, k)
+            pd.testing.assert_frame_equal(online, expected[online.columns])
+
+    def test_running_sums_agree_with_batch(self):
+        engine = online_signal.pair_signal_engine('pep', 'ko', 20, 2,
+                                                  exact=False, block_size=100)
+        online = replay(engine, bars('pep'), bars('ko'))
+        expected = batch_signal(20, 2)
+        np.testing.assert_allclose(online['upper_band'],
+                                   expected['upper_band'], rtol=0,
+                                   atol=1e-9)
+        np.testing.assert_allclose(online['lower_band'],
+                                   expected['lower_band'], rtol=0,
+                                   atol=1e-9)
+        self.assertListEqual(list(online['signal']),
+                             list(expected['signal']))
+
+    def test_state_stays_fixed_size(self):
+        engine = online_signal.pair_signal_engine('pep', 'ko', 20, 2)
+        replay(engine, bars('pep'), bars('ko'))
+        self.assertEqual(engine.count, len(hpd))
+        self.assertEqual(len(engine._window), 40)
+
+    def test_revised_bar_replaces_the_last(self):
+        pep, ko = bars('pep'), bars('ko')
+        for exact in (True, False):
+            engine = online_signal.pair_signal_engine('pep', 'ko', 20, 2,
+                                                      exact=exact)
+            for i in range(len(pep)):
+                if i > 0 and i % 7 == 0:
+                    # A forming bar first sent with the previous day's
+                    #   prices, then revised to the final ones.
+                    early = BarData()
+                    early.date = pep[i].date
+                    for field in ('open', 'high', 'low', 'close'):
+                        setattr(early, field, getattr(pep[i - 1], field))
+                    engine.update(pep[i].date, early, ko[i])
+                row = engine.update(pep[i].date, pep[i], ko[i])
+            expected = batch_signal(20, 2).iloc[-1]
+            self.assertEqual(row['signal'], expected['signal'])
+            self.assertAlmostEqual(row['upper_band'],
+                                   expected['upper_band'], places=9)
+            self.assertEqual(engine.count, len(pep))
+
+    def test_fed_from_app_callbacks(self):
+        app = ibkr_app()
+        engine = online_signal.pair_signal_engine('pep', 'ko', 20, 2)
+        rows = []
+        detach = engine.attach(app, 1, 2, on_row=rows.append)
+        pep, ko = bars('pep'), bars('ko')
+        half = len(pep) // 2
+        # History first, with the legs' bars interleaved unevenly.
+        for i in range(half):
+            app.historicalData(1, pep[i])
+        for i in range(half):
+            app.historicalData(2, ko[i])
+        app.historicalDataEnd(1, '', '')
+        app.historicalDataEnd(2, '', '')
+        # Then live updates; each date is sent twice, as keepUpToDate does.
+        for i in range(half, len(pep)):
+            app.historicalDataUpdate(2, ko[i])
+            app.historicalDataUpdate(1, pep[i])
+            app.historicalDataUpdate(1, pep[i])
+        online = as_frame(rows)
+        online = online[~online.index.duplicated(keep='last')]
+        expected = batch_signal(20, 2)
+        pd.testing.assert_frame_equal(online, expected[online.columns])
+        detach()
+        self.assertDictEqual(app.bar_listeners, {})
+
+    def test_real_time_bars(self):
+        app = ibkr_app()
+        engine = online_signal.pair_signal_engine('a', 'b', 3, 1)
+        rows = []
+        engine.attach(app, 7, 8, on_row=rows.append)
+        for i, (a, b) in enumerate(((10, 5), (11, 5), (12, 5), (13, 5),
+                                    (9, 5))):
+            time = 1649856600 + 5 * i
+            app.realtimeBar(7, time, a, a, a, a, 100, a, 3)
+            app.realtimeBar(8, time, b, b, b, b, 100, b, 3)
+        self.assertListEqual([row['date'] for row in rows],
+                             [1649856615, 1649856620])
+        self.assertListEqual([row['signal'] for row in rows],
+                             ['false', 'x_down'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import threading
+import time
+import unittest
+from interactive_trader import ibkr_session, order_id_allocator
+from interactive_trader import order_submitter
+from tests.stand_in_gateway import stand_in_gateway
+from tests.helpers import stock, market_order
+
+
+class order_id_allocator_test_case(unittest.TestCase):
+
+    def test_not_seeded(self):
+        ids = order_id_allocator()
+        self.assertFalse(ids.is_seeded)
+        self.assertRaises(Exception, ids.allocate)
+
+    def test_ids_are_unique_across_threads(self):
+        ids = order_id_allocator()
+        ids.seed(100)
+        allocated = [[] for _ in range(8)]
+
+        def allocate(out):
+            for _ in range(1000):
+                out.append(ids.allocate())
+        threads = [threading.Thread(target=allocate, args=(out,))
+                   for out in allocated]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        every_id = sorted(sum(allocated, []))
+        self.assertListEqual(every_id, list(range(100, 8100)))
+
+    def test_seed_only_moves_forward(self):
+        ids = order_id_allocator()
+        ids.seed(10)
+        self.assertEqual(ids.allocate(2), 10)
+        ids.seed(5)
+        self.assertEqual(ids.allocate(), 12)
+        ids.seed(50)
+        self.assertEqual(ids.allocate(), 50)
+
+    def test_resync_is_requested_when_due(self):
+        requested = []
+        ids = order_id_allocator(request_ids=lambda: requested.append(1),
+                                 resync_sec=0.05)
+        ids.seed(1)
+        ids.allocate()
+        self.assertEqual(requested, [])
+        time.sleep(0.06)
+        ids.allocate()
+        ids.allocate()
+        self.assertEqual(requested, [1])
+        self.assertEqual(ids.resyncs, 1)
+
+class order_submitter_test_case(unittest.TestCase):
+
+    def setUp(self):
+        self.gateway = stand_in_gateway(reject_symbols=['BAD']).start()
+        self.session = ibkr_session(port=self.gateway.port, client_id=1)
+        self.session.connect()
+
+    def tearDown(self):
+        self.session.disconnect()
+        self.gateway.stop()
+
+    def test_burst_of_orders_is_acknowledged(self):
+        with order_submitter(self.session.app, rate_limit=None) as submitter:
+            order_ids = [submitter.submit(stock('SYM%d' % (i % 10)),
+                                          market_order())
+                         for i in range(500)]
+            self.assertTrue(submitter.wait(timeout=10))
+            stats = submitter.latency_stats()
+        self.assertEqual(len(set(order_ids)), 500)
+        self.assertEqual(stats['acked'], 500)
+        self.assertEqual(stats['pending'], 0)
+        self.assertGreater(stats['p99_ms'], 0)
+        self.assertEqual(submitter.status(order_ids[-1]), 'Submitted')
+
+    def test_orders_are_paced_by_default(self):
+        with order_submitter(self.session.app) as submitter:
+            start = time.monotonic()
+            for i in range(10):
+                submitter.submit(stock('SYM%d' % i), market_order())
+            elapsed = time.monotonic() - start
+            self.assertTrue(submitter.wait(timeout=5))
+        # 5 go out at once, the other 5 at 45 a second.
+        self.assertGreater(elapsed, 4 / 45)
+
+    def test_rejections_are_counted(self):
+        with order_submitter(self.session.app) as submitter:
+            bad = submitter.submit(stock('BAD'), market_order())
+            submitter.submit(stock('GOOD'), market_order())
+            self.assertTrue(submitter.wait(timeout=5))
+        self.assertEqual(submitter.rejected, 1)
+        self.assertEqual(submitter.status(bad), 'Inactive')
+
+    def test_resync_keeps_ids_past_those_used(self):
+        app = self.session.app
+        first = app.order_ids.allocate()
+        with order_submitter(app) as submitter:
+            submitter.submit(stock('SYM'), market_order(), order_id=first + 5)
+            submitter.wait(timeout=5)
+        ready = self.session.request('next_valid_id')
+        app.reqIds(-1)
+        self.session.wait(ready, 'test', 'next_valid_id')
+        self.assertEqual(app.order_ids.allocate(), first + 6)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+from interactive_trader import ibkr_app
+import pandas as pd
+
+
+def send_status(app, order_id, status, filled=0.0, remaining=100.0):
+    app.orderStatus(order_id, status, filled, remaining, 0.0, 1000 + order_id,
+                    0, 0.0, 10645, '', 0.0)
+
+class order_state_store_test_case(unittest.TestCase):
+
+    def setUp(self):
+        self.app = ibkr_app()
+        send_status(self.app, 1, 'PreSubmitted')
+        send_status(self.app, 2, 'PreSubmitted')
+        send_status(self.app, 1, 'Submitted')
+        send_status(self.app, 1, 'Submitted')
+        self.version = self.app.order_states.version
+        send_status(self.app, 2, 'Filled', 100.0, 0.0)
+        send_status(self.app, 3, 'Submitted')
+
+    def test_order_status_has_correct_columns(self):
+        correct_colnames = ['order_id', 'perm_id', 'status', 'filled',
+                            'remaining', 'avg_fill_price', 'parent_id',
+                            'last_fill_price', 'client_id', 'why_held',
+                            'mkt_cap_price']
+        self.assertIsInstance(self.app.order_status, pd.DataFrame)
+        self.assertListEqual(list(self.app.order_status.columns),
+                             correct_colnames)
+
+    def test_order_status_keeps_latest_state_per_order(self):
+        df = self.app.order_status
+        self.assertListEqual(list(df['order_id']), [1, 2, 3])
+        self.assertListEqual(list(df['status']),
+                             ['Submitted', 'Filled', 'Submitted'])
+
+    def test_repeated_status_is_not_a_transition(self):
+        history = self.app.order_states.history()
+        self.assertEqual(len(history), 5)
+        self.assertEqual(self.app.order_states.version, 5)
+
+    def test_changed_since(self):
+        changed, version = self.app.order_states.changed_since(self.version)
+        self.assertListEqual(list(changed['order_id']), [2, 3])
+        self.assertEqual(version, 5)
+        changed, _ = self.app.order_states.changed_since(version)
+        self.assertEqual(len(changed), 0)
+
+    def test_lookup_by_perm_id(self):
+        self.assertEqual(self.app.order_states.get_by_perm_id(1002)['status'],
+                         'Filled')
+        self.assertIsNone(self.app.order_states.get(99))
+
+    def test_history_status_codes(self):
+        history = self.app.order_states.history()
+        names = self.app.order_states.status_names
+        self.assertListEqual([names[c] for c in history['status']],
+                             ['PreSubmitted', 'PreSubmitted', 'Submitted',
+                              'Filled', 'Submitted'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import time
+import unittest
+from ibapi.message import OUT
+from interactive_trader import ibkr_session, outbound_scheduler
+from interactive_trader.outbound_scheduler import default_lane_for
+from tests.stand_in_gateway import stand_in_gateway
+from tests.helpers import stock, market_order
+
+
+def request_history(session, n):
+    for _ in range(n):
+        session.app.reqHistoricalData(
+            session.next_req_id(), stock('IVV'), '', '1 D', '1 hour',
+            'MIDPOINT', True, formatDate=1, keepUpToDate=False,
+            chartOptions=[])
+
+def received(gateway, message_id):
+    return [(at, fields) for at, fields in gateway.requests
+            if int(fields[0]) == message_id]
+
+class outbound_scheduler_test_case(unittest.TestCase):
+
+    def setUp(self):
+        self.gateway = stand_in_gateway().start()
+        self.session = ibkr_session(port=self.gateway.port, client_id=1)
+        self.session.connect()
+
+    def tearDown(self):
+        self.session.disconnect()
+        self.gateway.stop()
+
+    def wait_until(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_lanes(self):
+        self.assertEqual(default_lane_for(OUT.PLACE_ORDER), 'orders')
+        self.assertEqual(default_lane_for(OUT.CANCEL_ORDER), 'orders')
+        self.assertEqual(default_lane_for(OUT.REQ_MKT_DATA), 'market_data')
+        self.assertEqual(default_lane_for(OUT.REQ_CONTRACT_DATA),
+                         'contracts')
+        self.assertEqual(default_lane_for(OUT.REQ_HISTORICAL_DATA),
+                         'historical')
+        self.assertEqual(default_lane_for(OUT.REQ_IDS), 'control')
+
+    def test_order_overtakes_historical_burst(self):
+        before = len(self.gateway.requests)
+        with outbound_scheduler(self.session.app, max_rate=200, burst=5,
+                                lane_rates={}) as scheduler:
+            request_history(self.session, 40)
+            order_id = self.session.next_order_id()
+            self.session.app.placeOrder(order_id, stock('PEP'),
+                                        market_order())
+        self.wait_until(lambda: len(self.gateway.requests) >= before + 41)
+        message_ids = [int(fields[0])
+                       for _, fields in self.gateway.requests[before:]]
+        self.assertEqual(len(message_ids), 41)
+        # At most the burst's worth of history went out before the order.
+        self.assertLessEqual(message_ids.index(OUT.PLACE_ORDER), 6)
+        stats = scheduler.stats()
+        self.assertEqual(stats['orders']['sent'], 1)
+        self.assertEqual(stats['historical']['sent'], 40)
+        self.assertEqual(stats['historical']['queued'], 0)
+        self.assertLess(stats['orders']['wait_max_ms'],
+                        stats['historical']['wait_max_ms'])
+
+    def test_lane_rate_limit(self):
+        before = len(received(self.gateway, OUT.REQ_HISTORICAL_DATA))
+        with outbound_scheduler(self.session.app, max_rate=1000, burst=2,
+                                lane_rates={'historical': 40}):
+            start = time.perf_counter()
+            request_history(self.session, 12)
+        # stop() returns once everything queued is sent: two at once, then
+        #   one every 25 ms.
+        self.assertGreater(time.perf_counter() - start, 0.2)
+        history = lambda: len(received(self.gateway,
+                                       OUT.REQ_HISTORICAL_DATA)) - before
+        self.wait_until(lambda: history() >= 12)
+        self.assertEqual(history(), 12)
+
+    def test_stop_gives_send_back(self):
+        app = self.session.app
+        scheduler = outbound_scheduler(app).start()
+        self.assertEqual(app.sendMsg, scheduler.send)
+        scheduler.stop()
+        self.assertNotIn('sendMsg', app.__dict__)
+        ready = self.session.request('next_valid_id')
+        app.reqIds(-1)
+        self.session.wait(ready, 'test', 'next_valid_id')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import os
+import unittest
+import numpy as np
+import pandas as pd
+from tests.test_blotter import reference, repo_root
+import blotter
+import performance
+
+def order(date, symbol, action, size, price, trip):
+    return {'DATE': date, 'SYMBOL': symbol, 'ACTION': action, 'SIZE': size,
+            'PRICE': price, 'TRIP': trip}
+
+# One pair trade on day 2 closed on day 3, and a second opened on day 4 and
+#   still open at the end.
+orders = pd.DataFrame([
+    order('2020-01-02', 'a', 'BUY', 10, 100.0, 'Entry'),
+    order('2020-01-02', 'b', 'SELL', 10, 50.0, 'Entry'),
+    order('2020-01-03', 'a', 'SELL', 10, 104.0, 'Exit'),
+    order('2020-01-03', 'b', 'BUY', 10, 51.0, 'Exit'),
+    order('2020-01-06', 'a', 'SELL', 5, 106.0, 'Entry'),
+    order('2020-01-06', 'b', 'BUY', 5, 52.0, 'Entry'),
+]).set_index('DATE')
+prices = pd.DataFrame({
+    'a_Close': [99.0, 101.0, 104.0, 106.0, 108.0],
+    'b_Close': [50.0, 50.0, 51.0, 52.0, 51.0]
+}, index=pd.Index(['2020-01-01', '2020-01-02', '2020-01-03', '2020-01-06',
+                   '2020-01-07'], name='Date'))
+
+class performance_test_case(unittest.TestCase):
+
+    def test_trip_pnl(self):
+        trips = performance.trip_pnl(orders)
+        self.assertEqual(len(trips), 1)
+        self.assertEqual(trips['pnl'].iloc[0], 10 * 4 - 10 * 1)
+        self.assertEqual(trips['entry_date'].iloc[0],
+                         pd.Timestamp('2020-01-02'))
+        self.assertEqual(trips['exit_date'].iloc[0],
+                         pd.Timestamp('2020-01-03'))
+
+    def test_trips_exiting_on_the_same_date(self):
+        # Two trades in opposite directions, both closed on day 7.
+        entries = pd.DataFrame([
+            order('2020-01-02', 'a', 'BUY', 10, 100.0, 'Entry'),
+            order('2020-01-02', 'b', 'SELL', 10, 50.0, 'Entry'),
+            order('2020-01-03', 'a', 'SELL', 10, 101.0, 'Entry'),
+            order('2020-01-03', 'b', 'BUY', 10, 51.0, 'Entry'),
+        ]).set_index('DATE')
+        exits = pd.DataFrame([
+            order('2020-01-07', 'a', 'SELL', 10, 104.0, 'Exit'),
+            order('2020-01-07', 'b', 'BUY', 10, 51.0, 'Exit'),
+            order('2020-01-07', 'a', 'BUY', 10, 104.0, 'Exit'),
+            order('2020-01-07', 'b', 'SELL', 10, 51.0, 'Exit'),
+        ]).set_index('DATE')
+        exits['TRADE'] = [0, 0, 1, 1]
+        trips = performance.trip_pnl(blotter.get_whole_orders(entries, exits))
+        self.assertListEqual(list(trips['pnl']), [10 * 4 - 10 * 1,
+                                                  -10 * 3 + 10 * 0])
+        self.assertListEqual(list(trips['entry_date']),
+                             [pd.Timestamp('2020-01-02'),
+                              pd.Timestamp('2020-01-03')])
+
+    def test_later_trade_exiting_first(self):
+        # The second trade's exit is dated before the first's.
+        entries = orders[orders['TRIP'] == 'Entry']
+        exits = pd.DataFrame([
+            order('2020-01-07', 'a', 'BUY', 5, 107.0, 'Exit'),
+            order('2020-01-07', 'b', 'SELL', 5, 51.0, 'Exit'),
+            order('2020-01-08', 'a', 'SELL', 10, 108.0, 'Exit'),
+            order('2020-01-08', 'b', 'BUY', 10, 50.0, 'Exit'),
+        ]).set_index('DATE')
+        exits['TRADE'] = [1, 1, 0, 0]
+        exits = exits.iloc[[2, 3, 0, 1]]
+        trips = performance.trip_pnl(blotter.get_whole_orders(entries, exits))
+        self.assertListEqual(list(trips['pnl']), [10 * 8 + 10 * 0,
+                                                  -5 * 1 - 5 * 1])
+        self.assertListEqual(list(trips['exit_date']),
+                             [pd.Timestamp('2020-01-08'),
+                              pd.Timestamp('2020-01-07')])
+
+    def test_equity_curve(self):
+        curve = performance.equity_curve(orders, prices)
+        # Day 2 marks a at 101, day 7 marks the open trade: -5 * 2 - 5 * 1.
+        self.assertListEqual(list(curve['equity']),
+                             [0.0, 10.0, 30.0, 30.0, 15.0])
+        self.assertListEqual(list(curve['drawdown']),
+                             [0.0, 0.0, 0.0, 0.0, -15.0])
+        self.assertEqual(curve['gross_exposure'].max(), 1510.0)
+
+    def test_performance(self):
+        stats = performance.performance(orders, prices)
+        self.assertEqual(stats['trades'], 2)
+        self.assertEqual(stats['closed_trades'], 1)
+        self.assertEqual(stats['pnl'], 15.0)
+        self.assertEqual(stats['realized_pnl'], 30.0)
+        self.assertEqual(stats['max_drawdown'], -15.0)
+        self.assertEqual(stats['hit_rate'], 1.0)
+        self.assertAlmostEqual(stats['max_drawdown_pct'], -15.0 / 1510.0)
+
+    def test_reference_backtest(self):
+        curve = performance.equity_curve(reference['whole_orders'],
+                                         reference['historical_price_data'])
+        stats = performance.performance(reference['whole_orders'],
+                                        reference['historical_price_data'])
+        self.assertEqual(stats['trades'], 82)
+        self.assertEqual(stats['closed_trades'], 82)
+        self.assertAlmostEqual(stats['pnl'], 15259.0, places=6)
+        self.assertAlmostEqual(stats['realized_pnl'], stats['pnl'], places=6)
+        self.assertTrue((curve['drawdown'] <= 0).all())
+        self.assertEqual(curve['equity'].iloc[-1], stats['pnl'])
+        self.assertTrue(np.isfinite(stats['sharpe']))
+
+    def test_trips_pair_by_trade(self):
+        # Many same-date exits and stop losses closing trades out of order;
+        #   every trip is one entry and one exit of 1000 shares a leg.
+        result = blotter.backtest_pipeline().run(
+            os.path.join(repo_root, 'pep_ko_ivv.csv'), n=5, k=0.5,
+            timeout=20, stop_loss=0.01)
+        trips = performance.trip_pnl(result['whole_orders'])
+        self.assertEqual(len(trips), len(result['exit_orders']) // 2)
+        self.assertTrue((trips['pnl'].abs() < 20000).all())
+        self.assertTrue((trips['exit_date'] > trips['entry_date']).all())
+        # The trade numbers are a column, so they survive reordering.
+        shuffled = result['whole_orders'].sort_values('SYMBOL')
+        pd.testing.assert_frame_equal(performance.trip_pnl(shuffled), trips)
+
+    def test_no_orders(self):
+        stats = performance.performance(orders.iloc[:0], prices)
+        self.assertEqual(stats['trades'], 0)
+        self.assertEqual(stats['closed_trades'], 0)
+        self.assertEqual(stats['pnl'], 0.0)
+
+if __name__ == '__main__':
+    unittest.main()
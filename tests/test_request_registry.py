@@ -0,0 +1,90 @@
+import threading
+import time
+import unittest
+from interactive_trader import ibkr_app
+
+class request_registry_test_case(unittest.TestCase):
+
+    def setUp(self):
+        self.app = ibkr_app()
+
+    def test_callback_wakes_waiter(self):
+        request = self.app.requests.register(7, timeout=5)
+        timer = threading.Timer(0.05, self.app.historicalDataEnd,
+                                args=(7, '', ''))
+        timer.start()
+        start = time.monotonic()
+        result = self.app.requests.wait(request, "test", "historical_data")
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(len(result), 0)
+        self.assertNotIn(7, self.app.historical_data_by_req_id)
+        self.assertEqual(len(self.app.requests), 0)
+
+    def test_unregistered_results_are_kept(self):
+        self.app.historicalDataEnd(8, '', '')
+        self.assertIn(8, self.app.historical_data_by_req_id)
+
+    def test_deadline(self):
+        request = self.app.requests.register(9, timeout=0.05)
+        with self.assertRaises(Exception) as cm:
+            self.app.requests.wait(request, "test", "historical_data")
+        self.assertEqual(cm.exception.args,
+                         ("test", "timeout", "historical_data not received"))
+        self.assertNotIn(9, self.app.requests)
+
+    def test_late_answer_to_timed_out_request_is_dropped(self):
+        for req_id in (20, 21, 22):
+            request = self.app.requests.register(req_id, timeout=0.01)
+            with self.assertRaises(Exception):
+                self.app.requests.wait(request, "test", "answer")
+        self.app.historicalDataEnd(20, '', '')
+        self.app.contractDetailsEnd(21)
+        self.app.symbolSamples(22, [])
+        self.assertNotIn(20, self.app.historical_data_by_req_id)
+        self.assertNotIn(21, self.app.contract_details_by_req_id)
+        self.assertNotIn(22, self.app.matching_symbols_by_req_id)
+        # Dropped once: the ids are free to be answered again.
+        self.assertFalse(self.app.requests.abandoned(20))
+
+    def test_expired_requests_are_abandoned(self):
+        self.app.requests.register(23, timeout=0)
+        self.assertEqual(self.app.requests.expire(), 1)
+        self.app.historicalDataEnd(23, '', '')
+        self.assertNotIn(23, self.app.historical_data_by_req_id)
+
+    def test_abandoned_requests_are_capped(self):
+        self.app.requests.abandoned_capacity = 2
+        for req_id in (30, 31, 32):
+            self.app.requests.abandon(req_id)
+        self.assertFalse(self.app.requests.abandoned(30))
+        self.assertTrue(self.app.requests.abandoned(32))
+
+    def test_error_fails_request(self):
+        request = self.app.requests.register(10, timeout=5)
+        self.app.error(10, 200, 'No security definition has been found')
+        with self.assertRaises(Exception) as cm:
+            self.app.requests.wait(request, "test", "contract_details")
+        self.assertEqual(cm.exception.args[1], 200)
+
+    def test_warning_does_not_fail_request(self):
+        request = self.app.requests.register(11, timeout=5)
+        self.app.error(11, 2104, 'Market data farm connection is OK:usfarm')
+        self.assertFalse(request.done())
+
+    def test_order_status_resolves_and_rejects(self):
+        accepted = self.app.requests.register(('order', 12), timeout=5)
+        rejected = self.app.requests.register(('order', 13), timeout=5)
+        for order_id, status in ((12, 'PreSubmitted'), (12, 'Submitted'),
+                                 (13, 'Inactive')):
+            self.app.orderStatus(order_id, status, 0.0, 100.0, 0.0, 0, 0,
+                                 0.0, 1, '', 0.0)
+        self.assertEqual(accepted.result(0)['status'], 'Submitted')
+        self.assertRaises(Exception, rejected.result, 0)
+
+    def test_connection_closed_fails_everything(self):
+        request = self.app.requests.register('current_time', timeout=5)
+        self.app.connectionClosed()
+        self.assertRaises(Exception, request.result, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import unittest
+import numpy as np
+import pandas as pd
+from tests.test_blotter import blotter, reference, repo_root
+import screener
+
+prices = os.path.join(repo_root, 'pep_ko_ivv.csv')
+
+class screener_test_case(unittest.TestCase):
+
+    def test_every_pair_is_ranked(self):
+        ranking = screener.screen_pairs(prices)
+        pairs = set(zip(ranking['stock_a'], ranking['stock_b']))
+        self.assertSetEqual(pairs, {('ivv', 'ko'), ('ivv', 'pep'),
+                                    ('ko', 'pep')})
+        self.assertTrue(ranking['crossing_rate'].is_monotonic_decreasing)
+
+    def test_crossings_match_blotter_signals(self):
+        ranking = screener.screen_pairs(prices, n=20, k=2)
+        pair = ranking[(ranking['stock_a'] == 'ko') &
+                       (ranking['stock_b'] == 'pep')]
+        signals = reference['full_signal']['signal']
+        self.assertEqual(pair['crossings'].iloc[0], (signals != 'false').sum())
+
+    def test_correlation_is_of_returns(self):
+        ranking = screener.screen_pairs(prices)
+        typical = screener.typical_prices(
+            blotter.onboard_historical_price_data(prices))
+        returns = typical.pct_change().iloc[1:]
+        pair = ranking[(ranking['stock_a'] == 'ivv') &
+                       (ranking['stock_b'] == 'pep')]
+        self.assertAlmostEqual(pair['correlation'].iloc[0],
+                               returns['ivv'].corr(returns['pep']))
+
+    def test_chunking_does_not_change_results(self):
+        rng = np.random.default_rng(0)
+        days, symbols = 300, 12
+        close = 50 * np.exp(np.cumsum(rng.normal(0, 0.01, (days, symbols)),
+                                      axis=0))
+        wide = pd.DataFrame(index=pd.RangeIndex(days, name='Date'))
+        for i in range(symbols):
+            wide['s%d_High' % i] = close[:, i] * 1.01
+            wide['s%d_Low' % i] = close[:, i] * 0.99
+            wide['s%d_Close' % i] = close[:, i]
+        wide.loc[5, 's3_Close'] = np.nan
+        ranking = screener.screen_pairs(wide, n=10)
+        self.assertEqual(len(ranking), 11 * 10 // 2)
+        self.assertNotIn('s3', set(ranking['stock_a']) |
+                         set(ranking['stock_b']))
+        pd.testing.assert_frame_equal(
+            ranking, screener.screen_pairs(wide, n=10, pairs_per_chunk=7))
+        filtered = screener.screen_pairs(wide, n=10, min_correlation=0.1)
+        self.assertTrue((filtered['correlation'] >= 0.1).all())
+
+if __name__ == '__main__':
+    unittest.main()
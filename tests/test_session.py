@@ -0,0 +1,91 @@
+import threading
+import time
+import unittest
+from datetime import datetime
+from interactive_trader import *
+from interactive_trader import shared_contract_cache
+from tests.stand_in_gateway import stand_in_gateway
+from tests.helpers import eur_usd, market_order
+import pandas as pd
+
+
+class session_test_case(unittest.TestCase):
+
+    def setUp(self):
+        self.gateway = stand_in_gateway().start()
+        self.session = ibkr_session(port=self.gateway.port, client_id=1)
+        self.session.connect()
+
+    def tearDown(self):
+        self.session.disconnect()
+        self.gateway.stop()
+        # Stand-in answers mustn't be served to later tests.
+        shared_contract_cache.clear()
+
+    def test_functions_share_one_connection(self):
+        for _ in range(5):
+            details = fetch_contract_details(eur_usd(), session=self.session)
+        self.assertIsInstance(details, pd.DataFrame)
+        self.assertEqual(details.shape[0], 1)
+        self.assertIsInstance(fetch_current_time(session=self.session),
+                              datetime)
+        self.assertListEqual(fetch_managed_accounts(session=self.session),
+                             ['DU0000001'])
+        self.assertEqual(self.gateway.connections, 1)
+
+    def test_concurrent_requests_are_multiplexed(self):
+        results = {}
+
+        def fetch(i):
+            if i % 2:
+                results[i] = fetch_matching_symbols('SYM%d' % i,
+                                                    session=self.session)
+            else:
+                results[i] = fetch_historical_data(eur_usd(),
+                                                   session=self.session)
+        threads = [threading.Thread(target=fetch, args=(i,))
+                   for i in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for i in range(1, 10, 2):
+            self.assertEqual(results[i]['symbol'].iloc[0], 'SYM%d' % i)
+        for i in range(0, 10, 2):
+            self.assertEqual(len(results[i]), 30 * 24)
+        self.assertEqual(self.gateway.connections, 1)
+
+    def test_place_order_returns_its_own_status(self):
+        order = market_order()
+        first = place_order(eur_usd(), order, session=self.session)
+        second = place_order(eur_usd(), order, session=self.session)
+        self.assertListEqual(list(first['status']), ['Submitted'])
+        self.assertEqual(second['order_id'].iloc[0],
+                         first['order_id'].iloc[0] + 1)
+
+    def test_unacknowledged_order_is_cancelled(self):
+        self.gateway.response_delay = 0.5
+        self.session.timeout = 0.05
+        with self.assertRaises(Exception) as raised:
+            place_order(eur_usd(), market_order(), session=self.session)
+        self.assertEqual(raised.exception.args[1], "timeout")
+        time.sleep(0.2)
+        placed = [fields for _, fields in self.gateway.requests
+                  if fields[0] == '3']
+        cancelled = [fields for _, fields in self.gateway.requests
+                     if fields[0] == '4']
+        self.assertEqual(len(cancelled), 1)
+        self.assertIn(cancelled[0][2], placed[0])
+        self.assertIn(cancelled[0][2], raised.exception.args[2])
+
+    def test_shared_session_is_reused(self):
+        port = self.gateway.port
+        fetch_contract_details(eur_usd(), port=port, client_id=2, cache=None)
+        fetch_matching_symbols('TSLA', port=port, client_id=2, cache=None)
+        self.assertIs(get_session(port=port, client_id=2),
+                      get_session(port=port, client_id=2))
+        close_sessions()
+        self.assertEqual(self.gateway.connections, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from tests.test_blotter import reference, repo_root
+import sweep
+
+prices = os.path.join(repo_root, 'pep_ko_ivv.csv')
+
+class sweep_test_case(unittest.TestCase):
+
+    def test_matches_reference_backtest(self):
+        results = sweep.run_sweep(prices, 'pep', 'ko', n=[20], k=[2],
+                                  timeout=[2], stop_loss=[0.1], workers=2)
+        expected = sweep.summarize(reference['entry_orders'], reference['exit_orders'],
+                                   reference['historical_price_data'])
+        self.assertEqual(len(results), 1)
+        for metric, value in expected.items():
+            self.assertEqual(results[metric].iloc[0], value)
+        self.assertEqual(results['trades'].iloc[0], 82)
+
+    def test_grid_is_fully_covered(self):
+        results = sweep.run_sweep(prices, 'pep', 'ko', n=[10, 20],
+                                  k=[1.5, 2], timeout=[2, 5],
+                                  stop_loss=[0.05, 0.1], workers=2)
+        self.assertEqual(len(results), 16)
+        self.assertFalse(
+            results.duplicated(sweep.param_columns).any())
+
+    def test_rerun_resumes(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            out = os.path.join(tmp_dir, 'results.csv')
+            sweep.run_sweep(prices, 'pep', 'ko', n=[20], k=[2], timeout=[2],
+                            stop_loss=[0.1], workers=2, out=out)
+            computed = []
+            results = sweep.run_sweep(prices, 'pep', 'ko', n=[20], k=[2],
+                                      timeout=[2, 5], stop_loss=[0.1],
+                                      workers=2, out=out,
+                                      on_result=computed.extend)
+            self.assertListEqual([row['timeout'] for row in computed], [5])
+            self.assertListEqual(list(results['timeout']), [2, 5])
+            computed = []
+            sweep.run_sweep(prices, 'pep', 'ko', n=[20], k=[2],
+                            timeout=[2, 5], stop_loss=[0.1], workers=2,
+                            out=out, on_result=computed.extend)
+            self.assertListEqual(computed, [])
+
+    def test_rerun_keeps_combinations_without_trades(self):
+        # k=50 never trades, so its sharpe, sortino and hit_rate are NaN.
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            out = os.path.join(tmp_dir, 'results.csv')
+            first = sweep.run_sweep(prices, 'pep', 'ko', n=[20], k=[2, 50],
+                                    timeout=[2], stop_loss=[0.1], workers=2,
+                                    out=out)
+            self.assertEqual(first['trades'].iloc[1], 0)
+            computed = []
+            results = sweep.run_sweep(prices, 'pep', 'ko', n=[20], k=[2, 50],
+                                      timeout=[2], stop_loss=[0.1],
+                                      workers=2, out=out,
+                                      on_result=computed.extend)
+            self.assertListEqual(computed, [])
+            self.assertListEqual(list(results['k']), [2, 50])
+
+    def test_rerun_drops_cut_short_row(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            out = os.path.join(tmp_dir, 'results.csv')
+            sweep.run_sweep(prices, 'pep', 'ko', n=[20], k=[2],
+                            timeout=[2, 5], stop_loss=[0.1], workers=2,
+                            out=out)
+            with open(out) as f:
+                lines = f.readlines()
+            with open(out, 'w') as f:
+                f.writelines(lines[:-1] + [lines[-1][:12]])
+            computed = []
+            results = sweep.run_sweep(prices, 'pep', 'ko', n=[20], k=[2],
+                                      timeout=[2, 5], stop_loss=[0.1],
+                                      workers=2, out=out,
+                                      on_result=computed.extend)
+            self.assertEqual(len(computed), 1)
+            self.assertEqual(len(results), 2)
+            self.assertEqual(len(pd.read_csv(out)), 2)
+
+    def test_worker_shares_the_mapped_prices(self):
+        hpd = reference['historical_price_data']
+        columns = [s + '_' + f for s in ('pep', 'ko')
+                   for f in sweep.price_fields]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'prices.npy')
+            np.save(path, np.asfortranarray(hpd[columns].to_numpy()))
+            sweep._init_worker(path, columns, hpd.index.to_numpy(), 'pep',
+                               'ko', (1000, 1000))
+            worker = sweep._worker
+            for column in columns:
+                values = worker['hpd'][column].to_numpy()
+                while not isinstance(values, np.memmap):
+                    values = values.base
+                self.assertTrue(np.shares_memory(
+                    worker['spread'][column].to_numpy(), values))
+            self.assertNotIn('spread', worker['hpd'])
+            self.assertListEqual(
+                list(worker['spread']['spread']),
+                list(reference['hpd_w_spread']['spread']))
+            worker.clear()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import json
+import random
+import unittest
+from dash import no_update
+from plotly.io.json import to_json_plotly
+from interactive_trader.error_log import error_log
+from interactive_trader.order_state_store import order_state_store
+from table_updates import error_rows_update, order_rows_update
+from table_updates import update_metrics
+
+
+def apply(data, value):
+    # What the browser does with a callback's value for a table's data.
+    if value is no_update:
+        return data
+    value = json.loads(to_json_plotly(value))
+    if isinstance(value, list):
+        return value
+    data = list(data)
+    for operation in value['operations']:
+        if operation['operation'] == 'Assign':
+            data[operation['location'][0]] = operation['params']['value']
+        elif operation['operation'] == 'Extend':
+            data.extend(operation['params']['value'])
+        elif operation['operation'] == 'Delete':
+            del data[operation['location'][0]]
+        else:
+            raise AssertionError(operation)
+    return data
+
+def records(frame):
+    return json.loads(to_json_plotly(frame.to_dict('records')))
+
+def update_order(store, order_id, status, filled):
+    store.update(order_id, 1000 + order_id, status, filled, 100 - filled,
+                 1.5, 0, 1.5, 1, '', 0.0)
+
+class order_rows_update_test_case(unittest.TestCase):
+
+    def test_unchanged_tick_sends_nothing(self):
+        store = order_state_store()
+        metrics = update_metrics()
+        update_order(store, 1, 'Submitted', 0)
+        data, seen = order_rows_update(store, None, metrics)
+        self.assertEqual(len(data), 1)
+        update, new_seen = order_rows_update(store, seen, metrics)
+        self.assertIs(update, no_update)
+        self.assertIs(new_seen, no_update)
+        stats = metrics.stats['orders']
+        self.assertEqual(stats['ticks'], 2)
+        self.assertEqual(stats['unchanged_ticks'], 1)
+        self.assertEqual(stats['last_bytes'], 0)
+
+    def test_only_changed_rows_are_sent(self):
+        store = order_state_store()
+        metrics = update_metrics()
+        for order_id in range(200):
+            update_order(store, order_id, 'Submitted', 0)
+        data, seen = order_rows_update(store, None, metrics)
+        full_bytes = metrics.stats['orders']['last_bytes']
+        update_order(store, 7, 'Filled', 100)
+        update_order(store, 200, 'Submitted', 0)
+        update, seen = order_rows_update(store, seen, metrics)
+        data = apply(data, update)
+        self.assertEqual(data, records(store.snapshot()))
+        self.assertEqual(metrics.stats['orders']['rows_sent'], 202)
+        self.assertLess(metrics.stats['orders']['last_bytes'],
+                        full_bytes / 50)
+
+    def test_random_updates_keep_browser_in_step(self):
+        rng = random.Random(0)
+        store = order_state_store()
+        data, seen = order_rows_update(store, None)
+        for tick in range(100):
+            for _ in range(rng.randrange(4)):
+                update_order(store, rng.randrange(30),
+                             rng.choice(['Submitted', 'Filled']),
+                             rng.randrange(100))
+            update, new_seen = order_rows_update(store, seen)
+            data = apply(data, update)
+            if new_seen is not no_update:
+                seen = new_seen
+            self.assertEqual(data, records(store.snapshot()))
+
+    def test_restarted_app_sends_everything(self):
+        store = order_state_store()
+        update_order(store, 1, 'Submitted', 0)
+        update, seen = order_rows_update(store, {'version': 50, 'rows': 9})
+        self.assertIsInstance(update, list)
+        self.assertEqual(seen, {'version': 1, 'rows': 1})
+
+class error_rows_update_test_case(unittest.TestCase):
+
+    def test_new_messages_are_appended(self):
+        log = error_log(capacity=100)
+        metrics = update_metrics()
+        for i in range(50):
+            log.append(i, 2104, 'farm connection is OK')
+        data, seen = error_rows_update(log, None, metrics)
+        self.assertEqual(len(data), 50)
+        update, _ = error_rows_update(log, seen, metrics)
+        self.assertIs(update, no_update)
+        log.append(99, 162, 'pacing violation')
+        update, seen = error_rows_update(log, seen, metrics)
+        data = apply(data, update)
+        self.assertEqual(data, records(log.snapshot()))
+        self.assertEqual(metrics.stats['errors']['rows_sent'], 51)
+
+    def test_evicted_messages_are_deleted(self):
+        rng = random.Random(1)
+        log = error_log(capacity=20)
+        data, seen = error_rows_update(log, None)
+        full_updates = 0
+        for tick in range(200):
+            for _ in range(rng.choice([0, 1, 3, 30])):
+                log.append(rng.randrange(10), 2104, 'message %d' % tick)
+            update, new_seen = error_rows_update(log, seen)
+            full_updates += isinstance(update, list)
+            data = apply(data, update)
+            if new_seen is not no_update:
+                seen = new_seen
+            self.assertEqual(data, records(log.snapshot()))
+        self.assertLess(full_updates, 100)
+
+if __name__ == '__main__':
+    unittest.main()